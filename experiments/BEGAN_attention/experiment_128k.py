@@ -2,25 +2,39 @@
 Attention experiments:
 
 Usage:
-    experiment_128k.py [--basic] <option>
+    experiment_128k.py [--basic] [--block-cell] [--xla] [--tune] [--pretrained=<path>] <option>
     experiment_128k.py -h | --help
 
 Options:
-    -h --help   Show this screen.
-    -b --basic  Use the basic huzzer dataset.
+    -h --help         Show this screen.
+    -b --basic        Use the basic huzzer dataset.
+    -c --block-cell   Use fused LSTMBlockCells (checkpoints stay compatible).
+    -x --xla          Compile the graph with XLA JIT.
+    --tune            Benchmark the training step's thread pools and cpu affinity on this machine,
+                      save the fastest profile, which later runs use, and exit.
+    -p --pretrained=<path>  Warm start the generator and discriminator from the
+                      latest checkpoint of an RVAE_attention model, e.g.
+                      experiments/RVAE_attention/basic_attention1_128
 
 """
 
 import os
+import numpy as np
+import time
 from docopt import docopt
 import errno
 import logging
 import project_context  # NOQA
 from pipelines.one_hot_token import one_hot_token_random_batcher
 from pipelines.data_sources import BASIC_DATASET_ARGS
-from model_utils.queues import build_single_output_queue
-from model_utils.loss_functions import ce_loss_for_sequence_batch
+from model_utils.queues import build_multiple_output_queue
+from model_utils.loss_functions import (
+    ce_loss_for_sequence_batch,
+    sparse_ce_loss_for_sequence_batch,
+)
 from model_utils.ops import get_sequence_lengths
+from model_utils.checkpoints import block_cell_variables_map, warm_start_fn
+from model_utils.sessions import StepTimer, autotune, tuned_session_config
 from models import (
     build_attention1_decoder,
     build_single_program_encoder,
@@ -41,10 +55,17 @@ NUMBER_BATCHES = 4000
 LAMBDA = 0.001
 GAMMA = 0.5
 
+# the generator and discriminator are both warm started from an RVAE_attention
+# model, the generator from its decoder only
+PRETRAINED_RULES = [
+    (r'^generator/', ''),
+    (r'^discriminator/', ''),
+]
 
-def run_experiment(option, use_basic_dataset):
-    assert os.path.isdir(os.path.join(BASEDIR, 'pretrained_weights')), 'weights files are missing'
 
+def run_experiment(
+    option, use_basic_dataset, block_cell=False, pretrained_path=None, xla_jit=False, tune=False
+):
     sequence_cap = 56 if use_basic_dataset else 130
     print('Setting up data pipeline...')
 
@@ -60,12 +81,21 @@ def run_experiment(option, use_basic_dataset):
         ),
         huzzer_kwargs=huzzer_kwargs
     )
-    queue = build_single_output_queue(
-        datasource,
-        output_shape=(BATCH_SIZE, sequence_cap, TOKEN_EMB_SIZE),
-        type=tf.uint8
+
+    # the labels for the loss are computed by the queue runner thread
+    def datasource_with_labels():
+        batch = datasource()
+        return batch, np.argmax(batch, axis=-1).astype(np.int32)
+
+    queue = build_multiple_output_queue(
+        datasource_with_labels,
+        output_shapes=[
+            (BATCH_SIZE, sequence_cap, TOKEN_EMB_SIZE),
+            (BATCH_SIZE, sequence_cap)
+        ],
+        types=[tf.uint8, tf.int32]
     )
-    raw_input_sequences = queue.dequeue(name='input_sequence')
+    raw_input_sequences, real_labels = queue.dequeue(name='input_sequence')
     real_sequence_lengths = get_sequence_lengths(
         tf.cast(raw_input_sequences, tf.int32)
     )
@@ -96,7 +126,8 @@ def run_experiment(option, use_basic_dataset):
         # generator gets restored weights, and so does the
         with tf.variable_scope('generator'):
             unnormalized_generated_programs, _ = build_attention1_decoder(
-                random_vector, full_lengths, sequence_cap, TOKEN_EMB_SIZE
+                random_vector, full_lengths, sequence_cap, TOKEN_EMB_SIZE,
+                block_cell=block_cell
             )
             generated_programs = tf.nn.softmax(
                 unnormalized_generated_programs, dim=-1, name='generated_programs'
@@ -108,13 +139,15 @@ def run_experiment(option, use_basic_dataset):
             encoder_output = build_single_program_encoder(
                 tf.concat([generated_programs, real_input_sequences], axis=0),
                 sequence_lengths,
-                z_size
+                z_size,
+                block_cell=block_cell
             )
             # get the values corresponding to mus from the encoder output_shape
             assert encoder_output.get_shape()[1].value == 2 * z_size
             encoded_v = encoder_output[:, :z_size]
             reconstructed, _ = build_attention1_decoder(
-                encoded_v, sequence_lengths, sequence_cap, TOKEN_EMB_SIZE
+                encoded_v, sequence_lengths, sequence_cap, TOKEN_EMB_SIZE,
+                block_cell=block_cell
             )
             # these are the unnormalized_token_probs for g and d
             generated_reconstructed = reconstructed[:BATCH_SIZE]
@@ -129,9 +162,9 @@ def run_experiment(option, use_basic_dataset):
             )
         )
         real_loss = tf.reduce_mean(
-            ce_loss_for_sequence_batch(
+            sparse_ce_loss_for_sequence_batch(
                 unnormalized_token_probs=real_reconstructed,
-                input_sequences=real_input_sequences,
+                labels=real_labels,
                 sequence_lengths=generated_lengths,
                 max_length=sequence_cap
             )
@@ -178,60 +211,37 @@ def run_experiment(option, use_basic_dataset):
         exit(1)
 
     logdir = os.path.join(BASEDIR, ('basic_' if use_basic_dataset else '') + option + '_gan')
-
-    # build the model and initialise weights so supervisor can start where we left off
-    # if not os.path.isdir(logdir):
-    #     mkdir_p(logdir)
-    #     with tf.Session() as sess:
-    #         print('saving initial pretrained weights')
-    #         with tf.variable_scope('', reuse=True):
-    #             discriminator_vars = [
-    #                 tf.get_variable('discriminator/decoder_fully_connected/bias'),
-    #                 tf.get_variable('discriminator/decoder_fully_connected/weights'),
-    #                 tf.get_variable('discriminator/decoder_rnn/lstm_cell/biases'),
-    #                 tf.get_variable('discriminator/decoder_rnn/lstm_cell/weights'),
-    #                 tf.get_variable('discriminator/rnn/lstm_cell/biases'),
-    #                 tf.get_variable('discriminator/rnn/lstm_cell/weights'),
-    #                 tf.get_variable('discriminator/simple_attention/bias'),
-    #                 tf.get_variable('discriminator/simple_attention/weights'),
-    #             ]
-    #             generator_vars = [
-    #                 tf.get_variable('generator/decoder_fully_connected/bias'),
-    #                 tf.get_variable('generator/decoder_fully_connected/weights'),
-    #                 tf.get_variable('generator/decoder_rnn/lstm_cell/biases'),
-    #                 tf.get_variable('generator/decoder_rnn/lstm_cell/weights'),
-    #                 tf.get_variable('generator/simple_attention/bias'),
-    #                 tf.get_variable('generator/simple_attention/weights'),
-    #             ]
-    #
-    #         discriminator_saver = tf.train.Saver(
-    #             discriminator_vars
-    #         )
-    #         generator_saver = tf.train.Saver(
-    #             generator_vars
-    #         )
-    #         sess.run(tf.global_variables_initializer())
-    #         discriminator_saver.restore(
-    #             sess,
-    #             os.path.join(BASEDIR, 'pretrained_weights', 'discriminator_weights.cpkt')
-    #         )
-    #         generator_saver.restore(
-    #             sess,
-    #             os.path.join(BASEDIR, 'pretrained_weights', 'generator_weights.cpkt')
-    #         )
-    #
-    #         saver = tf.train.Saver()
-    #         saver.save(sess, os.path.join(logdir, 'model.cpkt-0'))
+    model = 'BEGAN_attention/' + ('basic_' if use_basic_dataset else '') + option + '_gan'
+    if tune:
+        autotune(model, [k_update, measure, d_train_op, g_train_op], xla_jit=xla_jit)
+        return
+
+    # the weights are only warm started when there is no checkpoint in logdir
+    # yet, later runs carry on from their own checkpoints
+    init_fn = None
+    if pretrained_path is not None:
+        init_fn = warm_start_fn(
+            tf.train.latest_checkpoint(pretrained_path, 'checkpoint.txt'),
+            PRETRAINED_RULES
+        )
 
     print('starting supervisor...')
+    # block cells save under the standard cell names, so runs can switch between them
+    if block_cell:
+        saver = tf.train.Saver(block_cell_variables_map())
+    else:
+        saver = Supervisor.USE_DEFAULT
     sv = Supervisor(
         logdir=logdir,
+        saver=saver,
+        init_fn=init_fn,
         save_model_secs=300,
         save_summaries_secs=60,
         summary_op=perf_summary_op
     )
+    timer = StepTimer('xla_jit' if xla_jit else 'default', summary_writer=sv.summary_writer)
     print('training...')
-    with sv.managed_session() as sess:
+    with sv.managed_session(config=tuned_session_config(model, xla_jit)) as sess:
 
         global_step = -1
         while not sv.should_stop():
@@ -245,7 +255,9 @@ def run_experiment(option, use_basic_dataset):
             # if global_step % 200 == 0:
                 # ops.update({'images': example_summary_op})
 
+            start_time = time.time()
             results = sess.run(ops)
+            timer.record(time.time() - start_time, results['global_step'])
 
             # if global_step % 200 == 0:
             #     images_summary = results['images']
@@ -277,5 +289,9 @@ if __name__ == '__main__':
 
     option = args.get('<option>')
     use_basic_dataset = args.get('--basic')
+    block_cell = args.get('--block-cell')
 
-    run_experiment(option, use_basic_dataset)
+    run_experiment(
+        option, use_basic_dataset, block_cell, args.get('--pretrained'), args.get('--xla'),
+        args.get('--tune')
+    )
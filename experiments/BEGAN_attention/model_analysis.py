@@ -2,22 +2,24 @@
 Model analysis for attention experiments:
 
 Usage:
-    experiment_128k.py [--basic] <option>
+    experiment_128k.py [--basic] [--batch-size=<size>] <option>
     experiment_128k.py -h | --help
 
 Options:
-    -h --help   Show this screen.
-    -b --basic  Use the basic huzzer dataset.
+    -h --help                 Show this screen.
+    -b --basic                Use the basic huzzer dataset.
+    -s --batch-size=<size>    Number of programs to generate per batch [default: 500].
 
 """
 
 from docopt import docopt
 from huzzer.tokenizing import TOKEN_MAP
-from tqdm import tqdm
+from tqdm import tqdm, trange
 import errno
 import numpy as np
 import os
 from os.path import join
+import time
 import tensorflow as tf
 from scipy.misc import imsave
 import matplotlib.pyplot as plt
@@ -29,11 +31,11 @@ import project_context  # NOQA
 # from model_utils.ops import get_sequence_lengths
 from models import (
     # build_single_program_encoder,
-    build_attention1_decoder
+    build_attention1_generator
 )
 
 
-def analyze_model(option, use_basic_dataset):
+def analyze_model(option, use_basic_dataset, batch_size=500):
     BASEDIR = os.path.dirname(os.path.realpath(__file__))
     sequence_cap = 56 if use_basic_dataset else 130
     TOKEN_EMB_SIZE = 54
@@ -59,20 +61,21 @@ def analyze_model(option, use_basic_dataset):
         #     z_size
         # )
         # z = mus_and_log_sigs[:, :z_size]
-        decoder_input = tf.placeholder(
-            shape=[1, z_size],
+        generator_input = tf.placeholder(
+            shape=[None, z_size],
             dtype=tf.float32,
             name='generator_input'
         )
-        sequence_lengths_t = tf.constant([sequence_cap])
         with tf.variable_scope('generator'):
-            decoder_output, attention_weights_t = build_attention1_decoder(
-                decoder_input,
-                sequence_lengths_t,
+            (
+                generated_token_probs_t,
+                generated_lengths_t,
+                generated_attention_weights_t
+            ) = build_attention1_generator(
+                generator_input,
                 sequence_cap,
                 TOKEN_EMB_SIZE
             )
-        token_probs_t = tf.nn.softmax(decoder_output)
 
         print('z_size={}'.format(z_size))
     else:
@@ -149,28 +152,45 @@ def analyze_model(option, use_basic_dataset):
 
     # generate_bit
     generated_examples_path = join(examples_dir, 'generated')
-    message = 'Generating {} examples'.format(
+    zs = np.random.normal(0, 0.1, (NUMBER_OF_EXAMPLES, z_size))
+    generated = []
+    start_time = time.time()
+    for i in trange(0, NUMBER_OF_EXAMPLES, batch_size, desc='Generating batches'):
+        token_probs, lengths, attention_weights = sess.run(
+            [generated_token_probs_t, generated_lengths_t, generated_attention_weights_t],
+            feed_dict={
+                generator_input: zs[i:i + batch_size]
+            }
+        )
+        generated += zip(token_probs, lengths, attention_weights)
+    time_taken = time.time() - start_time
+    number_of_tokens = sum(length for _, length, _ in generated)
+    print('generated {} tokens in {:.2f}s, {:.1f} tokens/sec'.format(
+        number_of_tokens, time_taken, number_of_tokens / time_taken
+    ))
+
+    message = 'Writing {} generated examples'.format(
         NUMBER_OF_EXAMPLES,
     )
-    for i in tqdm(
-        range(NUMBER_OF_EXAMPLES), desc=message, total=NUMBER_OF_EXAMPLES
-    ):
+    for i, (z_gen, (token_probs, length, attention_weights)) in enumerate(tqdm(
+        zip(zs, generated), desc=message, total=NUMBER_OF_EXAMPLES
+    )):
         dir_for_example = join(generated_examples_path, str(i))
         mkdir_p(dir_for_example)
 
-        z_gen = np.random.normal(0, 0.1, z_size)
         imsave(join(dir_for_example, 'z.png'), z_gen.reshape((z_gen.size // 32, 32)))
-        token_probs, attention_weights = sess.run(
-            [token_probs_t, attention_weights_t],
-            feed_dict={
-                decoder_input: np.expand_dims(z_gen, 0)
-            }
-        )
-        token_probs = np.squeeze(token_probs)
-        tokens = np.argmax(token_probs, axis=-1)
-        end_of_code = np.argmax(tokens == 0) or sequence_cap
+        # as before, the code runs up to its first end token, which is not
+        # written, or to sequence_cap when it has none or starts with it
+        ends_with_end_token = token_probs[length - 1].argmax() == 0
+        if ends_with_end_token and length > 1:
+            end_of_code = length - 1
+        else:
+            end_of_code = sequence_cap
         token_probs = token_probs[:end_of_code]
-        attention_weights = attention_weights[:end_of_code]
+        attention_weights = [
+            np.expand_dims(weights[:t + 1], 0)
+            for t, weights in enumerate(attention_weights[:end_of_code])
+        ]
         output_code = example_to_code(token_probs)
 
         visualize_attention_weights(output_code, attention_weights, join(dir_for_example, 'attention_weights'))
@@ -258,4 +278,5 @@ if __name__ == '__main__':
     args = docopt(__doc__, version='N/A')
     option = args.get('<option>')
     use_basic_dataset = args.get('--basic')
-    analyze_model(option, use_basic_dataset)
+    batch_size = int(args.get('--batch-size'))
+    analyze_model(option, use_basic_dataset, batch_size)
@@ -42,22 +42,10 @@ def run_experiment(option):
     )
     # Get a TensorFlow session managed by the supervisor.
     with sv.managed_session() as sess:
-        # Use the session to train the graph.
-
-        d_loss = 5
-        g_loss = 4
-        steps_without_d_training = 0
-        i = 0
+        # Use the session to train the graph, the discriminator is only trained
+        # while its loss is above the generator's, see build_fused_train_op
         while not sv.should_stop():
-            # if d_loss > 0.5 or steps_without_d_training > 50:
-            if d_loss > g_loss or i > 6000:
-                steps_without_d_training = 0
-                d_loss = sess.run(training_ops['train_discriminator'])
-            # else:
-            #     steps_without_d_training += 1
-
-            # sess.run(training_ops['train_discriminator'])
-            g_loss = sess.run(training_ops['train_generator'])
+            sess.run(training_ops['train_gan'])
 
 
 if __name__ == '__main__':
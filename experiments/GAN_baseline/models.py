@@ -18,7 +18,8 @@ NAMES = {
     'generator_loss',
     'discriminator_loss',
     'train_discriminator',
-    'train_generator'
+    'train_generator',
+    'train_gan'
 }
 
 
@@ -56,24 +57,89 @@ def build_mnist_gan_for_training(mnist_batch_queue):
         discriminator_params = [p for p in params if p.name.startswith('model/discriminator')]
         generator_params = [p for p in params if p.name.startswith('model/generator')]
 
+        discriminator_optimizer = tf.train.AdamOptimizer(learning_rate / 100)
+        generator_optimizer = tf.train.AdamOptimizer(learning_rate)
+
         # might need to pass in update_ops=[]
         train_discriminator = slim.learning.create_train_op(
             d_loss,
-            tf.train.AdamOptimizer(learning_rate / 100),
+            discriminator_optimizer,
             variables_to_train=discriminator_params
         )
         train_generator = slim.learning.create_train_op(
             g_loss,
-            tf.train.AdamOptimizer(learning_rate),
+            generator_optimizer,
             variables_to_train=generator_params
         )
+        train_gan = build_fused_train_op(
+            d_loss, g_loss,
+            discriminator_optimizer, discriminator_params,
+            generator_optimizer, generator_params
+        )
 
         return {
             'train_discriminator': train_discriminator.name,
-            'train_generator': train_generator.name
+            'train_generator': train_generator.name,
+            'train_gan': train_gan.name
         }
 
 
+def build_fused_train_op(
+    d_loss, g_loss, discriminator_optimizer, discriminator_params,
+    generator_optimizer, generator_params
+):
+    """
+    A train op which updates the discriminator and the generator from a single
+    forward pass, so a single dequeued batch and generated batch, in one
+    sess.run. The discriminator is only updated while its loss of the last step
+    is above the generator's, the balancing of the training loop, now a tf.cond.
+    Both updates use the gradients of the same forward pass, rather than the
+    generator's being taken after the discriminator's update.
+
+    The optimizers must have been used for the separate train ops already, so
+    that their slots are not created in the tf.cond.
+
+    returns: the op, which also runs the batch norm updates once
+    """
+    global_step = tf.contrib.framework.get_or_create_global_step()
+    # the losses of the last step, initialized as the training loop used to be
+    previous_d_loss = tf.Variable(5.0, trainable=False, name='previous_discriminator_loss')
+    previous_g_loss = tf.Variable(4.0, trainable=False, name='previous_generator_loss')
+
+    d_gradients = discriminator_optimizer.compute_gradients(d_loss, discriminator_params)
+    g_gradients = generator_optimizer.compute_gradients(g_loss, generator_params)
+
+    # every variable is read by the forward pass and the gradients before it
+    # is updated
+    forward_and_backward = [d_loss, g_loss] + [
+        gradient for gradient, _ in d_gradients + g_gradients if gradient is not None
+    ]
+    update_ops = tf.get_collection(tf.GraphKeys.UPDATE_OPS)
+    with tf.control_dependencies(forward_and_backward + update_ops):
+        def train_discriminator():
+            with tf.control_dependencies([
+                discriminator_optimizer.apply_gradients(d_gradients)
+            ]):
+                return tf.identity(d_loss)
+
+        d_loss_after = tf.cond(
+            previous_d_loss > previous_g_loss,
+            train_discriminator,
+            lambda: tf.identity(previous_d_loss)
+        )
+        train_generator = generator_optimizer.apply_gradients(
+            g_gradients, global_step=global_step
+        )
+
+    # the last losses are only replaced after the tf.cond has read them
+    with tf.control_dependencies([d_loss_after, train_generator]):
+        return tf.group(
+            tf.assign(previous_d_loss, d_loss_after),
+            tf.assign(previous_g_loss, g_loss),
+            name='train_gan'
+        )
+
+
 def build_discriminator(input_t, reuse=False):
     """Create encoder network.
     Args:
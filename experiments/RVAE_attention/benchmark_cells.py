@@ -0,0 +1,101 @@
+"""
+Benchmark the standard LSTMCell against the fused LSTMBlockCell on CPU, for the
+encoder and attention decoder used in the attention experiments.
+
+Usage:
+    benchmark_cells.py [--basic] [--batch-size=<size>] <z_size>
+    benchmark_cells.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -b --basic                Use the sequence length of the basic huzzer dataset.
+    -s --batch-size=<size>    Batch size to benchmark with [default: 128].
+
+"""
+from docopt import docopt
+import numpy as np
+
+import project_context  # NOQA
+from model_utils.benchmark import time_run, print_table
+from model_utils.ops import get_sequence_lengths
+from models import (
+    build_attention1_decoder,
+    build_single_program_encoder,
+)
+
+import tensorflow as tf
+
+TOKEN_EMB_SIZE = 54
+
+
+def benchmark_cells(z_size, sequence_cap, batch_size):
+    input_data = random_one_hot_batch(batch_size, sequence_cap, TOKEN_EMB_SIZE)
+    z_data = np.random.normal(0, 0.1, (batch_size, z_size)).astype(np.float32)
+
+    rows = []
+    for block_cell in [False, True]:
+        with tf.Graph().as_default():
+            input_sequences = tf.constant(input_data)
+            sequence_lengths = get_sequence_lengths(tf.cast(input_sequences, tf.int32))
+            encoder_output = build_single_program_encoder(
+                input_sequences, sequence_lengths, z_size, block_cell=block_cell
+            )
+            encoder_gradients = tf.gradients(
+                tf.reduce_sum(encoder_output), tf.trainable_variables()
+            )
+
+            decoder_output, _ = build_attention1_decoder(
+                tf.constant(z_data), sequence_lengths, sequence_cap, TOKEN_EMB_SIZE,
+                block_cell=block_cell
+            )
+            decoder_variables = [
+                v for v in tf.trainable_variables() if not v.name.startswith('rnn/')
+            ]
+            decoder_gradients = tf.gradients(
+                tf.reduce_sum(decoder_output), decoder_variables
+            )
+
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                timings = [
+                    time_run(sess, encoder_output),
+                    time_run(sess, encoder_gradients),
+                    time_run(sess, decoder_output),
+                    time_run(sess, decoder_gradients),
+                ]
+        rows += [
+            ['LSTMBlockCell' if block_cell else 'LSTMCell'] +
+            # milliseconds per recurrent step
+            [1000 * t / sequence_cap for t in timings]
+        ]
+
+    rows += [
+        ['speedup'] + [standard / block for standard, block in zip(rows[0][1:], rows[1][1:])]
+    ]
+    print('ms per step, batch_size={}, sequence_cap={}, z_size={}'.format(
+        batch_size, sequence_cap, z_size
+    ))
+    print_table(
+        ['cell', 'encoder', 'encoder + grads', 'decoder', 'decoder + grads'],
+        rows
+    )
+
+
+def random_one_hot_batch(batch_size, sequence_cap, token_emb_size):
+    """
+    Random token sequences of random lengths, padded with the zero token.
+    """
+    tokens = np.random.randint(1, token_emb_size, (batch_size, sequence_cap))
+    lengths = np.random.randint(1, sequence_cap, batch_size)
+    tokens[np.arange(sequence_cap) >= lengths[:, None]] = 0
+    return np.eye(token_emb_size, dtype=np.float32)[tokens]
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    sequence_cap = 56 if args.get('--basic') else 130
+    benchmark_cells(
+        int(args.get('<z_size>')),
+        sequence_cap,
+        int(args.get('--batch-size'))
+    )
@@ -0,0 +1,104 @@
+"""
+Benchmark the dense, masked ce_loss_for_sequence_batch against the sparse,
+partitioned sparse_ce_loss_for_sequence_batch on CPU, both for the loss on its
+own and for a training step of the attention decoder.
+
+Usage:
+    benchmark_losses.py [--basic] [--batch-size=<size>] <z_size>
+    benchmark_losses.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -b --basic                Use the sequence length of the basic huzzer dataset.
+    -s --batch-size=<size>    Batch size to benchmark with [default: 128].
+
+"""
+from docopt import docopt
+import numpy as np
+
+import project_context  # NOQA
+from model_utils.benchmark import time_run, print_table
+from model_utils.loss_functions import (
+    ce_loss_for_sequence_batch,
+    sparse_ce_loss_for_sequence_batch,
+)
+from model_utils.ops import get_sequence_lengths
+from models import build_attention1_decoder
+from benchmark_cells import random_one_hot_batch
+
+import tensorflow as tf
+
+TOKEN_EMB_SIZE = 54
+
+
+def benchmark_losses(z_size, sequence_cap, batch_size):
+    input_data = random_one_hot_batch(batch_size, sequence_cap, TOKEN_EMB_SIZE)
+    labels_data = np.argmax(input_data, axis=-1).astype(np.int32)
+    z_data = np.random.normal(0, 0.1, (batch_size, z_size)).astype(np.float32)
+
+    rows = []
+    for sparse in [False, True]:
+        with tf.Graph().as_default():
+            input_sequences = tf.constant(input_data)
+            labels = tf.constant(labels_data)
+            sequence_lengths = get_sequence_lengths(tf.cast(input_sequences, tf.int32))
+
+            decoder_output, _ = build_attention1_decoder(
+                tf.constant(z_data), sequence_lengths, sequence_cap, TOKEN_EMB_SIZE
+            )
+            # the loss on its own is timed on fixed logits
+            logits = tf.Variable(
+                tf.random_normal((batch_size, sequence_cap, TOKEN_EMB_SIZE))
+            )
+
+            if sparse:
+                def loss_fn(unnormalized_token_probs):
+                    return tf.reduce_mean(sparse_ce_loss_for_sequence_batch(
+                        unnormalized_token_probs, labels, sequence_lengths,
+                        sequence_cap
+                    ))
+            else:
+                def loss_fn(unnormalized_token_probs):
+                    return tf.reduce_mean(ce_loss_for_sequence_batch(
+                        unnormalized_token_probs, input_sequences, sequence_lengths,
+                        sequence_cap
+                    ))
+
+            loss = loss_fn(logits)
+            loss_gradients = tf.gradients(loss, logits)
+            decoder_loss = loss_fn(decoder_output)
+            decoder_variables = [v for v in tf.trainable_variables() if v is not logits]
+            train_step = tf.train.AdamOptimizer().minimize(
+                decoder_loss, var_list=decoder_variables
+            )
+
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                timings = [
+                    time_run(sess, loss),
+                    time_run(sess, loss_gradients),
+                    time_run(sess, train_step),
+                ]
+        rows += [
+            ['sparse' if sparse else 'dense'] +
+            # milliseconds per batch
+            [1000 * t for t in timings]
+        ]
+
+    rows += [
+        ['speedup'] + [dense / sparse for dense, sparse in zip(rows[0][1:], rows[1][1:])]
+    ]
+    print('ms per batch, batch_size={}, sequence_cap={}, z_size={}'.format(
+        batch_size, sequence_cap, z_size
+    ))
+    print_table(['loss', 'loss', 'loss + grads', 'decoder train step'], rows)
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    sequence_cap = 56 if args.get('--basic') else 130
+    benchmark_losses(
+        int(args.get('<z_size>')),
+        sequence_cap,
+        int(args.get('--batch-size'))
+    )
@@ -0,0 +1,148 @@
+"""
+Compares sampling, greedy and beam search decoding of the attention decoder, with
+and without the huzzer grammar constraints of model_utils.grammar, by wall time,
+cpu time and the number of generated programs which compile. The attention
+decoder does not read its own outputs, so everything but unconstrained greedy
+decoding runs on the token probs of one full length pass of the decoder.
+
+Options starting with attention1_gan are generators from BEGAN_attention.
+
+Usage:
+    compare_decoding.py [--basic] [--number=<n>] [--batch-size=<size>] [--beam-width=<k>] [--alpha=<a>] <option>
+    compare_decoding.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -b --basic                Use the basic huzzer dataset.
+    -n --number=<n>           Number of latent vectors to decode [default: 500].
+    -s --batch-size=<size>    Number of latent vectors per batch [default: 100].
+    -k --beam-width=<k>       Beam width for beam search [default: 8].
+    -a --alpha=<a>            Length penalty exponent for beam search [default: 0.6].
+
+"""
+from docopt import docopt
+import numpy as np
+from os.path import join
+import tensorflow as tf
+
+import project_context  # NOQA
+from model_utils.benchmark import print_table
+from model_utils.evaluation import DECODING_REPORT_HEADERS, decoding_report_row
+from model_utils.generation import sample_sequences, beam_search, fixed_logits_step_fn
+from model_utils.grammar import HuzzerGrammar, constrained_step_fn
+from model_utils.sampling import probs_to_logits
+from models import build_attention1_generator, default_lstm_cell
+
+BASEDIR = 'experiments/RVAE_attention'
+GAN_BASEDIR = 'experiments/BEGAN_attention'
+TOKEN_EMB_SIZE = 54
+
+
+def compare_decoding(option, use_basic_dataset, number, batch_size, beam_width, alpha):
+    sequence_cap = 56 if use_basic_dataset else 130
+    z_size = int(option.split('_')[-1])
+    is_gan = option.startswith('attention1_gan')
+    path = join(
+        GAN_BASEDIR if is_gan else BASEDIR,
+        '{}{}'.format('basic_' if use_basic_dataset else '', option)
+    )
+    zs = np.random.normal(0, 0.1, (number, z_size))
+    grammar = HuzzerGrammar(TOKEN_EMB_SIZE)
+
+    generator_input = tf.placeholder(
+        shape=[None, z_size],
+        dtype=tf.float32,
+        name='generator_input'
+    )
+
+    def build_generators():
+        rnn_cell = default_lstm_cell(z_size)
+        greedy_token_probs_t, greedy_lengths_t, _ = build_attention1_generator(
+            generator_input, sequence_cap, TOKEN_EMB_SIZE, rnn_cell=rnn_cell
+        )
+        token_probs_t, _, _ = build_attention1_generator(
+            generator_input, sequence_cap, TOKEN_EMB_SIZE, reuse=True, early_exit=False,
+            rnn_cell=rnn_cell
+        )
+        return greedy_token_probs_t, greedy_lengths_t, token_probs_t
+
+    if is_gan:
+        with tf.variable_scope('generator'):
+            greedy_token_probs_t, greedy_lengths_t, token_probs_t = build_generators()
+    else:
+        greedy_token_probs_t, greedy_lengths_t, token_probs_t = build_generators()
+
+    saver = tf.train.Saver()
+    with tf.Session() as sess:
+        saver.restore(sess, tf.train.latest_checkpoint(path, 'checkpoint.txt'))
+
+        def decode_greedily():
+            programs = []
+            for i in range(0, number, batch_size):
+                token_probs, lengths = sess.run(
+                    [greedy_token_probs_t, greedy_lengths_t],
+                    feed_dict={generator_input: zs[i:i + batch_size]}
+                )
+                programs += [
+                    np.argmax(probs[:length], axis=-1)
+                    for probs, length in zip(token_probs, lengths)
+                ]
+            return programs
+
+        def decode_with(decode_batch):
+            def decode():
+                programs = []
+                for i in range(0, number, batch_size):
+                    logits = probs_to_logits(sess.run(
+                        token_probs_t, feed_dict={generator_input: zs[i:i + batch_size]}
+                    ))
+                    programs += decode_batch({'logits': logits})
+                return programs
+            return decode
+
+        def sample_batch(step_fn, temperature=1.0):
+            def decode_batch(state):
+                return sample_sequences(step_fn, state, sequence_cap, temperature=temperature)
+            return decode_batch
+
+        def beam_search_batch(step_fn):
+            def decode_batch(state):
+                hypotheses = beam_search(step_fn, state, beam_width, sequence_cap, alpha=alpha)
+                return [row[0][0] for row in hypotheses]
+            return decode_batch
+
+        constrained = constrained_step_fn(fixed_logits_step_fn, grammar)
+        beam_search_name = 'beam search, k={}'.format(beam_width)
+        rows = [
+            decoding_report_row('sampling', decode_with(sample_batch(fixed_logits_step_fn))),
+            decoding_report_row('greedy', decode_greedily),
+            decoding_report_row(
+                beam_search_name, decode_with(beam_search_batch(fixed_logits_step_fn))
+            ),
+            decoding_report_row(
+                'sampling + grammar', decode_with(sample_batch(constrained))
+            ),
+            decoding_report_row(
+                'greedy + grammar', decode_with(sample_batch(constrained, temperature=0))
+            ),
+            decoding_report_row(
+                beam_search_name + ' + grammar', decode_with(beam_search_batch(constrained))
+            ),
+        ]
+
+    print('{}{}, {} latent vectors'.format(
+        'basic_' if use_basic_dataset else '', option, number
+    ))
+    print_table(DECODING_REPORT_HEADERS, rows)
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    compare_decoding(
+        args.get('<option>'),
+        args.get('--basic'),
+        int(args.get('--number')),
+        int(args.get('--batch-size')),
+        int(args.get('--beam-width')),
+        float(args.get('--alpha'))
+    )
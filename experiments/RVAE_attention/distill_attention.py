@@ -0,0 +1,142 @@
+"""
+Distills a trained attention1 decoder into a GRU student, which is trained on the
+teacher's token probs for latent vectors z ~ N(0, Z_STD), the latent vectors the
+model analyses generate from. The student does not read its own outputs either,
+and runs in one dynamic_rnn pass, rather than attending over all of its previous
+hidden states at every step.
+
+Usage:
+    distill_attention.py [--basic] [--hidden-size=<size>] [--temperature=<t>] [--steps=<n>] <option>
+    distill_attention.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -b --basic                Use the basic huzzer dataset.
+    -s --hidden-size=<size>   Size of the student's GRU [default: 256].
+    -t --temperature=<t>      Distillation temperature [default: 2.0].
+    -n --steps=<n>            Number of training steps [default: 20000].
+
+"""
+from docopt import docopt
+import logging
+import os
+
+import project_context  # NOQA
+from model_utils.loss_functions import distillation_loss_for_sequence_batch
+from models import build_attention1_generator, fully_connected
+from experiments.Recurrent_VAE_baseline.models import default_gru_cell
+
+import tensorflow as tf
+from tensorflow.python.training.supervisor import Supervisor
+tf.logging.set_verbosity(tf.logging.INFO)
+slim = tf.contrib.slim
+
+BASEDIR = os.path.dirname(os.path.realpath(__file__))
+
+TOKEN_EMB_SIZE = 54
+BATCH_SIZE = 128
+Z_STD = 0.1
+
+
+def run_distillation(option, use_basic_dataset, hidden_size, temperature, steps):
+    sequence_cap = 56 if use_basic_dataset else 130
+    z_size = int(option.split('_')[-1])
+    teacher_logdir = os.path.join(
+        BASEDIR, ('basic_' if use_basic_dataset else '') + option
+    )
+
+    print('Building model..')
+    z = tf.random_normal((BATCH_SIZE, z_size), stddev=Z_STD)
+    teacher_token_probs, teacher_lengths, _ = build_attention1_generator(
+        z, sequence_cap, TOKEN_EMB_SIZE, early_exit=False
+    )
+    teacher_saver = tf.train.Saver()
+
+    student_logits = build_gru_student(z, sequence_cap, TOKEN_EMB_SIZE, hidden_size)
+    distillation_loss = tf.reduce_mean(distillation_loss_for_sequence_batch(
+        tf.stop_gradient(teacher_token_probs),
+        student_logits,
+        teacher_lengths,
+        sequence_cap,
+        temperature
+    ))
+    tf.summary.scalar('distillation_loss', distillation_loss)
+
+    optimizer = tf.train.AdamOptimizer(1e-3)
+    print('creating train op...')
+    train_op = slim.learning.create_train_op(
+        distillation_loss, optimizer,
+        variables_to_train=tf.get_collection(
+            tf.GraphKeys.TRAINABLE_VARIABLES, scope='student'
+        )
+    )
+
+    # the teacher is restored only when the student starts from scratch, later
+    # runs restore both from the student's own checkpoints
+    def restore_teacher(sess):
+        teacher_saver.restore(
+            sess, tf.train.latest_checkpoint(teacher_logdir, 'checkpoint.txt')
+        )
+
+    print('starting supervisor...')
+    sv = Supervisor(
+        logdir=student_logdir(option, use_basic_dataset, hidden_size),
+        init_fn=restore_teacher,
+        save_model_secs=300,
+        save_summaries_secs=60
+    )
+    print('training...')
+    with sv.managed_session() as sess:
+        step = sess.run(sv.global_step)
+        while not sv.should_stop() and step < steps:
+            step, _ = sess.run([sv.global_step, train_op])
+        sv.saver.save(sess, sv.save_path, global_step=sv.global_step)
+
+
+def build_gru_student(z, max_length, token_emb_size, hidden_size, reuse=False):
+    """
+    A single GRU, started from a projection of z and given z at every step, as
+    build_program_decoder's GRU is given its look behind tokens.
+
+    returns: the token logits (b x max_length x token_emb_size)
+    """
+    with tf.variable_scope('student', reuse=reuse):
+        initial_state = tf.tanh(
+            fully_connected(z, hidden_size, 'initial_state', reuse=reuse)
+        )
+        inputs = tf.tile(tf.expand_dims(z, 1), (1, max_length, 1))
+        outputs, _ = tf.nn.dynamic_rnn(
+            default_gru_cell(hidden_size),
+            inputs,
+            initial_state=initial_state,
+            scope='decoder'
+        )
+        return fully_connected(
+            outputs, token_emb_size, 'decoder_fully_connected', reuse=reuse
+        )
+
+
+def student_logdir(option, use_basic_dataset, hidden_size):
+    return os.path.join(
+        BASEDIR,
+        '{}{}_gru_student_{}'.format(
+            'basic_' if use_basic_dataset else '', option, hidden_size
+        )
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        format='%(asctime)s %(message)s',
+        datefmt='%m/%d/%Y %I:%M:%S %p',
+        level=logging.INFO
+    )
+    args = docopt(__doc__, version='N/A')
+
+    run_distillation(
+        args.get('<option>'),
+        args.get('--basic'),
+        int(args.get('--hidden-size')),
+        float(args.get('--temperature')),
+        int(args.get('--steps'))
+    )
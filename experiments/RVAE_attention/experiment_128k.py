@@ -2,27 +2,34 @@
 Attention experiments:
 
 Usage:
-    experiment_128k.py [--basic] <option>
+    experiment_128k.py [--basic] [--block-cell] [--xla] [--tune] <option>
     experiment_128k.py -h | --help
 
 Options:
-    -h --help   Show this screen.
-    -b --basic  Use the basic huzzer dataset.
+    -h --help         Show this screen.
+    -b --basic        Use the basic huzzer dataset.
+    -c --block-cell   Use fused LSTMBlockCells (checkpoints stay compatible).
+    -x --xla          Compile the graph with XLA JIT.
+    --tune            Benchmark the training step's thread pools and cpu affinity on this machine,
+                      save the fastest profile, which later runs use, and exit.
 
 """
 
 from sys import argv
 import numpy as np
 import os
+import time
 from docopt import docopt
 
 import logging
 import project_context  # NOQA
 from pipelines.one_hot_token import one_hot_token_random_batcher
 from pipelines.data_sources import BASIC_DATASET_ARGS
-from model_utils.queues import build_single_output_queue
-from model_utils.loss_functions import kl_divergence, ce_loss_for_sequence_batch
+from model_utils.queues import build_multiple_output_queue
+from model_utils.loss_functions import kl_divergence, sparse_ce_loss_for_sequence_batch
 from model_utils.ops import get_sequence_lengths, resampling
+from model_utils.checkpoints import block_cell_variables_map
+from model_utils.sessions import StepTimer, autotune, tuned_session_config
 from models import (
     build_attention1_decoder,
     build_single_program_encoder,
@@ -40,7 +47,7 @@ BATCH_SIZE = 128
 NUMBER_BATCHES = 1000
 
 
-def run_experiment(option, use_basic_dataset):
+def run_experiment(option, use_basic_dataset, block_cell=False, xla_jit=False, tune=False):
     sequence_cap = 56 if use_basic_dataset else 130
     print('Setting up data pipeline...')
 
@@ -56,12 +63,21 @@ def run_experiment(option, use_basic_dataset):
         ),
         huzzer_kwargs=huzzer_kwargs
     )
-    queue = build_single_output_queue(
-        datasource,
-        output_shape=(BATCH_SIZE, sequence_cap, TOKEN_EMB_SIZE),
-        type=tf.uint8
+
+    # the labels for the loss are computed by the queue runner thread
+    def datasource_with_labels():
+        batch = datasource()
+        return batch, np.argmax(batch, axis=-1).astype(np.int32)
+
+    queue = build_multiple_output_queue(
+        datasource_with_labels,
+        output_shapes=[
+            (BATCH_SIZE, sequence_cap, TOKEN_EMB_SIZE),
+            (BATCH_SIZE, sequence_cap)
+        ],
+        types=[tf.uint8, tf.int32]
     )
-    raw_input_sequences = queue.dequeue(name='input_sequence')
+    raw_input_sequences, labels = queue.dequeue(name='input_sequence')
     sequence_lengths = get_sequence_lengths(
         tf.cast(raw_input_sequences, tf.int32)
     )
@@ -70,15 +86,18 @@ def run_experiment(option, use_basic_dataset):
     print('Building model..')
     if option.startswith('attention1'):
         z_size = int(option.split('_')[-1])
-        encoder_output = build_single_program_encoder(input_sequences, sequence_lengths, z_size)
+        encoder_output = build_single_program_encoder(
+            input_sequences, sequence_lengths, z_size, block_cell=block_cell
+        )
         z_resampled = resampling(encoder_output)
         decoder_output, _ = build_attention1_decoder(
-            z_resampled, sequence_lengths, sequence_cap, TOKEN_EMB_SIZE
+            z_resampled, sequence_lengths, sequence_cap, TOKEN_EMB_SIZE,
+            block_cell=block_cell
         )
         cross_entropy_loss = tf.reduce_mean(
-            ce_loss_for_sequence_batch(
+            sparse_ce_loss_for_sequence_batch(
                 decoder_output,
-                input_sequences,
+                labels,
                 sequence_lengths,
                 sequence_cap
             )
@@ -97,16 +116,29 @@ def run_experiment(option, use_basic_dataset):
     optimizer = tf.train.AdamOptimizer(1e-3)
     print('creating train op...')
     train_op = slim.learning.create_train_op(total_loss_op, optimizer)
+    model = 'RVAE_attention/' + ('basic_' if use_basic_dataset else '') + option
+    if tune:
+        autotune(model, train_op, xla_jit=xla_jit)
+        return
     print('starting supervisor...')
+    # block cells save under the standard cell names, so runs can switch between them
+    if block_cell:
+        saver = tf.train.Saver(block_cell_variables_map())
+    else:
+        saver = Supervisor.USE_DEFAULT
     sv = Supervisor(
         logdir=logdir,
+        saver=saver,
         save_model_secs=300,
         save_summaries_secs=60
     )
+    timer = StepTimer('xla_jit' if xla_jit else 'default', summary_writer=sv.summary_writer)
     print('training...')
-    with sv.managed_session() as sess:
+    with sv.managed_session(config=tuned_session_config(model, xla_jit)) as sess:
         while not sv.should_stop():
-            total_loss, _ = sess.run([total_loss_op, train_op])
+            start_time = time.time()
+            total_loss, _, global_step = sess.run([total_loss_op, train_op, sv.global_step])
+            timer.record(time.time() - start_time, global_step)
 
 
 if __name__ == '__main__':
@@ -119,5 +151,6 @@ if __name__ == '__main__':
 
     option = args.get('<option>')
     use_basic_dataset = args.get('--basic')
+    block_cell = args.get('--block-cell')
 
-    run_experiment(option, use_basic_dataset)
+    run_experiment(option, use_basic_dataset, block_cell, args.get('--xla'), args.get('--tune'))
@@ -0,0 +1,199 @@
+"""
+Exports the attention1 decoder of an experiment to an .npz for
+model_utils.numpy_step_decoders, checks the NumPy steps against
+build_attention1_generator_steps, and benchmarks greedy generation with NumPy
+against tensorflow, a sess.run per token and the while_loop generator of
+model_analysis.
+
+Usage:
+    export_step_decoder.py [--basic] [--number=<n>] [--batch-size=<size>] [--int8] <option> [<path>]
+    export_step_decoder.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -b --basic                Use the basic huzzer dataset.
+    -n --number=<n>           Number of programs to generate per decoder [default: 500].
+    -s --batch-size=<size>    Number of programs to generate per batch [default: 500].
+    -q --int8                 Also write an int8 copy of the decoder, and benchmark it.
+
+<path> defaults to the experiment's directory, step_decoder.npz, the int8 copy
+is written beside it
+
+"""
+from docopt import docopt
+import numpy as np
+from os.path import join
+import time
+import tensorflow as tf
+
+import project_context  # NOQA
+from model_utils.benchmark import print_table
+from model_utils.generation import sample_sequences
+from model_utils.numpy_decoders import softmax
+from model_utils.numpy_step_decoders import (
+    initial_attention1_state,
+    load_step_decoder,
+    save_step_decoder
+)
+from model_utils.quantization import quantize_file, quantized_path
+from model_utils.sampling import probs_to_logits
+from models import build_attention1_generator, build_attention1_generator_steps
+
+BASEDIR = 'experiments/RVAE_attention'
+TOKEN_EMB_SIZE = 54
+VARIABLE_NAMES = {
+    'lstm_weights': 'decoder_rnn/lstm_cell/weights',
+    'lstm_biases': 'decoder_rnn/lstm_cell/biases',
+    'fc_weights': 'decoder_fully_connected/weights',
+    'fc_bias': 'decoder_fully_connected/bias',
+    'attention_weights': 'simple_attention/weights',
+    'attention_bias': 'simple_attention/bias',
+}
+# the state of build_attention1_generator_steps, in the order of its placeholders
+STATE_NAMES = ['i', 'c_state', 'h_state', 'attention_v', 'hidden_states']
+HEADERS = [
+    'decoder', 'programs', 'tokens', 'wall time (s)', 'tokens per second',
+    'same programs'
+]
+
+
+def export_step_decoder(option, use_basic_dataset, path, number, batch_size, int8):
+    sequence_cap = 56 if use_basic_dataset else 130
+    z_size = int(option.split('_')[-1])
+    checkpoint_path = join(BASEDIR, ('basic_' if use_basic_dataset else '') + option)
+    if path is None:
+        path = join(checkpoint_path, 'step_decoder.npz')
+    zs = np.random.normal(0, 0.1, (number, z_size))
+    config = tf.ConfigProto(device_count={'GPU': 0})
+
+    with tf.Graph().as_default():
+        generator_steps = build_attention1_generator_steps(
+            z_size, sequence_cap, TOKEN_EMB_SIZE
+        )
+        variables = {v.op.name: v for v in tf.global_variables()}
+        saver = tf.train.Saver()
+        with tf.Session(config=config) as sess:
+            saver.restore(sess, tf.train.latest_checkpoint(checkpoint_path, 'checkpoint.txt'))
+            weights = sess.run({
+                key: variables[name] for key, name in VARIABLE_NAMES.items()
+            })
+            save_step_decoder(path, 'attention1', max_length=sequence_cap, **weights)
+            print('wrote {} variables to {}'.format(len(weights), path))
+
+            # all the steps, from the first, in one run
+            step_fn, initial_state = load_step_decoder(path)
+            placeholders, token_probs_t, _ = generator_steps
+            state = initial_state(zs[:batch_size])
+            expected_token_probs = sess.run(token_probs_t, feed_dict=dict(zip(
+                placeholders,
+                [0, sequence_cap] + [state[name] for name in STATE_NAMES[1:]]
+            )))
+            token_probs = []
+            for t in range(sequence_cap):
+                # the decoder does not read its tokens, only their number
+                logits, state = step_fn(state, np.zeros((len(state['i']), t), dtype=np.int64))
+                token_probs += [softmax(logits)]
+            print('largest absolute difference from tensorflow: {:.3g}'.format(
+                np.max(np.abs(np.stack(token_probs, axis=1) - expected_token_probs))
+            ))
+
+            tf_programs, tf_time = generate_greedily(
+                tf_step_fn(sess, generator_steps), zs, batch_size, sequence_cap
+            )
+
+    with tf.Graph().as_default():
+        z = tf.placeholder(tf.float32, (None, z_size), name='z')
+        generator = build_attention1_generator(z, sequence_cap, TOKEN_EMB_SIZE)
+        saver = tf.train.Saver()
+        with tf.Session(config=config) as sess:
+            saver.restore(sess, tf.train.latest_checkpoint(checkpoint_path, 'checkpoint.txt'))
+            loop_programs = []
+            start_time = time.time()
+            for i in range(0, number, batch_size):
+                token_probs, lengths, _ = sess.run(
+                    generator, feed_dict={z: zs[i:i + batch_size]}
+                )
+                loop_programs += [
+                    np.argmax(probs[:length], axis=-1)
+                    for probs, length in zip(token_probs, lengths)
+                ]
+            loop_time = time.time() - start_time
+
+    numpy_programs, numpy_time = generate_greedily(step_fn, zs, batch_size, sequence_cap)
+    rows = [
+        generation_row('numpy', numpy_programs, numpy_time, tf_programs),
+    ]
+    if int8:
+        quantize_file(path, quantized_path(path))
+        int8_step_fn, _ = load_step_decoder(quantized_path(path))
+        int8_programs, int8_time = generate_greedily(int8_step_fn, zs, batch_size, sequence_cap)
+        rows += [
+            generation_row('numpy, int8', int8_programs, int8_time, tf_programs),
+            generation_row('numpy, int8 against float32', int8_programs, int8_time, numpy_programs),
+        ]
+    print('{}{}, {} greedy programs on cpu'.format(
+        'basic_' if use_basic_dataset else '', option, number
+    ))
+    print_table(HEADERS, [
+        generation_row('tensorflow, sess.run per token', tf_programs, tf_time, tf_programs),
+        generation_row('tensorflow, while_loop', loop_programs, loop_time, tf_programs),
+    ] + rows)
+
+
+def tf_step_fn(sess, generator_steps):
+    """
+    A model_utils.generation step function which runs a step of
+    build_attention1_generator_steps per sess.run, with the state of
+    model_utils.numpy_step_decoders.attention1_step_fn
+    """
+    placeholders, token_probs_t, next_state_t = generator_steps
+
+    def step_fn(state, sequences):
+        feed_dict = dict(zip(
+            placeholders,
+            [state['i'][0], 1] + [state[name] for name in STATE_NAMES[1:]]
+        ))
+        token_probs, *next_state = sess.run(
+            [token_probs_t] + list(next_state_t), feed_dict=feed_dict
+        )
+        next_state = dict(zip(STATE_NAMES, next_state))
+        next_state['i'] = np.full(len(token_probs), next_state['i'])
+        return probs_to_logits(token_probs[:, 0]), next_state
+    return step_fn
+
+
+def generate_greedily(step_fn, zs, batch_size, max_length):
+    """
+    returns: the greedy programs for zs, and the wall time taken
+    """
+    programs = []
+    start_time = time.time()
+    for i in range(0, len(zs), batch_size):
+        programs += sample_sequences(
+            step_fn, initial_attention1_state(zs[i:i + batch_size], max_length),
+            max_length, temperature=0
+        )
+    return programs, time.time() - start_time
+
+
+def generation_row(name, programs, wall_time, reference_programs):
+    number_of_tokens = sum(len(tokens) for tokens in programs)
+    return [
+        name, len(programs), number_of_tokens, wall_time, number_of_tokens / wall_time,
+        np.mean([
+            np.array_equal(tokens, reference)
+            for tokens, reference in zip(programs, reference_programs)
+        ])
+    ]
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    export_step_decoder(
+        args.get('<option>'),
+        args.get('--basic'),
+        args.get('<path>'),
+        int(args.get('--number')),
+        int(args.get('--batch-size')),
+        args.get('--int8')
+    )
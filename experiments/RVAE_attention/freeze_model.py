@@ -0,0 +1,41 @@
+"""
+Freezes the encoder, teacher forced decoder and generator of a trained attention
+model, as model_analysis builds them, to frozen_<name>.pb in the model's
+directory, for `model_analysis.py --frozen`.
+
+Usage:
+    freeze_model.py [--basic] <option>
+    freeze_model.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -b --basic                Use the basic huzzer dataset.
+
+"""
+from docopt import docopt
+from os.path import join
+import tensorflow as tf
+
+import project_context  # NOQA
+from model_utils.frozen_graphs import export_frozen_graphs
+from model_analysis import analysis_subgraphs, build_analysis_model
+
+BASEDIR = 'experiments/RVAE_attention'
+TOKEN_EMB_SIZE = 54
+
+
+def freeze_model(option, use_basic_dataset):
+    sequence_cap = 56 if use_basic_dataset else 130
+    z_size = int(option.split('_')[-1])
+    directory = join(BASEDIR, ('basic_' if use_basic_dataset else '') + option)
+
+    tensors = build_analysis_model(z_size, sequence_cap, TOKEN_EMB_SIZE)
+    saver = tf.train.Saver()
+    with tf.Session() as sess:
+        saver.restore(sess, tf.train.latest_checkpoint(directory, 'checkpoint.txt'))
+        export_frozen_graphs(sess, analysis_subgraphs(tensors), directory)
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    freeze_model(args.get('<option>'), args.get('--basic'))
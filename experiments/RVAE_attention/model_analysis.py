@@ -2,22 +2,27 @@
 Model analysis for attention experiments:
 
 Usage:
-    experiment_128k.py [--basic] <option>
+    experiment_128k.py [--basic] [--frozen] [--batch-size=<size>] [--checkpoint-dir=<dir>] <option>
     experiment_128k.py -h | --help
 
 Options:
-    -h --help   Show this screen.
-    -b --basic  Use the basic huzzer dataset.
+    -h --help                 Show this screen.
+    -b --basic                Use the basic huzzer dataset.
+    -f --frozen               Load the frozen graphs of freeze_model.py, rather than building the model.
+    -s --batch-size=<size>    Number of programs to generate per batch [default: 500].
+    -c --checkpoint-dir=<dir> Restore the latest checkpoint in <dir>, e.g. a float16 export of
+                              scripts/export_inference_checkpoint.py, rather than the experiment's.
 
 """
 
 from docopt import docopt
 from huzzer.tokenizing import TOKEN_MAP
-from tqdm import tqdm
+from tqdm import tqdm, trange
 import errno
 import numpy as np
 import os
 from os.path import join
+import time
 import tensorflow as tf
 from scipy.misc import imsave
 import matplotlib.pyplot as plt
@@ -26,14 +31,19 @@ import matplotlib
 import project_context  # NOQA
 from pipelines.data_sources import BASIC_DATASET_ARGS
 from pipelines.one_hot_token import one_hot_token_dataset
+from model_utils.checkpoints import restore_inference_checkpoint
+from model_utils.frozen_graphs import frozen_graph_path, load_frozen_graph
 from model_utils.ops import get_sequence_lengths
+from model_utils.sessions import tuned_session_config
 from models import (
     build_single_program_encoder,
-    build_attention1_decoder
+    build_attention1_decoder,
+    build_attention1_generator,
+    default_lstm_cell
 )
 
 
-def analyze_model(option, use_basic_dataset):
+def analyze_model(option, use_basic_dataset, batch_size=500, frozen=False, checkpoint_dir=None):
     # BASEDIR = os.path.dirname(os.path.realpath(__file__))
     BASEDIR = 'experiments/RVAE_attention'
     sequence_cap = 56 if use_basic_dataset else 130
@@ -46,32 +56,20 @@ def analyze_model(option, use_basic_dataset):
             'basic_' if use_basic_dataset else '',
             option
         )
-        input_sequence_t = tf.placeholder(
-            shape=[1, sequence_cap, TOKEN_EMB_SIZE],
-            dtype=tf.float32,
-            name='input_sequence'
-        )
-        sequence_lengths_t = get_sequence_lengths(
-            tf.cast(input_sequence_t, tf.int32)
-        )
-        mus_and_log_sigs = build_single_program_encoder(
-            input_sequence_t,
-            sequence_lengths_t,
-            z_size
-        )
-        z = mus_and_log_sigs[:, :z_size]
-        decoder_input = tf.placeholder(
-            shape=[1, z_size],
-            dtype=tf.float32,
-            name='decoder_input'
-        )
-        decoder_output, attention_weights_t = build_attention1_decoder(
-            decoder_input,
-            sequence_lengths_t,
-            sequence_cap,
-            TOKEN_EMB_SIZE
-        )
-        token_probs_t = tf.nn.softmax(decoder_output)
+        if frozen:
+            tensors = load_frozen_model(join(BASEDIR, directory))
+        else:
+            tensors = build_analysis_model(z_size, sequence_cap, TOKEN_EMB_SIZE)
+        input_sequence_t = tensors['input_sequence']
+        sequence_lengths_t = tensors['sequence_lengths']
+        z = tensors['z']
+        decoder_input = tensors['decoder_input']
+        token_probs_t = tensors['token_probs']
+        attention_weights_t = tensors['attention_weights']
+        generator_input = tensors['generator_input']
+        generated_token_probs_t = tensors['generated_token_probs']
+        generated_lengths_t = tensors['generated_lengths']
+        generated_attention_weights_t = tensors['generated_attention_weights']
 
         print('z_size={}'.format(z_size))
     else:
@@ -95,15 +93,14 @@ def analyze_model(option, use_basic_dataset):
 
     path = join(BASEDIR, directory)
 
-    saver = tf.train.Saver()
-
     examples = [get_input() for i in range(NUMBER_OF_EXAMPLES)]
 
-    sess = tf.Session()
-    print('Restoring variables...')
-    saver.restore(
-        sess, tf.train.latest_checkpoint(path, 'checkpoint.txt')
-    )
+    sess = tf.Session(config=tuned_session_config('RVAE_attention/' + directory))
+    if not frozen:
+        print('Restoring variables...')
+        restore_inference_checkpoint(
+            sess, tf.train.latest_checkpoint(checkpoint_dir or path, 'checkpoint.txt')
+        )
     examples_dir = join(BASEDIR, ('basic_' if use_basic_dataset else '') + option + '_examples')
     mkdir_p(examples_dir)
 
@@ -147,28 +144,45 @@ def analyze_model(option, use_basic_dataset):
 
     # generate_bit
     generated_examples_path = join(examples_dir, 'generated')
-    message = 'Generating {} examples'.format(
-        len(examples),
+    zs = np.random.normal(0, 0.1, (NUMBER_OF_EXAMPLES, z_size))
+    generated = []
+    start_time = time.time()
+    for i in trange(0, NUMBER_OF_EXAMPLES, batch_size, desc='Generating batches'):
+        token_probs, lengths, attention_weights = sess.run(
+            [generated_token_probs_t, generated_lengths_t, generated_attention_weights_t],
+            feed_dict={
+                generator_input: zs[i:i + batch_size]
+            }
+        )
+        generated += zip(token_probs, lengths, attention_weights)
+    time_taken = time.time() - start_time
+    number_of_tokens = sum(length for _, length, _ in generated)
+    print('generated {} tokens in {:.2f}s, {:.1f} tokens/sec'.format(
+        number_of_tokens, time_taken, number_of_tokens / time_taken
+    ))
+
+    message = 'Writing {} generated examples'.format(
+        NUMBER_OF_EXAMPLES,
     )
-    for i in tqdm(
-        range(NUMBER_OF_EXAMPLES), desc=message, total=len(examples)
-    ):
+    for i, (z_gen, (token_probs, length, attention_weights)) in enumerate(tqdm(
+        zip(zs, generated), desc=message, total=NUMBER_OF_EXAMPLES
+    )):
         dir_for_example = join(generated_examples_path, str(i))
         mkdir_p(dir_for_example)
 
-        z_gen = np.random.normal(0, 0.1, z_size)
         imsave(join(dir_for_example, 'z.png'), z_gen.reshape((z_gen.size // 32, 32)))
-        token_probs, attention_weights = sess.run(
-            [token_probs_t, attention_weights_t],
-            feed_dict={
-                decoder_input: np.expand_dims(z_gen, 0)
-            }
-        )
-        token_probs = np.squeeze(token_probs)
-        tokens = np.argmax(token_probs, axis=-1)
-        end_of_code = np.argmax(tokens == 0) or sequence_cap
+        # as before, the code runs up to its first end token, which is not
+        # written, or to sequence_cap when it has none or starts with it
+        ends_with_end_token = token_probs[length - 1].argmax() == 0
+        if ends_with_end_token and length > 1:
+            end_of_code = length - 1
+        else:
+            end_of_code = sequence_cap
         token_probs = token_probs[:end_of_code]
-        attention_weights = attention_weights[:end_of_code]
+        attention_weights = [
+            np.expand_dims(weights[:t + 1], 0)
+            for t, weights in enumerate(attention_weights[:end_of_code])
+        ]
         output_code = example_to_code(token_probs)
 
         visualize_attention_weights(output_code, attention_weights, join(dir_for_example, 'attention_weights'))
@@ -177,6 +191,103 @@ def analyze_model(option, use_basic_dataset):
         write_to_file(join(dir_for_example, 'generated_code.hs'), example_to_code(token_probs))
 
 
+def build_analysis_model(z_size, sequence_cap, token_emb_size):
+    """
+    returns: a dict of the tensors of the encoder, decoder and generator
+    """
+    input_sequence_t = tf.placeholder(
+        shape=[1, sequence_cap, token_emb_size],
+        dtype=tf.float32,
+        name='input_sequence'
+    )
+    sequence_lengths_t = get_sequence_lengths(
+        tf.cast(input_sequence_t, tf.int32)
+    )
+    mus_and_log_sigs = build_single_program_encoder(
+        input_sequence_t,
+        sequence_lengths_t,
+        z_size
+    )
+    z = mus_and_log_sigs[:, :z_size]
+    decoder_input = tf.placeholder(
+        shape=[1, z_size],
+        dtype=tf.float32,
+        name='decoder_input'
+    )
+    # the generator shares the decoder's cell, with its weights
+    rnn_cell = default_lstm_cell(z_size)
+    decoder_output, attention_weights_t = build_attention1_decoder(
+        decoder_input,
+        sequence_lengths_t,
+        sequence_cap,
+        token_emb_size,
+        rnn_cell=rnn_cell
+    )
+    token_probs_t = tf.nn.softmax(decoder_output)
+
+    generator_input = tf.placeholder(
+        shape=[None, z_size],
+        dtype=tf.float32,
+        name='generator_input'
+    )
+    (
+        generated_token_probs_t,
+        generated_lengths_t,
+        generated_attention_weights_t
+    ) = build_attention1_generator(
+        generator_input,
+        sequence_cap,
+        token_emb_size,
+        reuse=True,
+        rnn_cell=rnn_cell
+    )
+    return {
+        'input_sequence': input_sequence_t,
+        'sequence_lengths': sequence_lengths_t,
+        'z': z,
+        'decoder_input': decoder_input,
+        'token_probs': token_probs_t,
+        'attention_weights': attention_weights_t,
+        'generator_input': generator_input,
+        'generated_token_probs': generated_token_probs_t,
+        'generated_lengths': generated_lengths_t,
+        'generated_attention_weights': generated_attention_weights_t,
+    }
+
+
+# the inputs and outputs of each of the frozen graphs of freeze_model.py
+SUBGRAPHS = {
+    'encoder': (['input_sequence'], ['z', 'sequence_lengths']),
+    'decoder': (['decoder_input'], ['token_probs', 'attention_weights']),
+    'generator': (
+        ['generator_input'],
+        ['generated_token_probs', 'generated_lengths', 'generated_attention_weights']
+    ),
+}
+
+
+def analysis_subgraphs(tensors):
+    return {
+        name: (
+            {key: tensors[key] for key in input_names},
+            {key: tensors[key] for key in output_names}
+        )
+        for name, (input_names, output_names) in SUBGRAPHS.items()
+    }
+
+
+def load_frozen_model(directory):
+    """
+    returns: the dict of build_analysis_model, from the frozen graphs in `directory`
+    """
+    tensors = {}
+    for name in SUBGRAPHS:
+        inputs, outputs = load_frozen_graph(frozen_graph_path(directory, name), name)
+        tensors.update(inputs)
+        tensors.update(outputs)
+    return tensors
+
+
 def example_to_code(example):
     tokens = np.argmax(example, axis=-1)
     text = ' '.join([token_to_string(t) for t in tokens])
@@ -256,4 +367,7 @@ if __name__ == '__main__':
     args = docopt(__doc__, version='N/A')
     option = args.get('<option>')
     use_basic_dataset = args.get('--basic')
-    analyze_model(option, use_basic_dataset)
+    batch_size = int(args.get('--batch-size'))
+    analyze_model(
+        option, use_basic_dataset, batch_size, args.get('--frozen'), args.get('--checkpoint-dir')
+    )
@@ -14,19 +14,27 @@ def build_RVAE_model():
     pass
 
 
-def build_attention1_decoder(z, sequence_lengths, max_length, token_emb_size):
+def build_attention1_decoder(
+    z, sequence_lengths, max_length, token_emb_size, block_cell=False, rnn_cell=None
+):
+    """
+    args:
+        rnn_cell: the cell of the decoder rnn, by default a new default_lstm_cell.
+            Pass the same cell to build_attention1_generator to share its weights.
+    """
     batch_size = tf.shape(z)[0]
     z_size = z.get_shape()[1].value
 
-    rnn_cell = default_lstm_cell(z_size, tf.tanh)
+    if rnn_cell is None:
+        rnn_cell = default_lstm_cell(z_size, tf.tanh, block_cell=block_cell)
 
-    # raw output of the decoder
-    unnormalized_token_probs = []
+    # outputs of the decoder rnn, projected to token logits after the recurrence
+    output_states = []
     # storage for the hidden states of the decoder
     hidden_states = tf.expand_dims(z, 1)
 
     h_state = z
-    c_state = rnn_cell.zero_state(batch_size, dtype=tf.float32).c
+    c_state = rnn_cell.zero_state(batch_size, dtype=tf.float32)[0]
     attention_v = tf.zeros(tf.shape(z))
 
     attention_weights = []
@@ -37,14 +45,7 @@ def build_attention1_decoder(z, sequence_lengths, max_length, token_emb_size):
         with tf.variable_scope('decoder_rnn', reuse=i > 0):
             unused, (c_state, h_state) = rnn_cell(attention_v, (c_state, h_state))
 
-        # compute t_{i+1}
-        unnormalized_token_prob = fully_connected(
-            h_state,
-            token_emb_size,
-            'decoder_fully_connected',
-            reuse=i > 0
-        )
-        unnormalized_token_probs += [unnormalized_token_prob]
+        output_states += [h_state]
 
         # Compute a_{i+1} from f([h_0 ... h_{i}], h_{i+1})
         if i < (max_length - 1):
@@ -66,14 +67,211 @@ def build_attention1_decoder(z, sequence_lengths, max_length, token_emb_size):
         )
         pbar.update(i+1)
     pbar.close()
-    return tf.stack(unnormalized_token_probs, axis=1), attention_weights
+
+    # compute t_1 ... t_n with one matmul over all the hidden states
+    unnormalized_token_probs = fully_connected(
+        tf.stack(output_states, axis=1),
+        token_emb_size,
+        'decoder_fully_connected',
+        reuse=False
+    )
+    return unnormalized_token_probs, attention_weights
+
+
+def build_attention1_generator(
+    z, max_length, token_emb_size, block_cell=False, reuse=False, early_exit=True,
+    rnn_cell=None
+):
+    """
+    Greedily generates from the attention1 decoder in a tf.while_loop. A sequence
+    stops once its most likely token is the end (0) token, and the loop exits once
+    every sequence in the batch has stopped, rather than always running max_length
+    steps. Shares its variables with build_attention1_decoder, set `reuse` if that
+    has already been built. Without `early_exit`, all max_length steps are run,
+    e.g. for beam search over the token probs. When reusing the variables, pass
+    the `rnn_cell` of the decoder or generator that built them as well, as from
+    tensorflow 1.1 a second cell may not use the weights of another.
+
+    returns: the token probs (b x n x token_emb_size), where n <= max_length is the
+        number of steps run, the lengths of the sequences (the end token
+        included), and the attention weights (b x n x max_length) over
+        [z, h_1 ... h_{n-1}], zero padded
+    """
+    batch_size = tf.shape(z)[0]
+    z_size = z.get_shape()[1].value
+
+    if rnn_cell is None:
+        rnn_cell = default_lstm_cell(z_size, tf.tanh, block_cell=block_cell)
+
+    def step(i, c_state, h_state, attention_v, hidden_states, reuse):
+        return attention1_step(
+            rnn_cell, i, c_state, h_state, attention_v, hidden_states, token_emb_size, reuse
+        )
+
+    def update_lengths(token_probs, finished, lengths):
+        lengths += tf.cast(tf.logical_not(finished), tf.int32)
+        finished = tf.logical_or(finished, tf.equal(tf.argmax(token_probs, -1), 0))
+        return finished, lengths
+
+    # the first step is built outside of the loop, so that the variables are
+    # created outside of it
+    hidden_states = tf.pad(tf.expand_dims(z, 1), [[0, 0], [0, max_length - 1], [0, 0]])
+    c_state = rnn_cell.zero_state(batch_size, dtype=tf.float32)[0]
+    token_probs, c_state, h_state, attention_v, weights, hidden_states = step(
+        0, c_state, z, tf.zeros(tf.shape(z)), hidden_states, reuse
+    )
+    finished, lengths = update_lengths(
+        token_probs, tf.zeros((batch_size,), tf.bool), tf.zeros((batch_size,), tf.int32)
+    )
+    token_probs_array = tf.TensorArray(tf.float32, size=max_length).write(0, token_probs)
+    weights_array = tf.TensorArray(tf.float32, size=max_length).write(0, weights)
+
+    def condition(i, c_state, h_state, attention_v, hidden_states, finished, *unused):
+        if not early_exit:
+            return i < max_length
+        return tf.logical_and(i < max_length, tf.logical_not(tf.reduce_all(finished)))
+
+    def body(
+        i, c_state, h_state, attention_v, hidden_states, finished, lengths,
+        token_probs_array, weights_array
+    ):
+        token_probs, c_state, h_state, attention_v, weights, hidden_states = step(
+            i, c_state, h_state, attention_v, hidden_states, reuse=True
+        )
+        finished, lengths = update_lengths(token_probs, finished, lengths)
+        return (
+            i + 1, c_state, h_state, attention_v, hidden_states, finished, lengths,
+            token_probs_array.write(i, token_probs), weights_array.write(i, weights)
+        )
+
+    loop_outputs = tf.while_loop(
+        condition,
+        body,
+        [
+            tf.constant(1), c_state, h_state, attention_v, hidden_states, finished,
+            lengths, token_probs_array, weights_array
+        ]
+    )
+    number_of_steps = loop_outputs[0]
+    lengths, token_probs_array, weights_array = loop_outputs[-3:]
+
+    token_probs = tf.transpose(
+        token_probs_array.gather(tf.range(number_of_steps)), (1, 0, 2)
+    )
+    attention_weights = tf.transpose(
+        weights_array.gather(tf.range(number_of_steps)), (1, 0, 2)
+    )
+    return token_probs, lengths, attention_weights
 
 
-def build_single_program_encoder(input_sequences, sequence_lengths, z_size):
+def build_attention1_generator_steps(
+    z_size, max_length, token_emb_size, block_cell=False, reuse=False
+):
+    """
+    Advances the generator of build_attention1_generator by up to
+    `number_of_steps` steps from a given state, so that it can be run a few
+    steps per sess.run, e.g. to score a block of tokens at once. The state
+    before the first step is i=0, a zero c_state, h_state=z, a zero attention_v
+    and z followed by zeros as the hidden states.
+
+    returns: the placeholders for i, number_of_steps, c_state, h_state,
+        attention_v and hidden_states (b x max_length x z_size), then the token
+        probs (b x n x token_emb_size) of the n >= 1 steps run, and the state
+        after them, as the tensors for the same placeholders but number_of_steps
+    """
+    i = tf.placeholder(tf.int32, (), name='step')
+    number_of_steps = tf.placeholder(tf.int32, (), name='number_of_steps')
+    c_state = tf.placeholder(tf.float32, (None, z_size), name='c_state')
+    h_state = tf.placeholder(tf.float32, (None, z_size), name='h_state')
+    attention_v = tf.placeholder(tf.float32, (None, z_size), name='attention_v')
+    hidden_states = tf.placeholder(
+        tf.float32, (None, max_length, z_size), name='hidden_states'
+    )
+    placeholders = (i, number_of_steps, c_state, h_state, attention_v, hidden_states)
+
+    rnn_cell = default_lstm_cell(z_size, tf.tanh, block_cell=block_cell)
+
+    # as in build_attention1_generator, the first step is built outside of the
+    # loop, so that the variables are created outside of it
+    token_probs, *next_state = attention1_step(
+        rnn_cell, i, c_state, h_state, attention_v, hidden_states, token_emb_size, reuse
+    )
+    token_probs_array = tf.TensorArray(tf.float32, size=max_length).write(0, token_probs)
+    last_step = tf.minimum(i + number_of_steps, max_length)
+
+    def condition(j, *unused):
+        return j < last_step
+
+    def body(j, c_state, h_state, attention_v, hidden_states, token_probs_array):
+        token_probs, c_state, h_state, attention_v, _, hidden_states = attention1_step(
+            rnn_cell, j, c_state, h_state, attention_v, hidden_states, token_emb_size,
+            reuse=True
+        )
+        return (
+            j + 1, c_state, h_state, attention_v, hidden_states,
+            token_probs_array.write(j - i, token_probs)
+        )
+
+    next_c_state, next_h_state, next_attention_v, _, next_hidden_states = next_state
+    (
+        next_i, next_c_state, next_h_state, next_attention_v, next_hidden_states,
+        token_probs_array
+    ) = tf.while_loop(condition, body, [
+        i + 1, next_c_state, next_h_state, next_attention_v, next_hidden_states,
+        token_probs_array
+    ])
+
+    token_probs = tf.transpose(
+        token_probs_array.gather(tf.range(next_i - i)), (1, 0, 2)
+    )
+    return placeholders, token_probs, (
+        next_i, next_c_state, next_h_state, next_attention_v, next_hidden_states
+    )
+
+
+def attention1_step(
+    rnn_cell, i, c_state, h_state, attention_v, hidden_states, token_emb_size, reuse
+):
+    """
+    Step i of the attention1 generator, which computes h_{i+1}, t_{i+1} and
+    a_{i+1} and adds h_{i+1} to the buffer of hidden states.
+
+    returns: token_probs, c_state, h_state, attention_v, the attention weights
+        and hidden_states
+    """
+    max_length = hidden_states.get_shape()[1].value
+
+    # compute h_{i+1} and t_{i+1}
+    with tf.variable_scope('decoder_rnn', reuse=reuse):
+        unused, (c_state, h_state) = rnn_cell(attention_v, (c_state, h_state))
+    token_probs = tf.nn.softmax(fully_connected(
+        h_state, token_emb_size, 'decoder_fully_connected', reuse=reuse
+    ))
+
+    # Compute a_{i+1} from f([h_0 ... h_{i}], h_{i+1})
+    unnormalized_attention_coefs = buffered_attention_coefs(
+        hidden_states, i + 1, h_state, reuse=reuse
+    )
+    attention_v, weights = compute_attention_vector(
+        hidden_states,
+        unnormalized_attention_coefs
+    )
+
+    # Add h_{i+1} to hidden states, (dropped on the last step)
+    hidden_states += (
+        tf.reshape(tf.one_hot(i + 1, max_length), (1, max_length, 1)) *
+        tf.expand_dims(h_state, 1)
+    )
+    return token_probs, c_state, h_state, attention_v, weights, hidden_states
+
+
+def build_single_program_encoder(
+    input_sequences, sequence_lengths, z_size, block_cell=False
+):
     """
     May be used for bi directional (if used also on the reverse of the input sequences)
     """
-    rnn_cell = default_lstm_cell(2*z_size, activation=tf.tanh)
+    rnn_cell = default_lstm_cell(2*z_size, activation=tf.tanh, block_cell=block_cell)
     outputs, (c_state, m_state) = tf.nn.dynamic_rnn(
         rnn_cell,
         dtype=tf.float32,
@@ -121,12 +319,51 @@ def simple_attention_coefs(previous_hidden_states, h, reuse, name_suffix=''):
     )
 
 
+def buffered_attention_coefs(hidden_states, number_of_states, h, reuse):
+    """
+    The same as simple_attention_coefs, but over the first `number_of_states` of
+    a fixed size buffer of hidden states (b x max_length x z_size), where
+    `number_of_states` may be a tensor. The coefs of the rest of the buffer are
+    set so that they have no weight after the softmax.
+    """
+    h_proj = fully_connected(
+        h,
+        h.get_shape()[1].value,
+        'simple_attention',
+        reuse=reuse
+    )
+    h_proj_normalized = tf.nn.l2_normalize(h_proj, -1)
+    hidden_states_normalized = tf.nn.l2_normalize(hidden_states, -1)
+    unscaled_coefs = tf.reduce_sum(
+        tf.multiply(tf.expand_dims(h_proj_normalized, 1), hidden_states_normalized),
+        axis=2
+    )
+
+    # Use the dynamic sofmax with m=sqrt(l) and epsilon=0.001
+    l = tf.cast(number_of_states, tf.float32)
+    epsilon = 0.001
+    m = tf.sqrt(l)
+    dynamic_scaling_factor = tf.cond(
+        l > 1,
+        lambda: 0.5 * tf.log(((1 - epsilon) * (l - m)) / (epsilon * m)),
+        lambda: tf.constant(1.0)
+    )
+
+    max_length = hidden_states.get_shape()[1].value
+    mask = tf.cast(tf.sequence_mask([number_of_states], max_length), tf.float32)
+    return dynamic_scaling_factor * unscaled_coefs + (1 - mask) * -1e9
+
+
 def fully_connected(
     input, output_size,
     var_name_scope,
     reuse=None,
     initializer=tf.contrib.layers.xavier_initializer()
 ):
+    """
+    `input` may be of shape (b x input_size) or (b x l x input_size). In the
+    latter case the same weights are applied at every one of the l positions.
+    """
     assert reuse is not None, 'Must set reuse value'
 
     input_size = input.get_shape()[-1].value
@@ -141,10 +378,22 @@ def fully_connected(
             (output_size,),
             initializer=initializer
         )
+    if len(input.get_shape()) == 3:
+        sequence_length = input.get_shape()[1].value
+        flat_output = tf.matmul(tf.reshape(input, (-1, input_size)), weights) + bias
+        return tf.reshape(flat_output, (-1, sequence_length, output_size))
     return tf.matmul(input, weights) + bias
 
 
-def default_lstm_cell(size, activation=tf.tanh):
+def default_lstm_cell(size, activation=tf.tanh, block_cell=False):
+    """
+    If `block_cell` is set, a fused LSTMBlockCell is used. It has the same gates and
+    weight layout as LSTMCell, but runs each step as a single op. Use
+    model_utils.checkpoints.block_cell_variables_map when saving/restoring.
+    """
+    if block_cell:
+        assert activation is tf.tanh, 'LSTMBlockCell only supports tanh activations'
+        return tf.contrib.rnn.LSTMBlockCell(size)
     return tf.contrib.rnn.LSTMCell(
         size,
         initializer=tf.contrib.layers.xavier_initializer(),
@@ -0,0 +1,190 @@
+"""
+Benchmarks speculative sampling from the attention decoder on cpu, with the GRU
+RVAE step decoder of Recurrent_VAE_baseline as the draft, against sampling from
+the attention decoder alone, in tokens per second. The samples are exact samples
+from the attention decoder either way.
+
+The attention decoder does not read its own outputs, so the token probs it has
+computed stay good whichever draft tokens are rejected, and it can just as well
+be run a few steps per sess.run without a draft. That is the last row.
+
+Usage:
+    speculative_decoding.py [--basic] [--number=<n>] [--draft-tokens=<k>] <option> <draft>
+    speculative_decoding.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -b --basic                Use the basic huzzer dataset.
+    -n --number=<n>           Number of programs to sample per decoder [default: 50].
+    -k --draft-tokens=<k>     Comma separated numbers of draft tokens per target call [default: 2,4,8].
+
+"""
+from docopt import docopt
+import numpy as np
+from os.path import join
+import time
+import tensorflow as tf
+
+import project_context  # NOQA
+from model_utils.benchmark import print_table
+from model_utils.sampling import probs_to_logits
+from model_utils.speculative import speculative_sample
+from models import build_attention1_generator_steps
+from experiments.Recurrent_VAE_baseline.models import (
+    build_program_decoder_step,
+    decoder_step_fn
+)
+
+BASEDIR = 'experiments/RVAE_attention'
+DRAFT_BASEDIR = 'experiments/Recurrent_VAE_baseline'
+TOKEN_EMB_SIZE = 54
+HEADERS = [
+    'decoder', 'programs', 'tokens', 'wall time (s)', 'tokens per second',
+    'acceptance rate', 'tokens per target run'
+]
+
+
+def benchmark_speculative_decoding(
+    option, draft_option, use_basic_dataset, number, draft_tokens
+):
+    sequence_cap = 56 if use_basic_dataset else 130
+    z_size = int(option.split('_')[-1])
+    path = join(BASEDIR, '{}{}'.format('basic_' if use_basic_dataset else '', option))
+    draft_path, draft_z_size, look_behind = parse_draft_option(draft_option)
+    config = tf.ConfigProto(device_count={'GPU': 0})
+
+    target_graph = tf.Graph()
+    with target_graph.as_default():
+        generator_steps = build_attention1_generator_steps(
+            z_size, sequence_cap, TOKEN_EMB_SIZE
+        )
+        target_saver = tf.train.Saver()
+    draft_graph = tf.Graph()
+    with draft_graph.as_default():
+        decoder_step = build_program_decoder_step(
+            draft_z_size, TOKEN_EMB_SIZE, TOKEN_EMB_SIZE * look_behind
+        )
+        draft_saver = tf.train.Saver()
+
+    target_sess = tf.Session(graph=target_graph, config=config)
+    draft_sess = tf.Session(graph=draft_graph, config=config)
+    target_saver.restore(target_sess, tf.train.latest_checkpoint(path, 'checkpoint.txt'))
+    draft_saver.restore(
+        draft_sess, tf.train.latest_checkpoint(draft_path, 'checkpoint.txt')
+    )
+    draft_step_fn = decoder_step_fn(draft_sess, decoder_step, look_behind)
+
+    zs = np.random.normal(0, 0.1, (number, z_size))
+    draft_zs = np.random.normal(0, 1, (number, draft_z_size))
+
+    def benchmark_row(name, number_of_draft_tokens, steps_per_run):
+        target_fn = attention_target_fn(target_sess, generator_steps, steps_per_run)
+        totals = {'drafted': 0, 'accepted': 0}
+        number_of_tokens = 0
+
+        start_time = time.time()
+        for z, draft_z in zip(zs, draft_zs):
+            tokens, counts = speculative_sample(
+                draft_step_fn, target_fn,
+                {'hidden_state': draft_z[None, :]},
+                initial_attention_target_state(z[None, :], sequence_cap),
+                number_of_draft_tokens,
+                sequence_cap
+            )
+            number_of_tokens += len(tokens)
+            totals = {key: totals[key] + counts[key] for key in totals}
+        wall_time = time.time() - start_time
+
+        return [
+            name, number, number_of_tokens, wall_time, number_of_tokens / wall_time,
+            totals['accepted'] / totals['drafted'] if totals['drafted'] else '-',
+            number_of_tokens / target_fn.number_of_runs
+        ]
+
+    rows = [benchmark_row('attention decoder', 0, 1)]
+    for k in draft_tokens:
+        rows += [benchmark_row('speculative, k={}'.format(k), k, 1)]
+    rows += [benchmark_row(
+        'attention decoder, {} steps per run'.format(max(draft_tokens) + 1),
+        0, max(draft_tokens) + 1
+    )]
+
+    print('{}{} with draft {}, {} programs each'.format(
+        'basic_' if use_basic_dataset else '', option, draft_option, number
+    ))
+    print_table(HEADERS, rows)
+
+
+def attention_target_fn(sess, generator_steps, steps_per_run=1):
+    """
+    A model_utils.speculative target function for the graph of
+    build_attention1_generator_steps. As the decoder does not read its own
+    outputs, the state keeps the token probs of every step run so far, and the
+    decoder is only run, at least steps_per_run steps at a time, for the
+    positions it has not reached yet.
+    """
+    placeholders, token_probs_t, next_decoder_state_t = generator_steps
+    number_of_steps_t = placeholders[1]
+    decoder_state_placeholders = placeholders[:1] + placeholders[2:]
+
+    def target_fn(state, sequences, drafts):
+        start = sequences.shape[1]
+        end = start + drafts.shape[1] + 1
+        token_probs = state['token_probs']
+        if token_probs.shape[1] < end:
+            feed_dict = dict(zip(decoder_state_placeholders, state['decoder_state']))
+            feed_dict[number_of_steps_t] = max(end - token_probs.shape[1], steps_per_run)
+            new_token_probs, *decoder_state = sess.run(
+                [token_probs_t] + list(next_decoder_state_t), feed_dict=feed_dict
+            )
+            target_fn.number_of_runs += 1
+            state = {
+                'token_probs': np.concatenate([token_probs, new_token_probs], axis=1),
+                'decoder_state': decoder_state
+            }
+        return probs_to_logits(state['token_probs'][:, start:end]), state
+
+    target_fn.number_of_runs = 0
+    return target_fn
+
+
+def initial_attention_target_state(z, max_length):
+    """
+    The state of attention_target_fn for latent vectors z (b x z_size), before
+    the first step
+    """
+    hidden_states = np.zeros((len(z), max_length, z.shape[1]))
+    hidden_states[:, 0] = z
+    return {
+        'token_probs': np.zeros((len(z), 0, TOKEN_EMB_SIZE)),
+        'decoder_state': [0, np.zeros(z.shape), z, np.zeros(z.shape), hidden_states]
+    }
+
+
+def parse_draft_option(option):
+    """
+    returns: the checkpoint directory, z_size and look_behind of a
+        Recurrent_VAE_baseline experiment, as its model_analysis.parse_option
+    """
+    if option.startswith('single_layer_gru_blind_'):
+        look_behind = 0
+        z_size = int(option.split('_')[-1])
+        directory = 'single_layer_gru_{}'.format(z_size)
+    elif option.startswith('single_layer_gru_look_behind_'):
+        look_behind = int(option.split('_')[-2])
+        z_size = int(option.split('_')[-1])
+        directory = option
+    else:
+        exit('invalid draft option')
+    return join(DRAFT_BASEDIR, directory), z_size, look_behind
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    benchmark_speculative_decoding(
+        args.get('<option>'),
+        args.get('<draft>'),
+        args.get('--basic'),
+        int(args.get('--number')),
+        [int(k) for k in args.get('--draft-tokens').split(',')]
+    )
@@ -0,0 +1,191 @@
+"""
+The latency/quality trade-off of GRU students distilled from an attention1
+decoder by distill_attention.py, at sequence_cap 56 (the basic dataset) and 130,
+against the decoder itself. Every decoder greedily decodes the same latent
+vectors. Quality is measured against the teacher's greedy programs and token
+probs, and by the share of programs which compile.
+
+Usage:
+    student_analysis.py [--number=<n>] [--batch-size=<size>] <option> <hidden_sizes>
+    student_analysis.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -n --number=<n>           Number of latent vectors to decode [default: 500].
+    -s --batch-size=<size>    Number of latent vectors per batch [default: 100].
+
+<hidden_sizes> are the comma separated student sizes, e.g. 128,256,512.
+
+"""
+from docopt import docopt
+import numpy as np
+from os.path import join
+import time
+import tensorflow as tf
+
+import project_context  # NOQA
+from model_utils.benchmark import print_table
+from model_utils.evaluation import number_compiling, tokens_to_code
+from models import build_attention1_generator, default_lstm_cell
+from distill_attention import (
+    BASEDIR,
+    TOKEN_EMB_SIZE,
+    Z_STD,
+    build_gru_student,
+    student_logdir,
+)
+
+HEADERS = [
+    'sequence_cap', 'decoder', 'ms per batch', 'programs per second',
+    'token agreement', 'KL to teacher', 'compiled'
+]
+
+
+def analyze_students(option, hidden_sizes, number, batch_size):
+    z_size = int(option.split('_')[-1])
+    zs = np.random.normal(0, Z_STD, (number, z_size))
+
+    rows = []
+    for use_basic_dataset in [True, False]:
+        sequence_cap = 56 if use_basic_dataset else 130
+        teacher_path = join(BASEDIR, ('basic_' if use_basic_dataset else '') + option)
+        if tf.train.latest_checkpoint(teacher_path, 'checkpoint.txt') is None:
+            print('no checkpoint in {}, skipping sequence_cap {}'.format(
+                teacher_path, sequence_cap
+            ))
+            continue
+
+        with tf.Graph().as_default():
+            z = tf.placeholder(tf.float32, (None, z_size), name='z')
+            rnn_cell = default_lstm_cell(z_size)
+            greedy_token_probs_t, lengths_t, _ = build_attention1_generator(
+                z, sequence_cap, TOKEN_EMB_SIZE, rnn_cell=rnn_cell
+            )
+            token_probs_t, _, _ = build_attention1_generator(
+                z, sequence_cap, TOKEN_EMB_SIZE, reuse=True, early_exit=False,
+                rnn_cell=rnn_cell
+            )
+            with tf.Session() as sess:
+                tf.train.Saver().restore(
+                    sess, tf.train.latest_checkpoint(teacher_path, 'checkpoint.txt')
+                )
+
+                def decode_teacher(z_batch):
+                    token_probs, lengths = sess.run(
+                        [greedy_token_probs_t, lengths_t], feed_dict={z: z_batch}
+                    )
+                    return [
+                        np.argmax(probs[:length], axis=-1)
+                        for probs, length in zip(token_probs, lengths)
+                    ]
+
+                teacher_programs, teacher_time = decode_in_batches(
+                    decode_teacher, zs, batch_size
+                )
+                teacher_token_probs = np.concatenate([
+                    sess.run(token_probs_t, feed_dict={z: zs[i:i + batch_size]})
+                    for i in range(0, number, batch_size)
+                ])
+
+        rows += [quality_row(
+            sequence_cap, 'attention1 (teacher)', teacher_time, number, batch_size,
+            teacher_programs, teacher_programs, teacher_token_probs, teacher_token_probs
+        )]
+
+        for hidden_size in hidden_sizes:
+            path = student_logdir(option, use_basic_dataset, hidden_size)
+            if tf.train.latest_checkpoint(path, 'checkpoint.txt') is None:
+                print('no checkpoint in {}, skipping'.format(path))
+                continue
+
+            with tf.Graph().as_default():
+                z = tf.placeholder(tf.float32, (None, z_size), name='z')
+                student_token_probs_t = tf.nn.softmax(build_gru_student(
+                    z, sequence_cap, TOKEN_EMB_SIZE, hidden_size
+                ))
+                saver = tf.train.Saver(
+                    tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES, scope='student')
+                )
+                with tf.Session() as sess:
+                    saver.restore(sess, tf.train.latest_checkpoint(path, 'checkpoint.txt'))
+
+                    def decode_student(z_batch):
+                        token_probs = sess.run(
+                            student_token_probs_t, feed_dict={z: z_batch}
+                        )
+                        return [cut_at_end(np.argmax(probs, axis=-1)) for probs in token_probs]
+
+                    student_programs, student_time = decode_in_batches(
+                        decode_student, zs, batch_size
+                    )
+                    student_token_probs = np.concatenate([
+                        sess.run(student_token_probs_t, feed_dict={z: zs[i:i + batch_size]})
+                        for i in range(0, number, batch_size)
+                    ])
+
+            rows += [quality_row(
+                sequence_cap, 'GRU student, {}'.format(hidden_size), student_time,
+                number, batch_size, student_programs, teacher_programs,
+                student_token_probs, teacher_token_probs
+            )]
+
+    print('{}, {} latent vectors'.format(option, number))
+    print_table(HEADERS, rows)
+
+
+def decode_in_batches(decode_batch, zs, batch_size):
+    """
+    returns: the programs decoded from zs, and the wall time taken
+    """
+    programs = []
+    start_time = time.time()
+    for i in range(0, len(zs), batch_size):
+        programs += decode_batch(zs[i:i + batch_size])
+    return programs, time.time() - start_time
+
+
+def quality_row(
+    sequence_cap, name, wall_time, number, batch_size, programs, teacher_programs,
+    token_probs, teacher_token_probs
+):
+    """
+    The token agreement is the share of the teacher's greedy tokens the greedy
+    program has in the same place, and the KL divergence is from the teacher's
+    token probs, averaged over the positions of the teacher's greedy programs.
+    """
+    number_of_batches = -(-number // batch_size)
+    agreements = []
+    kls = []
+    for i, teacher_program in enumerate(teacher_programs):
+        length = len(teacher_program)
+        program = np.zeros(length, dtype=np.int64)
+        program[:min(length, len(programs[i]))] = programs[i][:length]
+        agreements += list(program == teacher_program)
+
+        p = np.maximum(teacher_token_probs[i, :length], 1e-10)
+        q = np.maximum(token_probs[i, :length], 1e-10)
+        kls += list(np.sum(p * (np.log(p) - np.log(q)), axis=-1))
+
+    compiled = number_compiling([tokens_to_code(tokens) for tokens in programs])
+    return [
+        sequence_cap, name, 1000 * wall_time / number_of_batches, number / wall_time,
+        np.mean(agreements), np.mean(kls), compiled / number
+    ]
+
+
+def cut_at_end(tokens, end_token=0):
+    """
+    The tokens up to and including the first end token
+    """
+    ends = np.where(tokens == end_token)[0]
+    return tokens[:ends[0] + 1] if len(ends) else tokens
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    analyze_students(
+        args.get('<option>'),
+        [int(size) for size in args.get('<hidden_sizes>').split(',')],
+        int(args.get('--number')),
+        int(args.get('--batch-size'))
+    )
@@ -0,0 +1,89 @@
+"""
+Benchmark the standard GRUCell against the fused GRUBlockCell on CPU, for the
+encoder and decoder sizes used in the RVAE experiments.
+
+Usage:
+    benchmark_cells.py [--batch-size=<size>] [--length=<length>] <z_size>
+    benchmark_cells.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -s --batch-size=<size>    Batch size to benchmark with [default: 128].
+    -l --length=<length>      Number of steps to run the rnns for [default: 130].
+
+"""
+from docopt import docopt
+import numpy as np
+
+import project_context  # NOQA
+from model_utils.benchmark import time_run, print_table
+from models import default_gru_cell
+
+import tensorflow as tf
+
+TOKEN_EMB_SIZE = 54
+
+
+def benchmark_cells(z_size, length, batch_size):
+    input_data = np.random.uniform(size=(batch_size, length, TOKEN_EMB_SIZE)).astype(np.float32)
+    z_data = np.random.normal(0, 1, (batch_size, z_size)).astype(np.float32)
+
+    rows = []
+    for block_cell in [False, True]:
+        with tf.Graph().as_default():
+            with tf.variable_scope('encoder'):
+                encoder_outputs, _ = tf.nn.dynamic_rnn(
+                    default_gru_cell(2 * z_size, block_cell=block_cell),
+                    tf.constant(input_data),
+                    dtype=tf.float32
+                )
+            encoder_gradients = tf.gradients(
+                tf.reduce_sum(encoder_outputs), tf.trainable_variables()
+            )
+            # the blind decoder has no inputs, only an initial state
+            with tf.variable_scope('decoder'):
+                decoder_outputs, _ = tf.nn.dynamic_rnn(
+                    default_gru_cell(z_size, block_cell=block_cell),
+                    tf.zeros((batch_size, length, 0)),
+                    initial_state=tf.constant(z_data)
+                )
+            decoder_variables = [
+                v for v in tf.trainable_variables() if v.name.startswith('decoder/')
+            ]
+            decoder_gradients = tf.gradients(
+                tf.reduce_sum(decoder_outputs), decoder_variables
+            )
+
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                timings = [
+                    time_run(sess, encoder_outputs),
+                    time_run(sess, encoder_gradients),
+                    time_run(sess, decoder_outputs),
+                    time_run(sess, decoder_gradients),
+                ]
+        rows += [
+            ['GRUBlockCell' if block_cell else 'GRUCell'] +
+            # milliseconds per recurrent step
+            [1000 * t / length for t in timings]
+        ]
+
+    rows += [
+        ['speedup'] + [standard / block for standard, block in zip(rows[0][1:], rows[1][1:])]
+    ]
+    print('ms per step, batch_size={}, length={}, z_size={}'.format(
+        batch_size, length, z_size
+    ))
+    print_table(
+        ['cell', 'encoder', 'encoder + grads', 'decoder', 'decoder + grads'],
+        rows
+    )
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    benchmark_cells(
+        int(args.get('<z_size>')),
+        int(args.get('--length')),
+        int(args.get('--batch-size'))
+    )
@@ -0,0 +1,98 @@
+"""
+Compares sampling, greedy and beam search decoding of the GRU RVAE step decoder,
+with and without the huzzer grammar constraints of model_utils.grammar, by wall
+time, cpu time and the number of generated programs which compile.
+
+Usage:
+  compare_decoding.py [--number=<n>] [--batch-size=<size>] [--beam-width=<k>] [--alpha=<a>] <experiment>
+  compare_decoding.py -h | --help
+
+Options:
+  -h --help                 Show this screen.
+  -n --number=<n>           Number of latent vectors to decode [default: 500].
+  -s --batch-size=<size>    Number of latent vectors per batch [default: 100].
+  -k --beam-width=<k>       Beam width for beam search [default: 8].
+  -a --alpha=<a>            Length penalty exponent for beam search [default: 0.6].
+"""
+from docopt import docopt
+import numpy as np
+import tensorflow as tf
+
+import project_context  # NOQA
+from model_utils.benchmark import print_table
+from model_utils.evaluation import DECODING_REPORT_HEADERS, decoding_report_row
+from model_utils.generation import sample_sequences, beam_search
+from model_utils.grammar import HuzzerGrammar, constrained_step_fn
+from models import build_program_decoder_step, decoder_step_fn
+from model_analysis import TOKEN_EMB_SIZE, MAX_PROGRAM_LENGTH, parse_option
+
+
+def compare_decoding(option, number, batch_size, beam_width, alpha):
+    path, z_size, look_behind = parse_option(option)
+    zs = np.random.normal(0, 1, (number, z_size))
+
+    decoder_step = build_program_decoder_step(
+        z_size, TOKEN_EMB_SIZE, TOKEN_EMB_SIZE * look_behind
+    )
+    saver = tf.train.Saver()
+    with tf.Session() as sess:
+        saver.restore(sess, tf.train.latest_checkpoint(path, 'checkpoint.txt'))
+        unconstrained_step_fn = decoder_step_fn(sess, decoder_step, look_behind)
+        constrained = constrained_step_fn(
+            unconstrained_step_fn, HuzzerGrammar(TOKEN_EMB_SIZE)
+        )
+
+        def decode_with_sampling(step_fn, temperature):
+            def decode():
+                programs = []
+                for i in range(0, number, batch_size):
+                    programs += sample_sequences(
+                        step_fn, {'hidden_state': zs[i:i + batch_size]},
+                        MAX_PROGRAM_LENGTH, temperature=temperature
+                    )
+                return programs
+            return decode
+
+        def decode_with_beam_search(step_fn):
+            def decode():
+                programs = []
+                # the beam search batch is beam_width times bigger
+                beam_batch_size = max(1, batch_size // beam_width)
+                for i in range(0, number, beam_batch_size):
+                    hypotheses = beam_search(
+                        step_fn, {'hidden_state': zs[i:i + beam_batch_size]},
+                        beam_width, MAX_PROGRAM_LENGTH, alpha=alpha
+                    )
+                    programs += [row[0][0] for row in hypotheses]
+                return programs
+            return decode
+
+        beam_search_name = 'beam search, k={}'.format(beam_width)
+        rows = [
+            decoding_report_row(
+                'sampling', decode_with_sampling(unconstrained_step_fn, 1.0)
+            ),
+            decoding_report_row('greedy', decode_with_sampling(unconstrained_step_fn, 0)),
+            decoding_report_row(
+                beam_search_name, decode_with_beam_search(unconstrained_step_fn)
+            ),
+            decoding_report_row('sampling + grammar', decode_with_sampling(constrained, 1.0)),
+            decoding_report_row('greedy + grammar', decode_with_sampling(constrained, 0)),
+            decoding_report_row(
+                beam_search_name + ' + grammar', decode_with_beam_search(constrained)
+            ),
+        ]
+
+    print('{}, {} latent vectors'.format(option, number))
+    print_table(DECODING_REPORT_HEADERS, rows)
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    compare_decoding(
+        args.get('<experiment>'),
+        int(args.get('--number')),
+        int(args.get('--batch-size')),
+        int(args.get('--beam-width')),
+        float(args.get('--alpha'))
+    )
@@ -3,12 +3,13 @@ Baseline RVAE experiments:
 Experiments using a limited dataset if 128000 examples
 
 Usage:
-    experiment_128k.py [--basic] <option>
+    experiment_128k.py [--basic] [--block-cell] <option>
     experiment_128k.py -h | --help
 
 Options:
-    -h --help   Show this screen.
-    -b --basic  Use the basic huzzer dataset.
+    -h --help         Show this screen.
+    -b --basic        Use the basic huzzer dataset.
+    -c --block-cell   Use fused GRUBlockCells (checkpoints stay compatible).
 
 
 """
@@ -20,6 +21,7 @@ import logging
 import project_context  # NOQA
 from pipelines.one_hot_token import one_hot_variable_length_token_dataset
 from pipelines.data_sources import BASIC_DATASET_ARGS
+from model_utils.checkpoints import block_cell_variables_map
 import tensorflow_fold as td
 
 from models import (
@@ -37,7 +39,7 @@ TOKEN_EMB_SIZE = 54  # Using categorical labels for the finite subsetset of hask
 NUM_STEPS_TO_STOP_IF_NO_IMPROVEMENT = 3000  # stop if no improvement after an epoch
 
 
-def run_experiment(option, use_basic_dataset):
+def run_experiment(option, use_basic_dataset, block_cell=False):
     BATCH_SIZE = 128
     NUMBER_BATCHES = 1000
 
@@ -45,13 +47,15 @@ def run_experiment(option, use_basic_dataset):
     if option.startswith('single_layer_gru_blind_'):
         look_behind = 0
         num_grus = int(option.split('_')[-1])
-        network_block = build_token_level_RVAE(num_grus, TOKEN_EMB_SIZE, look_behind_length=0)
+        network_block = build_token_level_RVAE(
+            num_grus, TOKEN_EMB_SIZE, look_behind_length=0, block_cell=block_cell
+        )
         train_block = build_train_graph_for_RVAE(network_block)
     elif option.startswith('single_layer_gru_look_behind_'):
         num_grus = int(option.split('_')[-1])
         look_behind = int(option.split('_')[-2])
         network_block = build_token_level_RVAE(
-            num_grus, TOKEN_EMB_SIZE, look_behind
+            num_grus, TOKEN_EMB_SIZE, look_behind, block_cell=block_cell
         )
         train_block = build_train_graph_for_RVAE(network_block, look_behind)
     else:
@@ -95,8 +99,14 @@ def run_experiment(option, use_basic_dataset):
     train_op = slim.learning.create_train_op(total_loss_op, optimizer)
     summary_op = tf.summary.merge_all()
 
+    # block cells save under the standard cell names, so runs can switch between them
+    if block_cell:
+        saver = tf.train.Saver(block_cell_variables_map())
+    else:
+        saver = Supervisor.USE_DEFAULT
     sv = Supervisor(
         logdir=logdir,
+        saver=saver,
         save_model_secs=60,
         summary_op=None,
     )
@@ -152,4 +162,5 @@ if __name__ == '__main__':
 
     option = args.get('<option>')
     use_basic_dataset = args.get('--basic')
-    run_experiment(option, use_basic_dataset)
+    block_cell = args.get('--block-cell')
+    run_experiment(option, use_basic_dataset, block_cell)
@@ -0,0 +1,149 @@
+"""
+Exports the GRU step decoder of an experiment to an .npz for
+model_utils.numpy_step_decoders, checks a NumPy step against the tensorflow one,
+and benchmarks greedy generation with NumPy against the sess.run per token loop
+of model_analysis.
+
+Usage:
+    export_step_decoder.py [--number=<n>] [--batch-size=<size>] [--int8] <experiment> [<path>]
+    export_step_decoder.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -n --number=<n>           Number of programs to generate per decoder [default: 500].
+    -s --batch-size=<size>    Number of programs to generate per batch [default: 500].
+    -q --int8                 Also write an int8 copy of the decoder, and benchmark it.
+
+<path> defaults to the experiment's directory, step_decoder.npz, the int8 copy
+is written beside it
+
+"""
+from docopt import docopt
+import numpy as np
+from os.path import join
+import time
+import tensorflow as tf
+
+import project_context  # NOQA
+from model_utils.benchmark import print_table
+from model_utils.generation import look_behind_input, sample_sequences
+from model_utils.numpy_decoders import softmax
+from model_utils.numpy_step_decoders import (
+    initial_gru_state,
+    load_step_decoder,
+    save_step_decoder
+)
+from model_utils.quantization import quantize_file, quantized_path
+from models import build_program_decoder_step, decoder_step_fn
+from model_analysis import MAX_PROGRAM_LENGTH, TOKEN_EMB_SIZE, parse_option
+
+VARIABLE_NAMES = {
+    'gates_weights': 'decoder/gru_cell/gates/weights',
+    'gates_biases': 'decoder/gru_cell/gates/biases',
+    'candidate_weights': 'decoder/gru_cell/candidate/weights',
+    'candidate_biases': 'decoder/gru_cell/candidate/biases',
+    'fc_weights': 'encoder_fc/weights',
+    'fc_bias': 'encoder_fc/bias',
+}
+HEADERS = [
+    'decoder', 'programs', 'tokens', 'wall time (s)', 'tokens per second',
+    'same programs'
+]
+
+
+def export_step_decoder(option, path, number, batch_size, int8):
+    checkpoint_path, z_size, look_behind = parse_option(option)
+    if path is None:
+        path = join(checkpoint_path, 'step_decoder.npz')
+    zs = np.random.normal(0, 1, (number, z_size))
+
+    with tf.Graph().as_default():
+        decoder_step = build_program_decoder_step(
+            z_size, TOKEN_EMB_SIZE, TOKEN_EMB_SIZE * look_behind
+        )
+        variables = {v.op.name: v for v in tf.global_variables()}
+        saver = tf.train.Saver()
+        config = tf.ConfigProto(device_count={'GPU': 0})
+        with tf.Session(config=config) as sess:
+            saver.restore(sess, tf.train.latest_checkpoint(checkpoint_path, 'checkpoint.txt'))
+            weights = sess.run({
+                key: variables[name] for key, name in VARIABLE_NAMES.items()
+            })
+            save_step_decoder(path, 'gru', look_behind=look_behind, **weights)
+            print('wrote {} variables to {}'.format(len(weights), path))
+
+            # a step from random hidden states and tokens
+            step_fn, _ = load_step_decoder(path)
+            hidden_states = np.random.normal(0, 1, (batch_size, z_size))
+            sequences = np.random.randint(TOKEN_EMB_SIZE, size=(batch_size, look_behind))
+            hidden_state_t, decoder_input_t, token_probs_t, next_hidden_state_t = decoder_step
+            expected_token_probs, expected_hidden_state = sess.run(
+                [token_probs_t, next_hidden_state_t],
+                feed_dict={
+                    hidden_state_t: hidden_states,
+                    decoder_input_t: look_behind_input(sequences, look_behind, TOKEN_EMB_SIZE)
+                }
+            )
+            logits, state = step_fn(initial_gru_state(hidden_states), sequences)
+            print('largest absolute difference from tensorflow: {:.3g} (token probs), '
+                  '{:.3g} (hidden state)'.format(
+                      np.max(np.abs(softmax(logits) - expected_token_probs)),
+                      np.max(np.abs(state['hidden_state'] - expected_hidden_state))
+                  ))
+
+            tf_programs, tf_time = generate_greedily(
+                decoder_step_fn(sess, decoder_step, look_behind), zs, batch_size
+            )
+
+    numpy_programs, numpy_time = generate_greedily(step_fn, zs, batch_size)
+    rows = [
+        generation_row('numpy', numpy_programs, numpy_time, tf_programs),
+    ]
+    if int8:
+        quantize_file(path, quantized_path(path))
+        int8_step_fn, _ = load_step_decoder(quantized_path(path))
+        int8_programs, int8_time = generate_greedily(int8_step_fn, zs, batch_size)
+        rows += [
+            generation_row('numpy, int8', int8_programs, int8_time, tf_programs),
+            generation_row('numpy, int8 against float32', int8_programs, int8_time, numpy_programs),
+        ]
+    print('{}, {} greedy programs on cpu'.format(option, number))
+    print_table(HEADERS, [
+        generation_row('tensorflow, sess.run per token', tf_programs, tf_time, tf_programs),
+    ] + rows)
+
+
+def generate_greedily(step_fn, zs, batch_size):
+    """
+    returns: the greedy programs for zs, and the wall time taken
+    """
+    programs = []
+    start_time = time.time()
+    for i in range(0, len(zs), batch_size):
+        programs += sample_sequences(
+            step_fn, initial_gru_state(zs[i:i + batch_size]), MAX_PROGRAM_LENGTH,
+            temperature=0
+        )
+    return programs, time.time() - start_time
+
+
+def generation_row(name, programs, wall_time, reference_programs):
+    number_of_tokens = sum(len(tokens) for tokens in programs)
+    return [
+        name, len(programs), number_of_tokens, wall_time, number_of_tokens / wall_time,
+        np.mean([
+            np.array_equal(tokens, reference)
+            for tokens, reference in zip(programs, reference_programs)
+        ])
+    ]
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    export_step_decoder(
+        args.get('<experiment>'),
+        args.get('<path>'),
+        int(args.get('--number')),
+        int(args.get('--batch-size')),
+        args.get('--int8')
+    )
@@ -1,15 +1,17 @@
 """ Model Analysis for tf-fold RVAES.
 
 Usage:
-  model_analysis.py [-ag] <experiment>
+  model_analysis.py [-ag] [--number=<n>] [--batch-size=<size>] <experiment>
   model_analysis.py -h | --help
   model_analysis.py --version
 
 Options:
-  -h --help       Show this screen.
-  --version       Show version.
-  -a              Skip autoencoding step.
-  -g              Skip generating step.
+  -h --help                 Show this screen.
+  --version                 Show version.
+  -a                        Skip autoencoding step.
+  -g                        Skip generating step.
+  -n --number=<n>           Number of programs to generate [default: 1000].
+  -s --batch-size=<size>    Number of programs to encode/decode per batch [default: 500].
 """
 
 from docopt import docopt
@@ -19,16 +21,20 @@ import errno
 import numpy as np
 import os
 from os.path import join
+import time
 import tensorflow as tf
 import tensorflow_fold as td
 from scipy.misc import imsave
 
 import project_context  # NOQA
 from pipelines.one_hot_token import one_hot_variable_length_token_dataset
+from model_utils.generation import sample_sequences
 from models import (
     default_gru_cell,
     build_program_encoder,
-    build_program_decoder,
+    build_program_decoder_sequence,
+    build_program_decoder_step,
+    decoder_step_fn,
     resampling
 )
 
@@ -38,146 +44,89 @@ NUMBER_OF_EXAMPLES = 1000
 MAX_PROGRAM_LENGTH = 250
 
 
-def analyze_model(option, autoencode, generate):
+def analyze_model(option, autoencode, generate, number_to_generate=1000, batch_size=500):
+    path, z_size, look_behind = parse_option(option)
 
+    if autoencode:
+        print('Setting up data pipeline...')
+        dataset = one_hot_variable_length_token_dataset(
+            batch_size=1,
+            number_of_batches=1000,
+            cache_path='one_hot_token_variable_length_haskell_batch{}_number{}_lookbehind{}'.format(
+                1, 1000, look_behind
+            ),
+            zero_front_pad=look_behind
+        )
+
+        def get_input():
+            return np.squeeze(dataset()[0], axis=0).astype(np.float32)
+
+        examples = [get_input() for i in range(NUMBER_OF_EXAMPLES)]
+        autoencode_procedure(option, path, z_size, look_behind, examples, batch_size)
+    if generate:
+        generate_procedure(
+            option, path, z_size, look_behind, number_to_generate, batch_size
+        )
+
+
+def parse_option(option):
+    """
+    returns: the checkpoint directory, z_size and look_behind of an experiment
+    """
     if option.startswith('single_layer_gru_blind_'):
         # TODO: this is old naming convention
         look_behind = 0
         z_size = int(option.split('_')[-1])
         directory = 'single_layer_gru_{}'.format(z_size)
-        encoder_block = build_encoder(z_size, TOKEN_EMB_SIZE)
-
-        decoder_rnn_block = build_program_decoder_for_analysis(
-            TOKEN_EMB_SIZE, default_gru_cell(z_size)
-        )
-
-        decoder_block = build_decoder_block_for_analysis(
-            z_size, TOKEN_EMB_SIZE, decoder_rnn_block, 0
-        )
         print('z_size={}'.format(z_size))
-    if option.startswith('single_layer_gru_look_behind_'):
+    elif option.startswith('single_layer_gru_look_behind_'):
         look_behind = int(option.split('_')[-2])
         z_size = int(option.split('_')[-1])
         directory = option
-        encoder_block = build_encoder(z_size, TOKEN_EMB_SIZE)
-        decoder_rnn_block = build_program_decoder(
-            TOKEN_EMB_SIZE, default_gru_cell(z_size)
-        )
-        decoder_block = build_decoder_block_for_analysis(
-            z_size,
-            TOKEN_EMB_SIZE,
-            decoder_rnn_block,
-            TOKEN_EMB_SIZE * look_behind
-        )
         print('z_size={}, look_behind={}'.format(z_size, look_behind))
     else:
         exit('invalid option')
+    return join(BASEDIR, directory), z_size, look_behind
 
-    print('Setting up data pipeline...')
-    dataset = one_hot_variable_length_token_dataset(
-        batch_size=1,
-        number_of_batches=1000,
-        cache_path='one_hot_token_variable_length_haskell_batch{}_number{}_lookbehind{}'.format(
-            1, 1000, look_behind
-        ),
-        zero_front_pad=look_behind
-    )
-
-    def get_input():
-        return np.squeeze(dataset()[0], axis=0).astype(np.float32)
-
-    path = join(BASEDIR, directory)
-
-    encoder_graph = td.Compiler.create(encoder_block)
-    (mus_and_log_sigs,) = encoder_graph.output_tensors
 
-    decoder_graph = td.Compiler.create(decoder_block)
-    un_normalised_token_probs, hidden_state_t = decoder_graph.output_tensors
-    token_probs_t = tf.nn.softmax(un_normalised_token_probs)
-
-    # Build resampling op
-    resampling_input, resample_op = build_resampling_op(z_size)
-
-    examples = [get_input() for i in range(NUMBER_OF_EXAMPLES)]
-    fold_inputs = encoder_graph.build_loom_inputs(examples)
-    saver = tf.train.Saver()
-    sess = tf.Session()
-    saver.restore(
-        sess, tf.train.latest_checkpoint(path, 'checkpoint.txt')
-    )
-
-    if autoencode:
-        autoencode_procedure(
-            option, path, z_size, examples, fold_inputs,
-            encoder_graph, decoder_graph, mus_and_log_sigs, look_behind,
-            token_probs_t, hidden_state_t, sess
-        )
-    if generate:
-        generate_procedure(
-            option, path, z_size, examples, fold_inputs,
-            encoder_graph, decoder_graph, mus_and_log_sigs, look_behind,
-            token_probs_t, hidden_state_t, sess
-        )
-
-
-def generate_procedure(
-    option, path, z_size, examples, fold_inputs,
-    encoder_graph, decoder_graph, mus_and_log_sigs, look_behind,
-    token_probs_t, hidden_state_t, sess
-):
-    # Autoencode_bit
+def generate_procedure(option, path, z_size, look_behind, number_to_generate, batch_size):
+    """
+    Generates programs from random latent vectors, a batch at a time, with the
+    plain tensorflow step decoder. This has its own graph, as fold is not needed.
+    """
     examples_dir = join(BASEDIR, option + '_examples')
     mkdir_p(examples_dir)
     generated_examples_path = join(examples_dir, 'generated')
-    message = 'Generating {} examples'.format(
-        len(examples)
-    )
-    for i in trange(NUMBER_OF_EXAMPLES, desc=message):
-        dir_for_example = join(generated_examples_path, str(i))
-        mkdir_p(dir_for_example)
 
-        # DECODER PART
-        if look_behind > 0:
-            output_sequence = []
-            decoder_input = padded_look_behind_generator_generator(
-                output_sequence, look_behind, TOKEN_EMB_SIZE
-            )
-        else:
-            output_sequence = []
-            decoder_input = zeros_generator()  # NOQA
-
-        z_gen = np.random.normal(0, 1, z_size)
-        imsave(join(dir_for_example, 'z.png'), z_gen.reshape((z_gen.size // 32, 32)))
-
-        fd = decoder_graph.build_feed_dict([
-            (z_gen, [next(decoder_input)])
-        ])
-
-        token_probs, hidden_state = sess.run(
-            [token_probs_t, hidden_state_t],
-            feed_dict=fd
+    with tf.Graph().as_default():
+        decoder_step = build_program_decoder_step(
+            z_size, TOKEN_EMB_SIZE, TOKEN_EMB_SIZE * look_behind
         )
-
-        # take a sample from the token probs
-        sampled_token = np.random.multinomial(1, token_probs.squeeze() * 0.999)
-        output_sequence.append(np.expand_dims(sampled_token, 0))
-
-        for _ in range(MAX_PROGRAM_LENGTH - 1):
-            fd = decoder_graph.build_feed_dict([
-                (hidden_state.squeeze(), [next(decoder_input)])
-            ])
-
-            token_probs, hidden_state = sess.run(
-                [token_probs_t, hidden_state_t],
-                feed_dict=fd
+        saver = tf.train.Saver()
+        with tf.Session() as sess:
+            saver.restore(
+                sess, tf.train.latest_checkpoint(path, 'checkpoint.txt')
             )
-            sampled_token = np.random.multinomial(1, token_probs.squeeze() * 0.999)
-            output_sequence.append(np.expand_dims(sampled_token, 0))
-            if sampled_token[0]:
-                break
 
-        output_sequence = output_sequence[look_behind:]
-        output_sequence = np.concatenate(output_sequence)
+            start_time = time.time()
+            zs = np.random.normal(0, 1, (number_to_generate, z_size))
+            generated = []
+            for i in trange(0, number_to_generate, batch_size, desc='Generating batches'):
+                generated += generate_batch(
+                    sess, decoder_step, zs[i:i + batch_size], look_behind
+                )
+            print('generated {} examples in {:.2f}s'.format(
+                number_to_generate, time.time() - start_time
+            ))
+
+    for i, (z_gen, tokens) in enumerate(tqdm(
+        zip(zs, generated), desc='Writing examples', total=number_to_generate
+    )):
+        dir_for_example = join(generated_examples_path, str(i))
+        mkdir_p(dir_for_example)
+
+        imsave(join(dir_for_example, 'z.png'), z_gen.reshape((z_gen.size // 32, 32)))
+        output_sequence = np.eye(TOKEN_EMB_SIZE)[tokens]
         imsave(join(dir_for_example, 'decoder_output.png'), output_sequence.T)
 
         write_to_file(
@@ -186,78 +135,108 @@ def generate_procedure(
         )
 
 
-def autoencode_procedure(
-    option, path, z_size, examples, fold_inputs,
-    encoder_graph, decoder_graph, mus_and_log_sigs, look_behind,
-    token_probs_t,
-    hidden_state_t,
-    sess
+def generate_batch(sess, decoder_step, zs, look_behind):
+    """
+    Samples a program for every latent vector in zs.
+
+    returns: a list of token arrays, the end tokens included
+    """
+    return sample_sequences(
+        decoder_step_fn(sess, decoder_step, look_behind),
+        {'hidden_state': zs},
+        MAX_PROGRAM_LENGTH
+    )
+
 
-):
-    # Autoencode_bit
+def autoencode_procedure(option, path, z_size, look_behind, examples, batch_size):
+    """
+    Autoencodes the examples, which are zero front padded by look_behind.
+    The fold encoder runs on batches of examples, and each batch is decoded
+    (teacher forced, as in training) in a single pass of the plain tensorflow
+    sequence decoder.
+    """
     examples_dir = join(BASEDIR, option + '_examples')
     mkdir_p(examples_dir)
-
     autoencoded_examples_path = join(examples_dir, 'autoencoded')
-    message = 'Autencoding {} examples'.format(
-        len(examples)
-    )
-    for i, (fold_batch, input_sequence) in enumerate(tqdm(
-        zip(
-            td.group_by_batches(fold_inputs, 1), examples
-        ),
-        desc=message, total=len(examples)
+
+    with tf.Graph().as_default():
+        encoder_graph = td.Compiler.create(build_encoder(z_size, TOKEN_EMB_SIZE))
+        (mus_and_log_sigs_t,) = encoder_graph.output_tensors
+        decoder = build_program_decoder_sequence(
+            z_size, TOKEN_EMB_SIZE, TOKEN_EMB_SIZE * look_behind
+        )
+        saver = tf.train.Saver()
+        with tf.Session() as sess:
+            saver.restore(
+                sess, tf.train.latest_checkpoint(path, 'checkpoint.txt')
+            )
+
+            start_time = time.time()
+            # the encoder reads the examples without the look behind padding
+            fold_inputs = encoder_graph.build_loom_inputs(
+                [example[look_behind:] for example in examples]
+            )
+            mus = np.concatenate([
+                sess.run(mus_and_log_sigs_t, feed_dict={
+                    encoder_graph.loom_input_tensor: fold_batch
+                })[:, :z_size]
+                for fold_batch in td.group_by_batches(fold_inputs, batch_size)
+            ])
+
+            decoder_outputs = []
+            for i in trange(0, len(examples), batch_size, desc='Autoencoding batches'):
+                decoder_outputs += teacher_forced_decode_batch(
+                    sess, decoder, mus[i:i + batch_size], examples[i:i + batch_size],
+                    look_behind
+                )
+            print('autoencoded {} examples in {:.2f}s'.format(
+                len(examples), time.time() - start_time
+            ))
+
+    for i, (input_sequence, z, decoder_output) in enumerate(tqdm(
+        zip(examples, mus, decoder_outputs),
+        desc='Writing examples', total=len(examples)
     )):
         dir_for_example = join(autoencoded_examples_path, str(i))
         mkdir_p(dir_for_example)
 
-        p_of_z = sess.run(mus_and_log_sigs, feed_dict={
-            encoder_graph.loom_input_tensor: fold_batch
-        })
-        mus = p_of_z[:, :z_size]
-
         input_code = example_to_code(input_sequence[look_behind:])
         write_to_file(join(dir_for_example, 'input.hs'), input_code)
         imsave(join(dir_for_example, 'input.png'), input_sequence.T)
-        imsave(join(dir_for_example, 'z.png'), mus.reshape((mus.size // 32, 32)))
+        imsave(join(dir_for_example, 'z.png'), z.reshape((z.size // 32, 32)))
 
-        # DECODER PART
-        if look_behind > 0:
-            decoder_input = padded_look_behind_generator(
-                input_sequence, look_behind, TOKEN_EMB_SIZE
-            )
-        else:
-            decoder_input = zeros_generator()  # NOQA
+        imsave(join(dir_for_example, 'decoder_output.png'), decoder_output.T)
+        write_to_file(
+            join(dir_for_example, 'autoencoded_code.hs'),
+            example_to_code(decoder_output)
+        )
 
-        fd = decoder_graph.build_feed_dict([
-            (mus.squeeze(axis=0), [next(decoder_input)])
-        ])
 
-        token_probs, hidden_state = sess.run(
-            [token_probs_t, hidden_state_t],
-            feed_dict=fd
-        )
+def teacher_forced_decode_batch(sess, decoder, mus, padded_examples, look_behind):
+    """
+    Decodes a batch from the mus, with each step reading the look_behind tokens
+    of the example before it, as in build_token_level_RVAE.
 
-        tokens_probs = [token_probs]
-        text_so_far = [one_hot(TOKEN_EMB_SIZE, token_probs.squeeze().argmax())]
-        for _ in range(len(input_sequence) - 1):
-            fd = decoder_graph.build_feed_dict([
-                (hidden_state.squeeze(), [next(decoder_input)])
-            ])
+    returns: a list of the token probs of each example, without padding
+    """
+    initial_state_t, decoder_inputs_t, sequence_lengths_t, token_probs_t = decoder
+    lengths = [len(example) - look_behind for example in padded_examples]
 
-            token_probs, hidden_state = sess.run(
-                [token_probs_t, hidden_state_t],
-                feed_dict=fd
-            )
-            tokens_probs += [token_probs]
-            text_so_far += [one_hot(TOKEN_EMB_SIZE, token_probs.squeeze().argmax())]
+    decoder_inputs = np.zeros(
+        (len(padded_examples), max(lengths), look_behind * TOKEN_EMB_SIZE)
+    )
+    for i, example in enumerate(padded_examples):
+        if look_behind > 0:
+            decoder_inputs[i, :lengths[i]] = np.stack([
+                example[j:j + look_behind].flatten() for j in range(lengths[i])
+            ])
 
-        decoder_output = np.concatenate(tokens_probs)
-        imsave(join(dir_for_example, 'decoder_output.png'), decoder_output.T)
-        write_to_file(
-            join(dir_for_example, 'autoencoded_code.hs'),
-            example_to_code(text_so_far)
-        )
+    token_probs = sess.run(token_probs_t, feed_dict={
+        initial_state_t: mus,
+        decoder_inputs_t: decoder_inputs,
+        sequence_lengths_t: lengths
+    })
+    return [token_probs[i, :length] for i, length in enumerate(lengths)]
 
 
 def build_encoder(z_size, token_emb_size):
@@ -268,64 +247,6 @@ def build_encoder(z_size, token_emb_size):
     return input_sequence >> mus_and_log_sigs
 
 
-def build_decoder_block_for_analysis(z_size, token_emb_size, decoder_cell, input_size):
-
-    c = td.Composition()
-    c.set_input_type(
-        td.TupleType(
-            td.TensorType((z_size,)),
-            td.SequenceType(td.TensorType((input_size,)))
-        )
-    )
-    with c.scope():
-        hidden_state = td.GetItem(0).reads(c.input)
-        rnn_input = td.GetItem(1).reads(c.input)
-
-        # decoder_output = build_program_decoder_for_analysis(
-        #     token_emb_size, default_gru_cell(z_size)
-        # )
-        decoder_output = decoder_cell
-
-        decoder_output.reads(rnn_input, hidden_state)
-        decoder_rnn_output = td.GetItem(1).reads(decoder_output)
-        un_normalised_token_probs = td.GetItem(0).reads(decoder_output)
-        # get the first output (meant to only compute one interation)
-        c.output.reads(
-            td.GetItem(0).reads(un_normalised_token_probs),
-            td.GetItem(0).reads(decoder_rnn_output)
-        )
-
-    return td.Record(
-        (td.Vector(z_size), td.Map(td.Vector(input_size)))
-    ) >> c
-
-
-# this needs changing to somehting like "build blind decoder"
-def build_program_decoder_for_analysis(token_emb_size, rnn_cell):
-    """
-    Does the same as build_program_decoder_for_analysis, but also returns
-        the final hidden state of the decoder
-    """
-    decoder_rnn = td.ScopedLayer(
-        rnn_cell,
-        'decoder'
-    )
-    decoder_rnn_output = td.RNN(
-        decoder_rnn,
-        initial_state_from_input=True
-    ) >> td.GetItem(0)
-
-    fc_layer = td.FC(
-        token_emb_size,
-        activation=tf.nn.relu,
-        initializer=tf.contrib.layers.xavier_initializer(),
-        name='encoder_fc'
-    )
-    # decoder_rnn_output.reads()
-    un_normalised_token_probs = td.Map(fc_layer)
-    return decoder_rnn_output >> td.AllOf(un_normalised_token_probs, td.Identity())
-
-
 def build_resampling_op(z_size):
     mus_and_log_sigs = tf.placeholder(tf.float32, (1, 2*z_size,))
     return mus_and_log_sigs, resampling(mus_and_log_sigs)
@@ -348,37 +269,6 @@ def write_to_file(path, text):
         f.write(text)
 
 
-def one_hot(length, value):
-    v = np.zeros(length, dtype=np.int8)
-    v[value] = 1
-    return v
-
-
-def zeros_generator():
-    while True:
-        yield np.zeros((0,))
-
-
-def padded_look_behind_generator(
-    input_sequence, look_behind, token_emb_size
-):
-    num_inputs = len(input_sequence)
-    zero_pad = np.zeros((look_behind, token_emb_size))
-    input_sequence = np.concatenate((zero_pad, input_sequence))
-    for i in range(num_inputs):
-        yield input_sequence[i: i + look_behind].flatten()
-
-
-def padded_look_behind_generator_generator(
-    token_list, look_behind, token_emb_size
-):
-    token_list.extend([np.zeros((1, TOKEN_EMB_SIZE)) for x in range(look_behind)])
-    i = -1
-    while True:
-        i += 1
-        yield np.concatenate(token_list[i: i + look_behind]).flatten()
-
-
 # echoes the behaviour of mkdir -p
 # from http://stackoverflow.com/questions/600268/mkdir-p-functionality-in-python
 def mkdir_p(path):
@@ -396,5 +286,7 @@ if __name__ == '__main__':
     analyze_model(
         args.get('<experiment>'),
         not args.get('-a'),
-        not args.get('-g')
+        not args.get('-g'),
+        int(args.get('--number')),
+        int(args.get('--batch-size'))
     )
@@ -2,8 +2,10 @@ import project_context  # NOQA
 import tensorflow as tf
 import tensorflow_fold as td
 
+from model_utils.generation import look_behind_input
 from model_utils.loss_functions import kl_divergence, softmax_crossentropy
 from model_utils.ops import vae_resampling
+from model_utils.sampling import probs_to_logits
 
 
 def resampling(mus_and_log_sigs):
@@ -25,7 +27,15 @@ def resampling_block(z_size):
     return reparam_z
 
 
-def default_gru_cell(size, activation=tf.tanh):
+def default_gru_cell(size, activation=tf.tanh, block_cell=False):
+    """
+    If `block_cell` is set, a fused GRUBlockCell is used, which computes the same
+    gates as GRUCell in a single op per step. Use
+    model_utils.checkpoints.block_cell_variables_map when saving/restoring.
+    """
+    if block_cell:
+        assert activation is tf.tanh, 'GRUBlockCell only supports tanh activations'
+        return tf.contrib.rnn.GRUBlockCell(size)
     return tf.contrib.rnn.GRUCell(
         num_units=size,
         activation=activation
@@ -74,13 +84,99 @@ def build_program_decoder(token_emb_size, rnn_cell, just_tokens=False):
     # return un_normalised_token_probs
 
 
-def build_token_level_RVAE(z_size, token_emb_size, look_behind_length):
+def build_program_decoder_step(z_size, token_emb_size, input_size):
+    """
+    A single step of the decoder built by build_program_decoder, in plain
+    tensorflow rather than fold, so that a whole batch of hidden states is
+    advanced per sess.run. The variables have the same names as the fold
+    decoder, so they restore from the same checkpoints.
+
+    returns: the hidden state and decoder input placeholders, the token probs and
+        the next hidden state
+    """
+    hidden_state = tf.placeholder(tf.float32, (None, z_size), name='decoder_hidden_state')
+    decoder_input = tf.placeholder(tf.float32, (None, input_size), name='decoder_step_input')
+
+    with tf.variable_scope('decoder'):
+        output, next_hidden_state = default_gru_cell(z_size)(decoder_input, hidden_state)
+
+    un_normalised_token_probs = program_decoder_fc(output, z_size, token_emb_size)
+    token_probs = tf.nn.softmax(un_normalised_token_probs)
+    return hidden_state, decoder_input, token_probs, next_hidden_state
+
+
+def build_program_decoder_sequence(z_size, token_emb_size, input_size):
+    """
+    The decoder built by build_program_decoder over a padded batch of decoder
+    input sequences, in plain tensorflow rather than fold, so a teacher forced
+    batch is decoded in one dynamic_rnn pass. Shares variable names with the
+    fold decoder, as build_program_decoder_step does.
+
+    returns: the initial hidden state, decoder inputs (b x l x input_size) and
+        sequence length placeholders, and the token probs (b x l x token_emb_size)
+    """
+    initial_state = tf.placeholder(tf.float32, (None, z_size), name='decoder_initial_state')
+    decoder_inputs = tf.placeholder(
+        tf.float32, (None, None, input_size), name='decoder_inputs'
+    )
+    sequence_lengths = tf.placeholder(tf.int32, (None,), name='decoder_sequence_lengths')
+
+    outputs, _ = tf.nn.dynamic_rnn(
+        default_gru_cell(z_size),
+        decoder_inputs,
+        sequence_length=sequence_lengths,
+        initial_state=initial_state,
+        scope='decoder'
+    )
+    un_normalised_token_probs = program_decoder_fc(
+        tf.reshape(outputs, (-1, z_size)), z_size, token_emb_size
+    )
+    token_probs = tf.reshape(
+        tf.nn.softmax(un_normalised_token_probs),
+        (tf.shape(outputs)[0], -1, token_emb_size)
+    )
+    return initial_state, decoder_inputs, sequence_lengths, token_probs
+
+
+def decoder_step_fn(sess, decoder_step, look_behind):
+    """
+    A model_utils.generation step function for the decoder step graph of
+    build_program_decoder_step. The state is the hidden state of each sequence.
+    """
+    hidden_state_t, decoder_input_t, token_probs_t, next_hidden_state_t = decoder_step
+    token_emb_size = token_probs_t.get_shape()[-1].value
+
+    def step_fn(state, sequences):
+        token_probs, hidden_state = sess.run(
+            [token_probs_t, next_hidden_state_t],
+            feed_dict={
+                hidden_state_t: state['hidden_state'],
+                decoder_input_t: look_behind_input(sequences, look_behind, token_emb_size)
+            }
+        )
+        return probs_to_logits(token_probs), {'hidden_state': hidden_state}
+    return step_fn
+
+
+def program_decoder_fc(decoder_rnn_output, z_size, token_emb_size):
+    """
+    The td.FC layer of build_program_decoder, for plain tensors of (b x z_size)
+    """
+    with tf.variable_scope('encoder_fc'):
+        weights = tf.get_variable('weights', (z_size, token_emb_size))
+        bias = tf.get_variable('bias', (token_emb_size,))
+    return tf.nn.relu(tf.nn.xw_plus_b(decoder_rnn_output, weights, bias))
+
+
+def build_token_level_RVAE(z_size, token_emb_size, look_behind_length, block_cell=False):
     c = td.Composition()
     c.set_input_type(td.SequenceType(td.TensorType(([token_emb_size]), 'float32')))
     with c.scope():
         padded_input_sequence = c.input
         # build encoder block
-        encoder_rnn_cell = build_program_encoder(default_gru_cell(2 * z_size))
+        encoder_rnn_cell = build_program_encoder(
+            default_gru_cell(2 * z_size, block_cell=block_cell)
+        )
 
         output_sequence = td.RNN(encoder_rnn_cell) >> td.GetItem(0)
         mus_and_log_sigs = output_sequence >> td.GetItem(-1)
@@ -98,7 +194,7 @@ def build_token_level_RVAE(z_size, token_emb_size, look_behind_length):
 
         # build decoder block
         un_normalised_token_probs = build_program_decoder(
-            token_emb_size, default_gru_cell(z_size), just_tokens=True
+            token_emb_size, default_gru_cell(z_size, block_cell=block_cell), just_tokens=True
         )
 
         # remove padding for input sequence
@@ -0,0 +1,68 @@
+"""
+Benchmark the training step of the final conv model (build_special_conv4_final) on
+CPU, with one-hot inputs and with token id inputs.
+
+Usage:
+    benchmark_token_input.py [--basic] [--batch-size=<size>]
+    benchmark_token_input.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -b --basic                Use the sequence length of the basic huzzer dataset.
+    -s --batch-size=<size>    Batch size to benchmark with [default: 128].
+
+"""
+from docopt import docopt
+import numpy as np
+
+import project_context  # NOQA
+from model_utils.benchmark import time_run, print_table
+from models import build_special_conv4_final
+
+import tensorflow as tf
+
+TOKEN_EMB_SIZE = 54
+
+
+def benchmark_token_input(sequence_cap, batch_size):
+    x_shape = (sequence_cap, TOKEN_EMB_SIZE)
+    tokens = np.random.randint(0, TOKEN_EMB_SIZE, (batch_size, sequence_cap)).astype(np.int32)
+    one_hots = np.eye(TOKEN_EMB_SIZE, dtype=np.float32)[tokens]
+
+    rows = []
+    for token_input in [False, True]:
+        with tf.Graph().as_default() as graph:
+            x = tf.placeholder(
+                tf.int32 if token_input else tf.float32,
+                shape=tokens.shape if token_input else one_hots.shape
+            )
+            # the settings of the `conv` option in experiment_128k.py
+            build_special_conv4_final(
+                x, x_shape, 128, filter_length=3, num_filters=128, token_input=token_input
+            )
+            encoder_output = graph.get_tensor_by_name('encoder_output/Tanh:0')
+            train_on_batch = graph.get_tensor_by_name('train_on_batch:0')
+            feed_dict = {x: tokens if token_input else one_hots}
+
+            with tf.Session() as sess:
+                sess.run(tf.global_variables_initializer())
+                encoder_time = time_run(sess, encoder_output, feed_dict)
+                train_time = time_run(sess, train_on_batch, feed_dict)
+        rows += [[
+            'token ids' if token_input else 'one-hot',
+            1000 * encoder_time,
+            1000 * train_time,
+            batch_size / train_time
+        ]]
+
+    print('batch_size={}, sequence_cap={}'.format(batch_size, sequence_cap))
+    print_table(
+        ['input', 'encoder ms', 'train step ms', 'training examples/s'],
+        rows
+    )
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    sequence_cap = 56 if args.get('--basic') else 130
+    benchmark_token_input(sequence_cap, int(args.get('--batch-size')))
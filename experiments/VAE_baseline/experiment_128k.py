@@ -4,23 +4,32 @@ Experiments similar to those in experiment.py, but with limited dataset if 12800
 These are the final experiments done for the report
 
 Usage:
-    experiment_128k.py [--basic] <option>
+    experiment_128k.py [--basic] [--token-input] [--xla] [--steps-per-run=<k>] [--tune] <option>
     experiment_128k.py -h | --help
 
 Options:
-    -h --help   Show this screen.
-    -b --basic  Use the basic huzzer dataset.
+    -h --help           Show this screen.
+    -b --basic          Use the basic huzzer dataset.
+    -t --token-input    Feed token ids to the conv model rather than one-hot vectors.
+    -x --xla            Compile the graph with XLA JIT.
+    -k --steps-per-run=<k>  Training steps per sess.run, in a tf.while_loop [default: 1].
+    --tune              Benchmark the training step's thread pools and cpu affinity on this machine,
+                        save the fastest profile, which later runs use, and exit.
 
 
 """
 
 from docopt import docopt
 import logging
+import numpy as np
+import time
 
 import project_context  # NOQA
 from pipelines.data_sources import BASIC_DATASET_ARGS
 from pipelines.one_hot_token import one_hot_token_random_batcher
-from model_utils.queues import build_single_output_queue
+from model_utils.queues import build_single_output_queue, build_multiple_output_queue
+from model_utils.sessions import StepTimer, autotune, tuned_session_config
+from model_utils.training import build_multi_step_train_op
 from models import build_simple_network2, build_special_conv4_final
 
 import tensorflow as tf
@@ -28,7 +37,9 @@ from tensorflow.python.training.supervisor import Supervisor
 tf.logging.set_verbosity(tf.logging.INFO)
 
 
-def run_experiment(option, use_basic_dataset):
+def run_experiment(
+    option, use_basic_dataset, token_input=False, xla_jit=False, steps_per_run=1, tune=False
+):
     TOKEN_EMB_SIZE = 54
     BATCH_SIZE = 128
     if use_basic_dataset:
@@ -53,46 +64,97 @@ def run_experiment(option, use_basic_dataset):
         ),
         huzzer_kwargs=huzzer_kwargs
     )
-    queue = build_single_output_queue(
-        datasource,
-        output_shape=(BATCH_SIZE, sequence_cap, TOKEN_EMB_SIZE),
-        type=tf.uint8
-    )
-    raw_input_sequences = queue.dequeue(name='encoder_input')
-    input_sequences = tf.cast(raw_input_sequences, tf.float32)
-    if option.startswith('simple_'):
-        z_size = int(option.split('_')[-1])
-        build_simple_network2(
-            input_sequences, X_SHAPE, latent_dim=z_size, kl_limit=0.0
-        )
-    elif option == 'conv':
-        z_size = 128
-        build_special_conv4_final(
-            input_sequences, X_SHAPE, z_size, filter_length=3, num_filters=128,
+    if token_input:
+        assert option == 'conv', 'token input is only implemented for the conv model'
+
+        # the token ids are computed by the queue runner thread, not by the model
+        def token_datasource():
+            return np.argmax(datasource(), axis=-1).astype(np.int32)
+
+        queue = build_single_output_queue(
+            token_datasource,
+            output_shape=(BATCH_SIZE, sequence_cap),
+            type=tf.int32
         )
     else:
-        print('INVALID OPTION')
-        exit(1)
+        # the labels for the loss are computed by the queue runner thread
+        def datasource_with_labels():
+            batch = datasource()
+            return batch, np.argmax(batch, axis=-1).astype(np.int32)
+
+        queue = build_multiple_output_queue(
+            datasource_with_labels,
+            output_shapes=[
+                (BATCH_SIZE, sequence_cap, TOKEN_EMB_SIZE),
+                (BATCH_SIZE, sequence_cap)
+            ],
+            types=[tf.uint8, tf.int32]
+        )
+
+    # a training step from its own batch, built once, and once more in the
+    # while_loop of build_multi_step_train_op with the same optimizer
+    optimizer = tf.train.AdamOptimizer()
+
+    def build_train_step():
+        if token_input:
+            input_sequences = queue.dequeue(name='encoder_input')
+            labels = None
+        else:
+            raw_input_sequences, labels = queue.dequeue(name='encoder_input')
+            input_sequences = tf.cast(raw_input_sequences, tf.float32)
+
+        if option.startswith('simple_'):
+            z_size = int(option.split('_')[-1])
+            build_simple_network2(
+                input_sequences, X_SHAPE, latent_dim=z_size, kl_limit=0.0,
+                labels=labels, optimizer=optimizer
+            )
+        elif option == 'conv':
+            z_size = 128
+            build_special_conv4_final(
+                input_sequences, X_SHAPE, z_size, filter_length=3, num_filters=128,
+                token_input=token_input, labels=labels, optimizer=optimizer
+            )
+        else:
+            print('INVALID OPTION')
+            exit(1)
+
+    build_train_step()
+    train_op = 'train_on_batch'
+    if steps_per_run > 1:
+        train_op = build_multi_step_train_op(build_train_step, steps_per_run)
 
     logdir = 'experiments/VAE_baseline/{}{}'.format(
         'basic_' if use_basic_dataset else '',
         option
     )
+    model = 'VAE_baseline/{}{}'.format('basic_' if use_basic_dataset else '', option)
+    if tune:
+        autotune(model, train_op, xla_jit=xla_jit)
+        return
 
     sv = Supervisor(
         logdir=logdir,
         save_summaries_secs=10,
         save_model_secs=120
     )
+    timer = StepTimer(
+        ('xla_jit' if xla_jit else 'default') +
+        ('_{}_steps_per_run'.format(steps_per_run) if steps_per_run > 1 else ''),
+        summary_writer=sv.summary_writer
+    )
     # Get a TensorFlow session managed by the supervisor.
-    with sv.managed_session() as sess:
-        # Use the session to train the graph.
-        for i in range(20000):
+    with sv.managed_session(config=tuned_session_config(model, xla_jit)) as sess:
+        # Use the session to train the graph, for 20000 steps in all.
+        for i in range(20000 // steps_per_run):
             if sv.should_stop():
                 exit()
-            sess.run(
-                'train_on_batch',
+            start_time = time.time()
+            _, global_step = sess.run(
+                [train_op, sv.global_step],
             )
+            # the time per step, so runs with different steps_per_run compare
+            timer.record((time.time() - start_time) / steps_per_run, global_step)
 
 
 def make_example_uri(ident):
@@ -109,4 +171,8 @@ if __name__ == '__main__':
 
     option = args.get('<option>')
     use_basic_dataset = args.get('--basic')
-    run_experiment(option, use_basic_dataset)
+    token_input = args.get('--token-input')
+    run_experiment(
+        option, use_basic_dataset, token_input, args.get('--xla'),
+        int(args.get('--steps-per-run')), args.get('--tune')
+    )
@@ -0,0 +1,102 @@
+"""
+Exports the decoder of a trained model, as model_analysis builds it, to an .npz
+for model_utils.numpy_decoders, then checks the NumPy decoder against the
+tensorflow one on random latent vectors.
+
+Usage:
+    export_decoder.py [--basic] [--number=<n>] [--tolerance=<t>] <option> [<path>]
+    export_decoder.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -b --basic                Use the basic huzzer dataset.
+    -n --number=<n>           Number of latent vectors to check the export on [default: 100].
+    -t --tolerance=<t>        Largest absolute difference allowed between the decoders [default: 1e-4].
+
+<path> defaults to experiments/VAE_baseline/<basic_><option>_decoder.npz
+
+"""
+from docopt import docopt
+import numpy as np
+import time
+import tensorflow as tf
+
+import project_context  # NOQA
+from model_utils.numpy_decoders import load_decoder, save_decoder
+from model_analysis import BASEDIR, make_conv_final, make_simple
+
+
+def export_decoder(option, use_basic_dataset, path, number, tolerance):
+    sequence_cap = 56 if use_basic_dataset else 130
+    model_directory = ('basic_' if use_basic_dataset else '') + option
+    if path is None:
+        path = BASEDIR + '{}_decoder.npz'.format(model_directory)
+
+    if option.startswith('simple'):
+        z_size = int(option.split('_')[1])
+        _, _, _, decoder_input, decoder_output = make_simple(z_size, sequence_cap)
+        config = {'architecture': 'simple', 'activation': 'sigmoid', 'softmax': False}
+    elif option == 'conv':
+        z_size = 128
+        _, _, _, decoder_input, decoder_output = make_conv_final(z_size, sequence_cap)
+        config = {'architecture': 'special_conv4', 'softmax': True}
+    else:
+        print('INVALID OPTION {}'.format(option))
+        exit()
+
+    variables = decoder_variables(decoder_output)
+    saver = tf.train.Saver()
+    with tf.Session() as sess:
+        saver.restore(sess, tf.train.latest_checkpoint(BASEDIR + model_directory))
+        values = sess.run(variables)
+
+        # slim creates the weights of every layer before its biases
+        weights, biases = values[0::2], values[1::2]
+        if config['architecture'] == 'special_conv4':
+            config['num_filters'] = weights[1].shape[3]
+        save_decoder(
+            path, weights=weights, biases=biases,
+            x_shape=decoder_output.get_shape().as_list()[1:], **config
+        )
+        print('wrote {} variables to {}'.format(len(variables), path))
+
+        zs = np.random.normal(0, 1, (number, z_size))
+        expected = sess.run(decoder_output, feed_dict={decoder_input: zs})
+
+    start_time = time.time()
+    decode = load_decoder(path)
+    decoded = decode(zs)
+    print('loaded and decoded {} latent vectors with numpy in {:.3f}s'.format(
+        number, time.time() - start_time
+    ))
+
+    difference = np.max(np.abs(decoded - expected))
+    print('largest absolute difference from tensorflow: {:.3g}'.format(difference))
+    if not difference <= tolerance:
+        exit('the numpy decoder does not match tensorflow')
+
+
+def decoder_variables(decoder_output):
+    """
+    returns: the variables `decoder_output` is computed from, in the order they
+        were created
+    """
+    ops = set()
+    to_visit = [decoder_output.op]
+    while to_visit:
+        op = to_visit.pop()
+        if op not in ops:
+            ops.add(op)
+            to_visit += [t.op for t in op.inputs]
+    return [v for v in tf.global_variables() if v.op in ops]
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    export_decoder(
+        args.get('<option>'),
+        args.get('--basic'),
+        args.get('<path>'),
+        int(args.get('--number')),
+        float(args.get('--tolerance'))
+    )
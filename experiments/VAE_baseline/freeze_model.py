@@ -0,0 +1,36 @@
+"""
+Freezes the encoder and decoder of a trained model, as model_analysis builds
+them, to frozen_encoder.pb and frozen_decoder.pb in the model's directory, for
+`model_analysis.py --frozen`.
+
+Usage:
+    freeze_model.py [--basic] <option>
+    freeze_model.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -b --basic                Use the basic huzzer dataset.
+
+"""
+from docopt import docopt
+import tensorflow as tf
+
+import project_context  # NOQA
+from model_utils.frozen_graphs import export_frozen_graphs
+from model_analysis import BASEDIR, analysis_subgraphs, make_model
+
+
+def freeze_model(option, use_basic_dataset):
+    sequence_cap = 56 if use_basic_dataset else 130
+    directory = BASEDIR + ('basic_' if use_basic_dataset else '') + option
+
+    tensors = make_model(option, sequence_cap)
+    saver = tf.train.Saver()
+    with tf.Session() as sess:
+        saver.restore(sess, tf.train.latest_checkpoint(directory))
+        export_frozen_graphs(sess, analysis_subgraphs(*tensors), directory)
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    freeze_model(args.get('<option>'), args.get('--basic'))
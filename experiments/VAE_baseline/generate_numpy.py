@@ -0,0 +1,43 @@
+"""
+Generates programs from random latent vectors with a decoder exported by
+export_decoder.py, in NumPy only, so it starts without importing tensorflow.
+
+Usage:
+    generate_numpy.py [--number=<n>] [--std=<std>] <path>
+    generate_numpy.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -n --number=<n>           Number of programs to generate [default: 10].
+    -s --std=<std>            Standard deviation of the latent vectors [default: 1.0].
+
+"""
+from docopt import docopt
+import numpy as np
+import time
+
+import project_context  # NOQA
+from model_utils.evaluation import tokens_to_code
+from model_utils.numpy_decoders import decoder_from_arrays, load_arrays
+
+
+def generate_programs(path, number, std):
+    start_time = time.time()
+    arrays = load_arrays(path)
+    decode = decoder_from_arrays(arrays)
+    z_size = arrays['weights_0'].shape[0]
+
+    token_probs = decode(np.random.normal(0, std, (number, z_size)))
+    for tokens in np.argmax(token_probs, axis=-1):
+        print(tokens_to_code(tokens))
+        print()
+    print('generated {} programs in {:.3f}s'.format(number, time.time() - start_time))
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    generate_programs(
+        args.get('<path>'),
+        int(args.get('--number')),
+        float(args.get('--std'))
+    )
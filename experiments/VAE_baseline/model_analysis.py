@@ -6,12 +6,14 @@ Makes examples of computed values of an autoencoder
 * a markov chain generated vector
 
 Usage:
-    model_analysis.py [--basic] <option>
+    model_analysis.py [--basic] [--frozen] [--batch-size=<size>] <option>
     model_analysis.py -h | --help
 
 Options:
-    -h --help   Show this screen.
-    -b --basic  Use the basic huzzer dataset.
+    -h --help                 Show this screen.
+    -b --basic                Use the basic huzzer dataset.
+    -f --frozen               Load the frozen graphs of freeze_model.py, rather than building the model.
+    -s --batch-size=<size>    Number of examples to encode/decode per run [default: 250].
 
 """
 from docopt import docopt
@@ -19,6 +21,7 @@ from sys import argv
 from tqdm import trange
 from scipy.misc import imsave
 import os
+import time
 import errno
 import numpy as np
 from random import randint
@@ -32,6 +35,8 @@ import tensorflow as tf
 from tensorflow.contrib import slim
 
 from pipelines.data_sources import HuzzerSource, OneHotVecotorizer, TokenDatasource
+from model_utils.frozen_graphs import frozen_graph_path, load_frozen_graph
+from model_utils.sessions import tuned_session_config
 from models import (  # NOQA
     build_conv1_encoder,
     build_decoder,
@@ -53,23 +58,18 @@ BASEDIR = 'experiments/VAE_baseline/'
 
 NUMBER_OF_EXAMPLES = 1000
 
-def analyze_model(option, use_basic_dataset):
+def analyze_model(option, use_basic_dataset, batch_size=250, frozen=False):
     sequence_cap = 56 if use_basic_dataset else 130
+    model_directory = ('basic_' if use_basic_dataset else '') + option
 
-    if option.startswith('simple'):
-        z_size = int(option.split('_')[1])
-        _, encoder_input, encoder_output, decoder_input, decoder_output = make_simple(z_size, sequence_cap)
-    elif option == 'conv':
-        z_size = 128
-        _, encoder_input, encoder_output, decoder_input, decoder_output = make_conv_final(
-            z_size,
-            sequence_cap
+    if frozen:
+        encoder_input, encoder_output, decoder_input, decoder_output = load_frozen_model(
+            BASEDIR + model_directory
         )
     else:
-        print('INVALID OPTION {}'.format(option))
-        exit()
-
-    model_directory = ('basic_' if use_basic_dataset else '') + option
+        encoder_input, encoder_output, decoder_input, decoder_output = make_model(
+            option, sequence_cap
+        )
 
     huzzer_kwargs = BASIC_DATASET_ARGS if use_basic_dataset else {}
     sequence_cap = 56 if use_basic_dataset else 130
@@ -85,37 +85,13 @@ def analyze_model(option, use_basic_dataset):
         huzzer_kwargs=huzzer_kwargs
     )
 
-    saver = tf.train.Saver()
-    with tf.Session() as sess:
-
-        restore_dir = tf.train.latest_checkpoint(BASEDIR + '{}'.format(model_directory))
-        print('resoring sesstion at : ' + restore_dir)
-        saver.restore(
-            sess, restore_dir
-        )
-
-        def g(latent_rep=None, variance=1):
-            if latent_rep is None:
-                latent_rep = np.random.normal(0, variance, decoder_input.get_shape()[-1].value)
-            generated = sess.run(
-                decoder_output,
-                feed_dict={
-                    decoder_input: np.reshape(latent_rep, (1, -1))
-                }
+    with tf.Session(config=tuned_session_config('VAE_baseline/' + model_directory)) as sess:
+        if not frozen:
+            restore_dir = tf.train.latest_checkpoint(BASEDIR + '{}'.format(model_directory))
+            print('resoring sesstion at : ' + restore_dir)
+            tf.train.Saver().restore(
+                sess, restore_dir
             )
-            return generated, latent_rep
-
-        def e(example_data=None):
-            if example_data is None:
-                example_data = dataset()[0]
-            example_data = np.expand_dims(example_data, 0)
-            encoded = sess.run(
-                encoder_output,
-                feed_dict={
-                    encoder_input: example_data
-                }
-            )
-            return encoded, example_data
 
         examples_dir = BASEDIR + '{}{}_examples'.format(
             'basic_' if use_basic_dataset else '',
@@ -128,52 +104,145 @@ def analyze_model(option, use_basic_dataset):
         mkdir_p(latent_sampling_dir)
         mkdir_p(autoencoded_dir)
 
+        # all the model runs are done in batches first, the files are written after
+        start_time = time.time()
+
         #  Autoencode bit
+        example_inputs = np.concatenate(
+            [dataset()[0] for _ in range(NUMBER_OF_EXAMPLES)], axis=0
+        )
+        latent_reps = run_in_batches(
+            sess, encoder_output, encoder_input, example_inputs, batch_size
+        )
+        reconstructed = run_in_batches(
+            sess, decoder_output, decoder_input, latent_reps, batch_size
+        )
 
-        for i in trange(NUMBER_OF_EXAMPLES):
-            dir_for_example = os.path.join(autoencoded_dir, str(i))
-            mkdir_p(dir_for_example)
-            example_input = np.squeeze(dataset()[0], 0)
-            input_text = example_to_code(example_input)
+        #  generate bit
+        z_size = decoder_input.get_shape()[-1].value
+        sampled_latent_reps = np.random.normal(0, 1, (NUMBER_OF_EXAMPLES, z_size))
+        generated = run_in_batches(
+            sess, decoder_output, decoder_input, sampled_latent_reps, batch_size
+        )
 
-            latent_rep, _ = e(example_input)
+        print('encoded and decoded {} examples in {:.2f}s'.format(
+            NUMBER_OF_EXAMPLES, time.time() - start_time
+        ))
 
-            latent_image = latent_rep.reshape((latent_rep.size // 32, 32))
+    for i in trange(NUMBER_OF_EXAMPLES):
+        dir_for_example = os.path.join(autoencoded_dir, str(i))
+        mkdir_p(dir_for_example)
+        write_latent_image(dir_for_example + '/{}_latent.png'.format(i), latent_reps[i])
+        imsave(dir_for_example + '/input.png', example_inputs[i].astype('float32').T)
+        imsave(dir_for_example + '/decoder_output.png', reconstructed[i].T)
 
-            imsave(
-                dir_for_example + '/{}_latent.png'.format(i),
-                latent_image
-            )
-            reconstrcted_tokens, _ = g(latent_rep)
-            reconstrcted_tokens = np.squeeze(reconstrcted_tokens, 0)
-            autoencoded_text = example_to_code(reconstrcted_tokens)
-            imsave(dir_for_example + '/input.png', example_input.astype('float32').T)
-            imsave(dir_for_example + '/decoder_output.png', reconstrcted_tokens.T)
+        with open(dir_for_example + '/input.hs', 'w') as f:
+            f.write(example_to_code(example_inputs[i]))
 
-            with open(dir_for_example + '/input.hs', 'w') as f:
-                f.write(input_text)
+        with open(dir_for_example + '/autoencoded_code.hs', 'w') as f:
+            f.write(example_to_code(reconstructed[i]))
 
-            with open(dir_for_example + '/autoencoded_code.hs', 'w') as f:
-                f.write(autoencoded_text)
+    for i in trange(NUMBER_OF_EXAMPLES):
+        dir_for_example = os.path.join(latent_sampling_dir, str(i))
+        mkdir_p(dir_for_example)
+        write_latent_image(
+            dir_for_example + '/{}_latent.png'.format(i), sampled_latent_reps[i]
+        )
+        imsave(dir_for_example + '/decoder_output.png', generated[i].T)
 
-        #  generate bit
+        with open(dir_for_example + '/generated_code.hs', 'w') as f:
+            f.write(example_to_code(generated[i]))
+
+
+def make_model(option, sequence_cap):
+    """
+    returns: the encoder_input, encoder_output, decoder_input and decoder_output
+        of the model of `option`
+    """
+    if option.startswith('simple'):
+        z_size = int(option.split('_')[1])
+        _, encoder_input, encoder_output, decoder_input, decoder_output = make_simple(z_size, sequence_cap)
+    elif option == 'conv':
+        z_size = 128
+        _, encoder_input, encoder_output, decoder_input, decoder_output = make_conv_final(
+            z_size,
+            sequence_cap
+        )
+    else:
+        print('INVALID OPTION {}'.format(option))
+        exit()
+    return encoder_input, encoder_output, decoder_input, decoder_output
+
+
+def analysis_subgraphs(encoder_input, encoder_output, decoder_input, decoder_output):
+    """
+    The encoder and decoder of a model, as freeze_model.py freezes them
+    """
+    return {
+        'encoder': ({'encoder_input': encoder_input}, {'encoder_output': encoder_output}),
+        'decoder': ({'decoder_input': decoder_input}, {'decoder_output': decoder_output}),
+    }
+
+
+def load_frozen_model(directory):
+    """
+    returns: the encoder_input, encoder_output, decoder_input and decoder_output
+        of the frozen graphs in `directory`
+    """
+    encoder_inputs, encoder_outputs = load_frozen_graph(
+        frozen_graph_path(directory, 'encoder'), 'encoder'
+    )
+    decoder_inputs, decoder_outputs = load_frozen_graph(
+        frozen_graph_path(directory, 'decoder'), 'decoder'
+    )
+    return (
+        encoder_inputs['encoder_input'], encoder_outputs['encoder_output'],
+        decoder_inputs['decoder_input'], decoder_outputs['decoder_output']
+    )
 
-        for i in trange(NUMBER_OF_EXAMPLES):
-            dir_for_example = os.path.join(latent_sampling_dir, str(i))
-            mkdir_p(dir_for_example)
 
-            reconstrcted_tokens, latent_rep = g()
-            latent_image = latent_rep.reshape((latent_rep.size // 32, 32))
-            imsave(
-                dir_for_example + '/{}_latent.png'.format(i),
-                latent_image
+def encode_held_out_programs(option, use_basic_dataset, number, batch_size, cache_path):
+    """
+    Encodes `number` programs, which the model was not trained on, with the
+    encoder of the latest checkpoint, on cpu
+
+    returns: the one hot programs, and their latent vectors
+    """
+    sequence_cap = 56 if use_basic_dataset else 130
+    model_directory = ('basic_' if use_basic_dataset else '') + option
+    dataset = one_hot_token_dataset(
+        batch_size=1,
+        number_of_batches=number,
+        cache_path=('basic_' if use_basic_dataset else '') + cache_path,
+        length=sequence_cap,
+        huzzer_kwargs=BASIC_DATASET_ARGS if use_basic_dataset else {}
+    )
+    example_inputs = np.concatenate([dataset()[0] for _ in range(number)], axis=0)
+
+    with tf.Graph().as_default():
+        encoder_input, encoder_output, _, _ = make_model(option, sequence_cap)
+        with tf.Session(config=tf.ConfigProto(device_count={'GPU': 0})) as sess:
+            tf.train.Saver().restore(sess, tf.train.latest_checkpoint(BASEDIR + model_directory))
+            latent_reps = run_in_batches(
+                sess, encoder_output, encoder_input, example_inputs, batch_size
             )
-            reconstrcted_tokens = np.squeeze(reconstrcted_tokens, 0)
-            autoencoded_text = example_to_code(reconstrcted_tokens)
-            imsave(dir_for_example + '/decoder_output.png', reconstrcted_tokens.T)
+    return example_inputs, latent_reps
 
-            with open(dir_for_example + '/generated_code.hs', 'w') as f:
-                f.write(autoencoded_text)
+
+def run_in_batches(sess, output, input_placeholder, data, batch_size):
+    """
+    Runs `output` on the rows of `data`, `batch_size` rows per run, and returns
+    the concatenated results.
+    """
+    return np.concatenate([
+        sess.run(output, feed_dict={input_placeholder: data[i:i + batch_size]})
+        for i in range(0, len(data), batch_size)
+    ], axis=0)
+
+
+def write_latent_image(path, latent_rep):
+    latent_image = latent_rep.reshape((latent_rep.size // 32, 32))
+    imsave(path, latent_image)
 
 
 def example_to_code(example):
@@ -197,14 +266,14 @@ def make_simple(latent_dim, sequence_length):
     )
 
     x_shape = (sequence_length, 54)
-    encoder_input = tf.placeholder(tf.float32, shape=(1, *x_shape), name='encoder_input')
+    encoder_input = tf.placeholder(tf.float32, shape=(None, *x_shape), name='encoder_input')
     x_flat = slim.flatten(encoder_input)
     z = slim.fully_connected(
         x_flat, latent_dim, scope='encoder_output', activation_fn=tf.tanh
     )
     encoder_output = tf.identity(z, 'this_is_output')
 
-    decoder_input = tf.placeholder(tf.float32, shape=(1, latent_dim), name='decoder_input')
+    decoder_input = tf.placeholder(tf.float32, shape=(None, latent_dim), name='decoder_input')
     decoder_output = build_decoder(decoder_input, x_shape)
     return data_pipeline, encoder_input, encoder_output, decoder_input, decoder_output
 
@@ -304,8 +373,8 @@ def make_conv_final(z_size, sequence_cap):
     num_filters = 128
 
     with conv_arg_scope_final():
-        decoder_input = tf.placeholder(tf.float32, shape=(1, latent_dim), name='decoder_input')
-        encoder_input = tf.placeholder(tf.float32, shape=(1, *x_shape), name='encoder_input')
+        decoder_input = tf.placeholder(tf.float32, shape=(None, latent_dim), name='decoder_input')
+        encoder_input = tf.placeholder(tf.float32, shape=(None, *x_shape), name='encoder_input')
 
         encoder_output, z_log_sigmas, dense_layer_size = build_special_conv4_encoder(
             encoder_input, latent_dim, num_filters, filter_length
@@ -473,4 +542,5 @@ if __name__ == '__main__':
     args = docopt(__doc__, version='N/A')
     option = args.get('<option>')
     use_basic_dataset = args.get('--basic')
-    analyze_model(option, use_basic_dataset)
+    batch_size = int(args.get('--batch-size'))
+    analyze_model(option, use_basic_dataset, batch_size, args.get('--frozen'))
@@ -1,5 +1,7 @@
 import project_context  # NOQA
-from model_utils.loss_functions import vae_loss, vae_cross_entropy_loss
+from model_utils.loss_functions import (
+    vae_loss, vae_cross_entropy_loss, vae_sparse_cross_entropy_loss
+)
 from model_utils.ops import vae_resampling
 
 import tensorflow as tf
@@ -73,9 +75,14 @@ def build_simple_network(x, x_shape, latent_dim=16, epsilon_std=0.01):
     return NAMES
 
 
-def build_simple_network2(x, x_shape, latent_dim, kl_limit=0.1, epsilon_std=0.01):
+def build_simple_network2(
+    x, x_shape, latent_dim, kl_limit=0.1, epsilon_std=0.01, labels=None, optimizer=None
+):
     """
     TODO: what this is - cross entropy + vae limie
+
+    If the int token `labels` (b x l) of x are given, the loss uses them rather
+    than taking the argmax of x. The `optimizer` defaults to a new AdamOptimizer.
     """
     x_flat = slim.flatten(x)
 
@@ -93,20 +100,82 @@ def build_simple_network2(x, x_shape, latent_dim, kl_limit=0.1, epsilon_std=0.01
 
     x_decoded_mean_reshaped = build_decoder(z_resampled, x_shape, activation=tf.nn.relu6)
 
-    loss = vae_cross_entropy_loss(
-        x, x_decoded_mean_reshaped, mus, log_sigmas, kl_limit=kl_limit
+    loss = vae_sparse_cross_entropy_loss(
+        token_labels(x, False, labels), x_decoded_mean_reshaped, mus, log_sigmas,
+        kl_limit=kl_limit
     )
 
-    optimizer = tf.train.AdamOptimizer()
+    optimizer = optimizer or tf.train.AdamOptimizer()
 
     tf.identity(slim.learning.create_train_op(loss, optimizer), name='train_on_batch')
 
     return NAMES
 
 
+@slim.add_arg_scope
+def token_embedding_conv2d(
+    token_ids,
+    num_outputs,
+    filter_length,
+    token_emb_size=54,
+    activation_fn=tf.nn.relu,
+    normalizer_fn=None,
+    normalizer_params=None,
+    weights_initializer=layers.xavier_initializer(),
+    weights_regularizer=None,
+    biases_initializer=tf.zeros_initializer(),
+    biases_regularizer=None,
+    scope=None
+):
+    """
+    Computes the same as the first layer of the special conv encoders:
+        layers.conv2d(x, num_outputs, (filter_length, token_emb_size), padding='VALID')
+    where x is the (b x l x token_emb_size x 1) one-hot image of `token_ids` (b x l).
+
+    As x is one-hot, the conv is a sum of `filter_length` embedding lookups of shifted
+    token ids, so no multiplications with the zeros of x are done. The variables are
+    named and shaped as in layers.conv2d, so weights can be restored from checkpoints
+    of the one-hot models.
+    """
+    with tf.variable_scope(scope, 'Conv', [token_ids]):
+        weights = slim.model_variable(
+            'weights',
+            shape=(filter_length, token_emb_size, 1, num_outputs),
+            initializer=weights_initializer,
+            regularizer=weights_regularizer
+        )
+        # row (i * token_emb_size + t) is the filter response to token t at offset i
+        embeddings = tf.reshape(weights, (filter_length * token_emb_size, num_outputs))
+
+        output_length = token_ids.get_shape()[1].value - filter_length + 1
+        shifted_ids = tf.stack(
+            [
+                token_ids[:, i:i + output_length] + i * token_emb_size
+                for i in range(filter_length)
+            ],
+            axis=-1
+        )
+        net = tf.reduce_sum(tf.nn.embedding_lookup(embeddings, shifted_ids), axis=2)
+        net = tf.expand_dims(net, 2)
+
+        if normalizer_fn is not None:
+            net = normalizer_fn(net, **(normalizer_params or {}))
+        else:
+            biases = slim.model_variable(
+                'biases',
+                shape=(num_outputs,),
+                initializer=biases_initializer,
+                regularizer=biases_regularizer
+            )
+            net = net + biases
+        if activation_fn is not None:
+            net = activation_fn(net)
+    return net
+
+
 def conv_arg_scope2():
     return slim.arg_scope(
-        [layers.conv2d, layers.conv2d_transpose],
+        [layers.conv2d, layers.conv2d_transpose, token_embedding_conv2d],
         activation_fn=tf.nn.elu,
         weights_regularizer=slim.l1_regularizer(0.001),
         biases_regularizer=slim.l1_regularizer(0.001)
@@ -114,13 +183,13 @@ def conv_arg_scope2():
 
 def conv_arg_scope_final():
     return slim.arg_scope(
-        [layers.conv2d, layers.conv2d_transpose],
+        [layers.conv2d, layers.conv2d_transpose, token_embedding_conv2d],
         activation_fn=tf.nn.relu,
     )
 
 def conv_arg_scope():
     return slim.arg_scope(
-        [layers.conv2d, layers.conv2d_transpose],
+        [layers.conv2d, layers.conv2d_transpose, token_embedding_conv2d],
         activation_fn=tf.nn.elu,
         normalizer_fn=layers.batch_norm,
         normalizer_params={'scale': True}
@@ -379,47 +448,57 @@ def build_special_conv_decoder(z_resampled, x_shape):
     return x_decoded_mean
 
 
-def build_special_conv2(x, x_shape, latent_dim, epsilon_std=0.01):
+def build_special_conv2(x, x_shape, latent_dim, epsilon_std=0.01, token_input=False):
     """
     TODO: what this is - (one conv then fully connected)
     """
 
     num_filters = 64
     with conv_arg_scope():
-        z_mus, z_log_sigmas = build_special_conv2_encoder(x, latent_dim, num_filters)
+        z_mus, z_log_sigmas = build_special_conv2_encoder(
+            x, latent_dim, num_filters, token_input=token_input
+        )
         z_resampled = build_resampling(z_mus, z_log_sigmas, epsilon_std)
 
         x_decoded_mean = build_special_conv2_decoder(z_resampled, x_shape, num_filters)
-        loss = vae_cross_entropy_loss(x, x_decoded_mean, z_mus, z_log_sigmas, kl_limit=0.1)
+        loss = vae_sparse_cross_entropy_loss(
+            token_labels(x, token_input), x_decoded_mean, z_mus, z_log_sigmas,
+            kl_limit=0.1
+        )
         optimizer = tf.train.AdamOptimizer()
         tf.identity(slim.learning.create_train_op(loss, optimizer), name='train_on_batch')
     return NAMES
 
 
 def build_special_conv2_l1(
-    x, x_shape, latent_dim, filter_length=1, num_filters=64, epsilon_std=0.01
+    x, x_shape, latent_dim, filter_length=1, num_filters=64, epsilon_std=0.01,
+    token_input=False
 ):
     with conv_arg_scope2():
         z_mus, z_log_sigmas = build_special_conv2_encoder(
-            x, latent_dim, num_filters, filter_length
+            x, latent_dim, num_filters, filter_length, token_input=token_input
         )
         z_resampled = build_resampling(z_mus, z_log_sigmas, epsilon_std)
 
         x_decoded_mean = build_special_conv2_decoder(
             z_resampled, x_shape, num_filters, filter_length
         )
-        loss = vae_cross_entropy_loss(x, x_decoded_mean, z_mus, z_log_sigmas, kl_limit=0.1)
+        loss = vae_sparse_cross_entropy_loss(
+            token_labels(x, token_input), x_decoded_mean, z_mus, z_log_sigmas,
+            kl_limit=0.1
+        )
         optimizer = tf.train.AdamOptimizer()
         tf.identity(slim.learning.create_train_op(loss, optimizer), name='train_on_batch')
     return NAMES
 
 
-def build_special_conv2_encoder(x, latent_dim, num_filters, filter_length=1):
+def build_special_conv2_encoder(x, latent_dim, num_filters, filter_length=1, token_input=False):
+    """
+    If `token_input` is set, x is a (b x l) tensor of int token ids rather than
+    one-hot vectors.
+    """
     print('building encoder')
-    x_conv = tf.expand_dims(x, -1)
-    print('input: {}'.format(x_conv.get_shape()))
-
-    net = layers.conv2d(x_conv, num_filters, (filter_length, 54), padding='VALID')
+    net = build_special_conv_input_layer(x, num_filters, filter_length, token_input)
     print('conv: {}'.format(net.get_shape()))
 
     net = layers.flatten(net)
@@ -463,47 +542,55 @@ def build_special_conv2_decoder(z_resampled, x_shape, num_filters, filter_length
 
 
 def build_special_conv4_l1(
-    x, x_shape, latent_dim, filter_length=1, num_filters=64, epsilon_std=0.01
+    x, x_shape, latent_dim, filter_length=1, num_filters=64, epsilon_std=0.01,
+    token_input=False
 ):
     with conv_arg_scope2():
         z_mus, z_log_sigmas, dense_layer_size = build_special_conv4_encoder(
-            x, latent_dim, num_filters, filter_length
+            x, latent_dim, num_filters, filter_length, token_input=token_input
         )
         z_resampled = build_resampling(z_mus, z_log_sigmas, epsilon_std)
 
         x_decoded_mean = build_special_conv4_decoder(
             z_resampled, x_shape, num_filters, filter_length, dense_layer_size
         )
-        loss = vae_cross_entropy_loss(x, x_decoded_mean, z_mus, z_log_sigmas, kl_limit=0.1)
+        loss = vae_sparse_cross_entropy_loss(
+            token_labels(x, token_input), x_decoded_mean, z_mus, z_log_sigmas,
+            kl_limit=0.1
+        )
         optimizer = tf.train.AdamOptimizer()
         tf.identity(slim.learning.create_train_op(loss, optimizer), name='train_on_batch')
     return NAMES
 
 
 def build_special_conv4_final(
-    x, x_shape, latent_dim, filter_length=1, num_filters=64, epsilon_std=0.01
+    x, x_shape, latent_dim, filter_length=1, num_filters=64, epsilon_std=0.01,
+    token_input=False, labels=None, optimizer=None
 ):
     with conv_arg_scope_final():
         z_mus, z_log_sigmas, dense_layer_size = build_special_conv4_encoder(
-            x, latent_dim, num_filters, filter_length
+            x, latent_dim, num_filters, filter_length, token_input=token_input
         )
         z_resampled = build_resampling(z_mus, z_log_sigmas, epsilon_std)
 
         x_decoded_mean = build_special_conv4_decoder(
             z_resampled, x_shape, num_filters, filter_length, dense_layer_size
         )
-        loss = vae_cross_entropy_loss(x, x_decoded_mean, z_mus, z_log_sigmas)
-        optimizer = tf.train.AdamOptimizer()
+        loss = vae_sparse_cross_entropy_loss(
+            token_labels(x, token_input, labels), x_decoded_mean, z_mus, z_log_sigmas
+        )
+        optimizer = optimizer or tf.train.AdamOptimizer()
         tf.identity(slim.learning.create_train_op(loss, optimizer), name='train_on_batch')
     return NAMES
 
 
-def build_special_conv4_encoder(x, latent_dim, num_filters, filter_length=1):
+def build_special_conv4_encoder(x, latent_dim, num_filters, filter_length=1, token_input=False):
+    """
+    If `token_input` is set, x is a (b x l) tensor of int token ids rather than
+    one-hot vectors.
+    """
     print('building encoder')
-    x_conv = tf.expand_dims(x, -1)
-    print('input: {}'.format(x_conv.get_shape()))
-
-    net = layers.conv2d(x_conv, num_filters, (filter_length, 54), padding='VALID')
+    net = build_special_conv_input_layer(x, num_filters, filter_length, token_input)
     print('conv: {}'.format(net.get_shape()))
 
     net = layers.conv2d(net, num_filters, (5, 1), padding='VALID')
@@ -560,6 +647,30 @@ def build_special_conv4_decoder(z_resampled, x_shape, num_filters, filter_length
     return x_decoded_mean
 
 
+def build_special_conv_input_layer(x, num_filters, filter_length, token_input):
+    """
+    The first (filter_length x 54) conv layer of the special conv encoders.
+    """
+    if token_input:
+        print('input: {}'.format(x.get_shape()))
+        return token_embedding_conv2d(x, num_filters, filter_length)
+
+    x_conv = tf.expand_dims(x, -1)
+    print('input: {}'.format(x_conv.get_shape()))
+    return layers.conv2d(x_conv, num_filters, (filter_length, 54), padding='VALID')
+
+
+def token_labels(x, token_input, labels=None):
+    """
+    The int token labels of the model input, used by the losses.
+    """
+    if labels is not None:
+        return labels
+    if token_input:
+        return x
+    return tf.argmax(x, 2)  # HACK!
+
+
 def build_resampling(z_mus, z_log_sigmas, epsilon_std):
     def sampling(z_mean, z_log_sigma):
         epsilon = tf.random_normal(
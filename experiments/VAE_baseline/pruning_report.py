@@ -0,0 +1,97 @@
+"""
+Magnitude prunes the dense layers of a decoder exported by export_decoder.py to
+a range of sparsities, and reports, on the reconstructions of held-out programs
+encoded by the tensorflow model, the decoding throughput in NumPy with the
+pruned layers dense and sparse, and the edit distance of the reconstructions
+from the inputs.
+
+Usage:
+    pruning_report.py [--basic] [--number=<n>] [--batch-size=<size>] [--sparsities=<s>] <option> [<path>]
+    pruning_report.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -b --basic                Use the basic huzzer dataset.
+    -n --number=<n>           Number of held-out programs [default: 1000].
+    -s --batch-size=<size>    Number of programs to decode per batch [default: 250].
+    -p --sparsities=<s>       Comma separated sparsities to prune to [default: 0,0.5,0.75,0.9,0.95,0.99].
+
+<path> defaults to experiments/VAE_baseline/<basic_><option>_decoder.npz, as
+written by export_decoder.py
+
+"""
+from docopt import docopt
+import numpy as np
+import time
+
+import project_context  # NOQA
+from model_utils.benchmark import print_table
+from model_utils.evaluation import mean_normalized_levenshtein_distance
+from model_utils.numpy_decoders import decoder_from_arrays
+from model_utils.pruning import load_sparse_matrices, prune_arrays, sparsify_arrays
+from model_analysis import BASEDIR, encode_held_out_programs
+
+HEADERS = [
+    'sparsity', 'dense programs per second', 'sparse programs per second', 'speedup',
+    'token accuracy', 'mean levenshtein distance', 'same tokens as unpruned'
+]
+
+
+def pruning_report(option, use_basic_dataset, path, number, batch_size, sparsities):
+    model_directory = ('basic_' if use_basic_dataset else '') + option
+    if path is None:
+        path = BASEDIR + '{}_decoder.npz'.format(model_directory)
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+
+    example_inputs, latent_reps = encode_held_out_programs(
+        option, use_basic_dataset, number, batch_size, 'pruning_report'
+    )
+    input_tokens = np.argmax(example_inputs, axis=-1)
+
+    rows = []
+    unpruned_tokens = None
+    for sparsity in sparsities:
+        pruned = prune_arrays(arrays, sparsity)
+        outputs, dense_time = decode_in_batches(
+            decoder_from_arrays(pruned), latent_reps, batch_size
+        )
+        _, sparse_time = decode_in_batches(
+            decoder_from_arrays(load_sparse_matrices(sparsify_arrays(pruned, min_sparsity=0))),
+            latent_reps, batch_size
+        )
+        tokens = np.argmax(outputs, axis=-1)
+        if unpruned_tokens is None:
+            unpruned_tokens = tokens
+        rows.append([
+            sparsity, number / dense_time, number / sparse_time, dense_time / sparse_time,
+            np.mean(tokens == input_tokens),
+            mean_normalized_levenshtein_distance(tokens, input_tokens),
+            np.mean(tokens == unpruned_tokens)
+        ])
+    print('{}, {} held-out programs on cpu'.format(model_directory, number))
+    print_table(HEADERS, rows)
+
+
+def decode_in_batches(decode, latent_reps, batch_size):
+    """
+    returns: the decoder outputs for latent_reps, and the wall time taken
+    """
+    start_time = time.time()
+    outputs = np.concatenate([
+        decode(latent_reps[i:i + batch_size])
+        for i in range(0, len(latent_reps), batch_size)
+    ], axis=0)
+    return outputs, time.time() - start_time
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    pruning_report(
+        args.get('<option>'),
+        args.get('--basic'),
+        args.get('<path>'),
+        int(args.get('--number')),
+        int(args.get('--batch-size')),
+        [float(s) for s in args.get('--sparsities').split(',')]
+    )
@@ -0,0 +1,99 @@
+"""
+Compares the int8 copy of a decoder exported by export_decoder.py with the
+float32 one, on the reconstructions of held-out programs encoded by the
+tensorflow model: size, load time and decoding throughput in NumPy, and how
+well the decoded programs match the inputs and each other.
+
+Usage:
+    quantization_report.py [--basic] [--number=<n>] [--batch-size=<size>] <option> [<path>]
+    quantization_report.py -h | --help
+
+Options:
+    -h --help                 Show this screen.
+    -b --basic                Use the basic huzzer dataset.
+    -n --number=<n>           Number of held-out programs [default: 1000].
+    -s --batch-size=<size>    Number of programs to decode per batch [default: 250].
+
+<path> defaults to experiments/VAE_baseline/<basic_><option>_decoder.npz, as
+written by export_decoder.py, the int8 copy is written beside it
+
+"""
+from docopt import docopt
+import numpy as np
+import os
+import time
+
+import project_context  # NOQA
+from model_utils.benchmark import print_table
+from model_utils.numpy_decoders import load_decoder
+from model_utils.quantization import quantize_file, quantized_path
+from model_analysis import BASEDIR, encode_held_out_programs
+
+HEADERS = [
+    'decoder', 'size (kB)', 'load time (s)', 'programs per second',
+    'token accuracy', 'same programs as input', 'same tokens as float32',
+    'max abs difference'
+]
+
+
+def quantization_report(option, use_basic_dataset, path, number, batch_size):
+    model_directory = ('basic_' if use_basic_dataset else '') + option
+    if path is None:
+        path = BASEDIR + '{}_decoder.npz'.format(model_directory)
+    int8_path = quantized_path(path)
+    quantize_file(path, int8_path)
+
+    example_inputs, latent_reps = encode_held_out_programs(
+        option, use_basic_dataset, number, batch_size, 'quantization_report'
+    )
+
+    input_tokens = np.argmax(example_inputs, axis=-1)
+    float32_outputs, float32_row = decoder_row(
+        'numpy, float32', path, latent_reps, batch_size, input_tokens
+    )
+    int8_outputs, int8_row = decoder_row(
+        'numpy, int8', int8_path, latent_reps, batch_size, input_tokens, float32_outputs
+    )
+    print('{}, {} held-out programs on cpu'.format(model_directory, number))
+    print_table(HEADERS, [float32_row, int8_row])
+
+
+def decoder_row(name, path, latent_reps, batch_size, input_tokens, reference_outputs=None):
+    """
+    Decodes latent_reps with the exported decoder at `path`
+
+    returns: the decoder outputs, and the decoder's row of the report, compared
+        with the reference_outputs of the float32 decoder, if given
+    """
+    start_time = time.time()
+    decode = load_decoder(path)
+    load_time = time.time() - start_time
+
+    start_time = time.time()
+    outputs = np.concatenate([
+        decode(latent_reps[i:i + batch_size])
+        for i in range(0, len(latent_reps), batch_size)
+    ], axis=0)
+    decode_time = time.time() - start_time
+
+    tokens = np.argmax(outputs, axis=-1)
+    if reference_outputs is None:
+        reference_outputs = outputs
+    return outputs, [
+        name, os.path.getsize(path) / 1e3, load_time, len(outputs) / decode_time,
+        np.mean(tokens == input_tokens),
+        np.mean(np.all(tokens == input_tokens, axis=1)),
+        np.mean(tokens == np.argmax(reference_outputs, axis=-1)),
+        float(np.max(np.abs(outputs - reference_outputs)))
+    ]
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='N/A')
+    quantization_report(
+        args.get('<option>'),
+        args.get('--basic'),
+        args.get('<path>'),
+        int(args.get('--number')),
+        int(args.get('--batch-size'))
+    )
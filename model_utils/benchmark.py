@@ -0,0 +1,36 @@
+import time
+
+
+def time_run(sess, fetches, feed_dict=None, number_of_runs=20, warmup_runs=3):
+    """
+    Returns the mean wall time in seconds of `sess.run(fetches, feed_dict)`, after
+    running it `warmup_runs` times first.
+    """
+    for _ in range(warmup_runs):
+        sess.run(fetches, feed_dict=feed_dict)
+
+    start = time.time()
+    for _ in range(number_of_runs):
+        sess.run(fetches, feed_dict=feed_dict)
+    return (time.time() - start) / number_of_runs
+
+
+def print_table(headers, rows):
+    """
+    Prints rows of values as a markdown table, so results can be pasted into notes.md
+    """
+    rows = [[format_value(v) for v in row] for row in rows]
+    widths = [
+        max(len(str(h)), *[len(row[i]) for row in rows]) if rows else len(str(h))
+        for i, h in enumerate(headers)
+    ]
+    print('| ' + ' | '.join(str(h).ljust(w) for h, w in zip(headers, widths)) + ' |')
+    print('|' + '|'.join('-' * (w + 2) for w in widths) + '|')
+    for row in rows:
+        print('| ' + ' | '.join(v.ljust(w) for v, w in zip(row, widths)) + ' |')
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return '{:.4g}'.format(value)
+    return str(value)
@@ -0,0 +1,243 @@
+import json
+import numpy as np
+import os
+import re
+import tensorflow as tf
+from tensorflow.python.ops import io_ops
+
+
+# Block cells (LSTMBlockCell/GRUBlockCell) name their variables differently to
+# the standard cells. These rules rename block cell variables to the names the
+# standard cells use, so checkpoints can be shared between both.
+BLOCK_CELL_NAME_RULES = [
+    (r'(GRUBlockCell|gru_cell)/w_ru', 'gru_cell/gates/weights'),
+    (r'(GRUBlockCell|gru_cell)/b_ru', 'gru_cell/gates/biases'),
+    (r'(GRUBlockCell|gru_cell)/w_c', 'gru_cell/candidate/weights'),
+    (r'(GRUBlockCell|gru_cell)/b_c', 'gru_cell/candidate/biases'),
+    (r'LSTMBlockCell/', 'lstm_cell/'),
+]
+
+
+def block_cell_variables_map(variables=None, rules=BLOCK_CELL_NAME_RULES):
+    """
+    Returns a dict of {checkpoint_name: variable} to pass to tf.train.Saver, so
+    that a graph built with block cells saves and restores checkpoints using the
+    variable names of the standard cells. Optimizer slots (e.g. `.../Adam`) are
+    renamed along with their variables.
+    """
+    if variables is None:
+        variables = tf.global_variables()
+
+    var_list = {}
+    for variable in variables:
+        name = variable.op.name
+        for pattern, replacement in rules:
+            name = re.sub(pattern, replacement, name)
+        assert name not in var_list, '{} is mapped to twice'.format(name)
+        var_list[name] = variable
+    return var_list
+
+
+# Variables which are only needed to carry on training: the optimizer slots and
+# accumulators, and the global step
+OPTIMIZER_VARIABLE_PATTERNS = [
+    r'/(Adam|Adam_1|Momentum|RMSProp|RMSProp_1|Adagrad)$',
+    r'^beta[12]_power(_\d+)?$',
+    r'(^|/)global_step$',
+]
+
+
+def export_inference_checkpoint(
+    checkpoint_path, directory, float16=False, exclude=OPTIMIZER_VARIABLE_PATTERNS
+):
+    """
+    Writes the variables of a checkpoint which do not match `exclude` to a new
+    checkpoint, <directory>/model.ckpt, with the state files of both
+    tf.train.latest_checkpoint(directory) and latest_checkpoint(directory,
+    'checkpoint.txt'). Unless `float16` is set, it is an ordinary checkpoint, so
+    a tf.train.Saver of the model variables restores from it. The index,
+    <directory>/model.ckpt.json, lists the name, shape and dtype of each
+    variable, and the dtype it was saved from.
+
+    returns: the path of the checkpoint and the index
+    """
+    reader = tf.train.NewCheckpointReader(checkpoint_path)
+    names = sorted(
+        name for name in reader.get_variable_to_shape_map()
+        if not any(re.search(pattern, name) for pattern in exclude)
+    )
+    path = os.path.join(directory, 'model.ckpt')
+    index = {'source': checkpoint_path, 'float16': float16, 'variables': {}}
+
+    with tf.Graph().as_default():
+        variables = {}
+        feed_dict = {}
+        for name in names:
+            value = reader.get_tensor(name)
+            original_dtype = value.dtype
+            if float16 and value.dtype == np.float32:
+                value = value.astype(np.float16)
+            initial_value = tf.placeholder(value.dtype, value.shape)
+            variables[name] = tf.Variable(initial_value, name=name)
+            feed_dict[initial_value] = value
+            index['variables'][name] = {
+                'shape': list(value.shape),
+                'dtype': value.dtype.name,
+                'original_dtype': original_dtype.name,
+            }
+
+        with tf.Session() as sess:
+            sess.run(tf.global_variables_initializer(), feed_dict=feed_dict)
+            tf.train.Saver(variables).save(
+                sess, path, latest_filename='checkpoint', write_meta_graph=False
+            )
+    tf.train.update_checkpoint_state(directory, path, latest_filename='checkpoint.txt')
+
+    with open(path + '.json', 'w') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    return path, index
+
+
+def restore_inference_checkpoint(sess, checkpoint_path, var_list=None):
+    """
+    Restores variables from a checkpoint of export_inference_checkpoint, or any
+    other checkpoint, casting the values to the dtype of each variable, so
+    float16 checkpoints restore into float32 models. The restore ops are added
+    to the graph, as the checkpoint reader of tensorflow 1.0 cannot read float16
+    tensors. Their dtypes are read from the index of export_inference_checkpoint,
+    see checkpoint_dtypes, other checkpoints are taken to hold the dtypes of
+    the variables.
+
+    args:
+        var_list: a dict of {checkpoint_name: variable}, or a list of variables
+            restored by their own names, by default all the global variables
+    """
+    if var_list is None:
+        var_list = tf.global_variables()
+    if not isinstance(var_list, dict):
+        var_list = {variable.op.name: variable for variable in var_list}
+
+    reader = tf.train.NewCheckpointReader(checkpoint_path)
+    missing = [name for name in var_list if not reader.has_tensor(name)]
+    if missing:
+        raise ValueError('{} has no variables {}'.format(checkpoint_path, missing))
+
+    dtypes = {name: variable.dtype.base_dtype for name, variable in var_list.items()}
+    dtypes.update({
+        name: dtype for name, dtype in checkpoint_dtypes(checkpoint_path).items()
+        if name in var_list
+    })
+
+    names = sorted(var_list)
+    values = io_ops.restore_v2(
+        checkpoint_path, names, [''] * len(names), [dtypes[name] for name in names]
+    )
+    sess.run(tf.group(*[
+        tf.assign(var_list[name], tf.cast(value, var_list[name].dtype.base_dtype))
+        for name, value in zip(names, values)
+    ]))
+
+
+def read_checkpoint(checkpoint_path, names=None):
+    """
+    Reads the variables `names` of a checkpoint, by default all of them.
+    Checkpoints of export_inference_checkpoint are read with restore ops in a
+    graph of their own, as the checkpoint reader of tensorflow 1.0 cannot read
+    float16 tensors, and other checkpoints with the checkpoint reader.
+
+    returns: a dict of {name: value}
+    """
+    dtypes = checkpoint_dtypes(checkpoint_path)
+    if not dtypes:
+        reader = tf.train.NewCheckpointReader(checkpoint_path)
+        return {
+            name: reader.get_tensor(name)
+            for name in names or reader.get_variable_to_shape_map()
+        }
+
+    names = sorted(set(names or dtypes))
+    with tf.Graph().as_default(), tf.Session() as sess:
+        values = io_ops.restore_v2(
+            checkpoint_path, names, [''] * len(names), [dtypes[name] for name in names]
+        )
+        return dict(zip(names, sess.run(values)))
+
+
+def checkpoint_dtypes(checkpoint_path):
+    """
+    The dtypes of the variables of a checkpoint of export_inference_checkpoint,
+    from its index, or an empty dict for other checkpoints
+    """
+    if not os.path.isfile(checkpoint_path + '.json'):
+        return {}
+    with open(checkpoint_path + '.json') as f:
+        index = json.load(f)
+    return {
+        name: tf.as_dtype(str(variable['dtype']))
+        for name, variable in index['variables'].items()
+    }
+
+
+def warm_start_fn(checkpoint_path, rules, variables=None):
+    """
+    Maps variables to the checkpoint variables they are warm started from, by
+    regex rules of (pattern, replacement) on their names, e.g.
+    (r'^generator/', '') restores generator/decoder_rnn/... from decoder_rnn/...
+    Variables which no rule matches are left alone, and several variables may
+    be restored from the same checkpoint variable. Block cell names are mapped
+    to the standard cell names as well. The names and shapes are checked here,
+    so a mismatch fails before training starts. Float16 checkpoints of
+    export_inference_checkpoint are cast to the dtypes of the variables.
+
+    args:
+        variables: the variables to warm start, by default the trainable ones
+    returns: an init_fn(sess) for Supervisor which restores them all in one run
+    """
+    if variables is None:
+        variables = tf.trainable_variables()
+    reader = tf.train.NewCheckpointReader(checkpoint_path)
+    checkpoint_shapes = reader.get_variable_to_shape_map()
+
+    assignments = []
+    errors = []
+    for variable in variables:
+        name = variable.op.name
+        if not any(re.search(pattern, name) for pattern, _ in rules):
+            continue
+        for pattern, replacement in rules + BLOCK_CELL_NAME_RULES:
+            name = re.sub(pattern, replacement, name)
+
+        shape = variable.get_shape().as_list()
+        if name not in checkpoint_shapes:
+            errors += ['{} is not in the checkpoint, as {}'.format(variable.op.name, name)]
+        elif checkpoint_shapes[name] != shape:
+            errors += ['{} has shape {}, but {} in the checkpoint has shape {}'.format(
+                variable.op.name, shape, name, checkpoint_shapes[name]
+            )]
+        else:
+            assignments += [(name, variable)]
+    if errors:
+        raise ValueError('cannot warm start from {}:\n{}'.format(
+            checkpoint_path, '\n'.join(errors)
+        ))
+
+    # the assign ops are built now, as Supervisor finalizes the graph
+    placeholders = [
+        tf.placeholder(variable.dtype.base_dtype, variable.get_shape())
+        for _, variable in assignments
+    ]
+    assign_op = tf.group(*[
+        tf.assign(variable, placeholder)
+        for (_, variable), placeholder in zip(assignments, placeholders)
+    ])
+
+    def init_fn(sess):
+        tf.logging.info('warm starting {} variables from {}'.format(
+            len(assignments), checkpoint_path
+        ))
+        values = read_checkpoint(checkpoint_path, [name for name, _ in assignments])
+        sess.run(assign_op, feed_dict={
+            placeholder: values[name].astype(placeholder.dtype.as_numpy_dtype)
+            for (name, _), placeholder in zip(assignments, placeholders)
+        })
+    return init_fn
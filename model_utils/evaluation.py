@@ -0,0 +1,107 @@
+"""
+Evaluating generated programs, as scripts/count_compilations.sh does, but from
+python, so decoders can be compared by the number of programs which compile,
+and by the edit distance of reconstructed programs from their originals.
+"""
+from multiprocessing.pool import ThreadPool
+import os
+import subprocess
+import tempfile
+import time
+
+from huzzer.tokenizing import TOKEN_MAP
+
+DECODING_REPORT_HEADERS = [
+    'decoder', 'programs', 'wall time (s)', 'cpu time (s)', 'compiled', 'yield',
+    'compiled per second', 'compiled per cpu second'
+]
+
+
+def tokens_to_code(tokens):
+    """
+    The code for a sequence of token ids, as example_to_code in the model analyses
+    """
+    return ' '.join(token_to_string(t) for t in tokens)
+
+
+def token_to_string(t):
+    if t == 0:
+        return ''
+    # the lexer's NEWLINE type is one past the end of TOKEN_MAP, as in huzzer
+    return TOKEN_MAP[t % len(TOKEN_MAP)]
+
+
+def compiles(code, ghc='ghc'):
+    """
+    Type checks the code with `ghc -fno-code`
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'generated_code.hs')
+        with open(path, 'w') as f:
+            f.write(code)
+        return subprocess.call(
+            [ghc, '-fno-code', path],
+            cwd=directory,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        ) == 0
+
+
+def number_compiling(codes, ghc='ghc', processes=None):
+    pool = ThreadPool(processes or os.cpu_count())
+    try:
+        return sum(pool.map(lambda code: compiles(code, ghc), codes))
+    finally:
+        pool.close()
+
+
+def decoding_report_row(name, decode):
+    """
+    Runs decode(), which returns a list of token sequences, and returns a row of
+    DECODING_REPORT_HEADERS for it. The cpu time is that of this process (all of
+    its threads), so includes the tensorflow work, but not the compile checks.
+    """
+    start_time = time.time()
+    start_cpu_time = time.process_time()
+    programs = decode()
+    cpu_time = time.process_time() - start_cpu_time
+    wall_time = time.time() - start_time
+
+    compiled = number_compiling([tokens_to_code(tokens) for tokens in programs])
+    return [
+        name, len(programs), wall_time, cpu_time, compiled,
+        compiled / max(len(programs), 1), compiled / wall_time, compiled / cpu_time
+    ]
+
+
+def levenshtein_distance(tokens, other_tokens):
+    """
+    The edit distance between two sequences of token ids
+    """
+    previous_row = list(range(len(other_tokens) + 1))
+    for i, token in enumerate(tokens):
+        row = [i + 1]
+        for j, other_token in enumerate(other_tokens):
+            row.append(min(
+                previous_row[j + 1] + 1,
+                row[j] + 1,
+                previous_row[j] + (token != other_token)
+            ))
+        previous_row = row
+    return previous_row[-1]
+
+
+def mean_normalized_levenshtein_distance(programs, original_programs):
+    """
+    The mean edit distance of each program from its original, over the length
+    of the original, as in scripts/mean_levenshtein_dist.py, ignoring the end
+    and padding tokens (0)
+    """
+    distances = []
+    for tokens, original_tokens in zip(programs, original_programs):
+        tokens = [t for t in tokens if t != 0]
+        original_tokens = [t for t in original_tokens if t != 0]
+        distances.append(
+            levenshtein_distance(tokens, original_tokens) / max(len(original_tokens), 1)
+        )
+    return sum(distances) / max(len(distances), 1)
@@ -0,0 +1,110 @@
+"""
+Frozen inference graphs: the subgraph from some input tensors to some output
+tensors, with the variables it reads turned into constants and everything else
+(optimizer slots, global_step, queues, the other half of the model) pruned, so
+analysis scripts can load it without building the model or restoring a
+checkpoint.
+
+A frozen graph is saved as a binary GraphDef, with a json signature next to it
+(<path>.json) of the names of its input and output tensors. An output may be a
+list of tensors, e.g. the attention weights of each step.
+"""
+import json
+import os
+import tensorflow as tf
+
+try:
+    from tensorflow.tools.graph_transforms import TransformGraph
+except ImportError:
+    # older tensorflow, the session's graph optimizer still folds the constants
+    # when the graph is run
+    TransformGraph = None
+
+
+def freeze_graph(sess, inputs, outputs):
+    """
+    args:
+        inputs, outputs: dicts of names to tensors, or lists of tensors, of the
+            graph of `sess`
+    returns: the frozen GraphDef, and its signature
+    """
+    signature = {
+        'inputs': map_tensors(lambda t: t.name, inputs),
+        'outputs': map_tensors(lambda t: t.name, outputs),
+    }
+    input_node_names = [t.op.name for t in flatten_tensors(inputs)]
+    output_node_names = list(set(t.op.name for t in flatten_tensors(outputs)))
+
+    graph_def = tf.graph_util.convert_variables_to_constants(
+        sess, sess.graph.as_graph_def(), output_node_names
+    )
+    if TransformGraph is not None:
+        graph_def = TransformGraph(
+            graph_def, input_node_names, output_node_names,
+            ['fold_constants(ignore_errors=true)']
+        )
+    return graph_def, signature
+
+
+def save_frozen_graph(path, graph_def, signature):
+    with open(path, 'wb') as f:
+        f.write(graph_def.SerializeToString())
+    with open(path + '.json', 'w') as f:
+        json.dump(signature, f, indent=2)
+
+
+def load_frozen_graph(path, name):
+    """
+    Imports the frozen graph at `path` into the default graph, under the name
+    scope `name`, so several can be loaded into one session.
+
+    returns: the dicts of the input and output tensors, as given to freeze_graph
+    """
+    graph_def = tf.GraphDef()
+    with open(path, 'rb') as f:
+        graph_def.ParseFromString(f.read())
+    with open(path + '.json') as f:
+        signature = json.load(f)
+
+    tf.import_graph_def(graph_def, name=name)
+    graph = tf.get_default_graph()
+
+    def get_tensor(tensor_name):
+        return graph.get_tensor_by_name('{}/{}'.format(name, tensor_name))
+    return (
+        map_tensors(get_tensor, signature['inputs']),
+        map_tensors(get_tensor, signature['outputs'])
+    )
+
+
+def export_frozen_graphs(sess, subgraphs, directory):
+    """
+    Freezes each of the subgraphs, a dict of names to (inputs, outputs) as for
+    freeze_graph, to <directory>/frozen_<name>.pb
+    """
+    number_of_nodes = len(sess.graph.as_graph_def().node)
+    for name, (inputs, outputs) in subgraphs.items():
+        graph_def, signature = freeze_graph(sess, inputs, outputs)
+        path = frozen_graph_path(directory, name)
+        save_frozen_graph(path, graph_def, signature)
+        print('wrote {} ({} of {} nodes, {:.2f} MB)'.format(
+            path, len(graph_def.node), number_of_nodes, os.path.getsize(path) / 1e6
+        ))
+
+
+def frozen_graph_path(directory, name):
+    return os.path.join(directory, 'frozen_{}.pb'.format(name))
+
+
+def map_tensors(fn, tensors):
+    return {
+        name: [fn(t) for t in value] if isinstance(value, (list, tuple)) else fn(value)
+        for name, value in tensors.items()
+    }
+
+
+def flatten_tensors(tensors):
+    flat = []
+    for value in tensors.values():
+        flat += list(value) if isinstance(value, (list, tuple)) else [value]
+    return flat
@@ -0,0 +1,159 @@
+"""
+Batched decoding from autoregressive decoders, given as a step function
+
+    step_fn(state, sequences) -> (logits, next_state)
+
+where `state` is a dict of arrays with one row per sequence being decoded,
+`sequences` (b x t) are the tokens decoded so far, and `logits` (b x n) are the
+un-normalised log probabilities of the next token.
+"""
+import numpy as np
+
+from model_utils.sampling import sample_tokens
+
+
+def sample_sequences(step_fn, initial_state, max_length, end_token=0, temperature=1.0):
+    """
+    Samples a sequence for every row of initial_state. Sequences which have
+    sampled the end token are dropped from the batch, so each step only runs the
+    sequences still being generated.
+
+    args:
+        temperature: a float, or one temperature per row. 0 is greedy decoding.
+    returns: a list of token arrays, the end tokens included
+    """
+    batch_size = len(next(iter(initial_state.values())))
+    temperature = np.broadcast_to(temperature, (batch_size,))
+
+    tokens = np.zeros((batch_size, max_length), dtype=np.int64)
+    lengths = np.full(batch_size, max_length)
+    # the indices in the batch of the unfinished sequences
+    active = np.arange(batch_size)
+    state = initial_state
+
+    for t in range(max_length):
+        logits, state = step_fn(state, tokens[active, :t])
+        sampled_tokens = sample_tokens(logits, temperature[active])
+        tokens[active, t] = sampled_tokens
+
+        finished = sampled_tokens == end_token
+        lengths[active[finished]] = t + 1
+        active = active[~finished]
+        state = {name: value[~finished] for name, value in state.items()}
+        if len(active) == 0:
+            break
+
+    return [tokens[i, :lengths[i]] for i in range(batch_size)]
+
+
+def beam_search(
+    step_fn, initial_state, beam_width, max_length, end_token=0, alpha=0.6
+):
+    """
+    Batched beam search. Every row of initial_state gets `beam_width` beams,
+    which are run through step_fn as a single batch of b * beam_width rows.
+
+    Hypotheses are scored by their log probability divided by the length
+    penalty ((5 + length) / 6) ** alpha of Wu et al. 2016, so that alpha=0 is
+    the plain log probability. The search stops for a row once it has
+    beam_width finished hypotheses which none of its live beams can beat, and
+    stops altogether once every row has stopped.
+
+    returns: a list of the finished hypotheses of each row, as
+        (tokens, normalised score) pairs, best first. The tokens include the end
+        token, unless max_length was reached.
+    """
+    batch_size = len(next(iter(initial_state.values())))
+    state = {
+        name: np.repeat(value, beam_width, axis=0) for name, value in initial_state.items()
+    }
+    sequences = np.zeros((batch_size * beam_width, 0), dtype=np.int64)
+    # only the first beam of each row is live to begin with
+    scores = np.full((batch_size, beam_width), -np.inf)
+    scores[:, 0] = 0
+    hypotheses = [[] for _ in range(batch_size)]
+    done = np.zeros(batch_size, dtype=bool)
+    batch_indices = np.arange(batch_size)[:, None]
+
+    for t in range(max_length):
+        logits, state = step_fn(state, sequences)
+        vocab_size = logits.shape[-1]
+        candidate_scores = (
+            scores[:, :, None] +
+            log_softmax(logits).reshape((batch_size, beam_width, vocab_size))
+        )
+
+        # the beams which end here are finished hypotheses
+        end_scores = candidate_scores[:, :, end_token] / length_penalty(t + 1, alpha)
+        for i in np.where(~done)[0]:
+            for k in np.where(np.isfinite(end_scores[i]))[0]:
+                hypotheses[i] += [(
+                    np.append(sequences[i * beam_width + k], end_token), end_scores[i, k]
+                )]
+
+        # and the best of the rest are the next live beams
+        candidate_scores[:, :, end_token] = -np.inf
+        candidate_scores = candidate_scores.reshape((batch_size, -1))
+        best = np.argsort(-candidate_scores, axis=1)[:, :beam_width]
+        scores = candidate_scores[batch_indices, best]
+        beams = (batch_indices * beam_width + best // vocab_size).reshape(-1)
+
+        sequences = np.concatenate(
+            [sequences[beams], (best % vocab_size).reshape((-1, 1))], axis=1
+        )
+        state = {name: value[beams] for name, value in state.items()}
+
+        # a live beam's log probability can only fall, so its normalised score
+        # is at most its score now over the largest length penalty
+        best_live_scores = scores[:, 0] / length_penalty(max_length, alpha)
+        for i in np.where(~done)[0]:
+            hypotheses[i] = sorted(hypotheses[i], key=lambda h: -h[1])[:beam_width]
+            done[i] = (
+                len(hypotheses[i]) == beam_width and
+                hypotheses[i][-1][1] >= best_live_scores[i]
+            )
+        if np.all(done):
+            break
+
+    # the unfinished beams of rows that ran out of steps are hypotheses too
+    for i in np.where(~done)[0]:
+        for k in np.where(np.isfinite(scores[i]))[0]:
+            hypotheses[i] += [(
+                sequences[i * beam_width + k],
+                scores[i, k] / length_penalty(sequences.shape[1], alpha)
+            )]
+        hypotheses[i] = sorted(hypotheses[i], key=lambda h: -h[1])[:beam_width]
+
+    return hypotheses
+
+
+def fixed_logits_step_fn(state, sequences):
+    """
+    A step function for decoders which do not read their own outputs, such as the
+    attention decoders. Their logits for every step are computed in one pass, and
+    given as state['logits'] (b x max_length x n).
+    """
+    return state['logits'][:, sequences.shape[1]], state
+
+
+def look_behind_input(sequences, look_behind, token_emb_size):
+    """
+    The one-hot last look_behind tokens of each of the sequences (b x t), zero
+    padded at the front, flattened to (b x look_behind * token_emb_size)
+    """
+    number_of_sequences, length = sequences.shape
+    look_behind_tokens = np.zeros((number_of_sequences, look_behind, token_emb_size))
+    for j in range(1, min(look_behind, length) + 1):
+        look_behind_tokens[
+            np.arange(number_of_sequences), look_behind - j, sequences[:, length - j]
+        ] = 1
+    return look_behind_tokens.reshape((number_of_sequences, look_behind * token_emb_size))
+
+
+def log_softmax(logits):
+    logits = logits - np.max(logits, axis=-1, keepdims=True)
+    return logits - np.log(np.sum(np.exp(logits), axis=-1, keepdims=True))
+
+
+def length_penalty(length, alpha):
+    return ((5.0 + length) / 6.0) ** alpha
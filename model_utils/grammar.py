@@ -0,0 +1,307 @@
+"""
+A token level validity automaton for huzzer programs, used to mask out the
+tokens which cannot come next during decoding.
+
+The tokens are the SubHaskell lexer token types of the one hot token pipelines,
+so TOKEN_MAP[t % len(TOKEN_MAP)], with 0 as the end token and 53 as a newline
+(blank lines are a single newline token). Huzzer programs look like
+
+    module Generated (function0,function1) where
+    function0 :: Int -> Bool -> Int
+    function0 a b = (max a (fromEnum (b && True)))
+    function1 :: ...
+
+the functions being named function0, function1, ... in order, and the parameters
+a, b, ... in order. Expressions are literals, parameters, or bracketed
+applications of div, mod, max, min, not, fromEnum, the infix operators or the
+functions, all of which are type checked. The exception is calls to functions
+whose signature comes later in the program, which only have to be well formed.
+"""
+from collections import namedtuple
+import numpy as np
+
+END_TOKEN = 0
+MODULE = 1
+GENERATED = 2
+WHERE = 3
+COMMA = 4
+DOUBLE_COLON = 5
+ARROW = 6
+EQUALS = 7
+FIRST_VARIABLE = 8
+FIRST_FUNCTION = 16
+BOOL = 37
+INT = 38
+FIRST_DIGIT = 39
+TRUE = 49
+FALSE = 50
+OPEN_PAREN = 51
+CLOSE_PAREN = 52
+NEWLINE = 53
+
+MAX_FUNCTIONS = 4
+MAX_PARAMETERS = 8
+ANY_TYPE = frozenset([INT, BOOL])
+GRAMMAR_STATE = 'grammar_state'
+
+# (argument types, result type)
+PREFIX_FUNCTIONS = {
+    20: ((INT, INT), INT),  # div
+    21: ((INT, INT), INT),  # mod
+    22: ((INT, INT), INT),  # max
+    23: ((INT, INT), INT),  # min
+    24: ((BOOL,), BOOL),  # not
+    25: ((BOOL,), INT),  # fromEnum
+}
+# operator -> (operand type, result type)
+INFIX_OPERATORS = {
+    26: (INT, INT),  # +
+    27: (INT, INT),  # -
+    28: (INT, INT),  # *
+    29: (INT, BOOL),  # ==
+    30: (INT, BOOL),  # /=
+    31: (INT, BOOL),  # >
+    32: (INT, BOOL),  # >=
+    33: (INT, BOOL),  # <
+    34: (INT, BOOL),  # <=
+    35: (BOOL, BOOL),  # ||
+    36: (BOOL, BOOL),  # &&
+}
+
+# phase: where in the program the parser is, and any counter that goes with it
+# functions: the number of functions the module header exports
+# signatures: the type tokens of the signatures so far, the last of which may
+#     still be being parsed
+# stack: the frames of the expression being parsed, innermost last
+ParserState = namedtuple('ParserState', ['phase', 'functions', 'signatures', 'stack'])
+
+
+class HuzzerGrammar:
+    def __init__(self, token_emb_size=54):
+        self.token_emb_size = token_emb_size
+        self.initial_state = ParserState(('module',), 0, (), ())
+        self._masks = {}
+
+    def advance(self, state, token):
+        """
+        The state after `token`, or None if the grammar does not allow it.
+        """
+        if state is None:
+            return None
+        phase = state.phase
+        name = phase[0]
+
+        if name == 'body':
+            return self._advance_expression(state, token)
+
+        elif name == 'module':
+            return _expect(state, token, MODULE, ('generated',))
+        elif name == 'generated':
+            return _expect(state, token, GENERATED, ('exports_open',))
+        elif name == 'exports_open':
+            return _expect(state, token, OPEN_PAREN, ('export',))
+        elif name == 'export':
+            if token == FIRST_FUNCTION + state.functions:
+                return state._replace(phase=('export_end',), functions=state.functions + 1)
+        elif name == 'export_end':
+            if token == COMMA and state.functions < MAX_FUNCTIONS:
+                return state._replace(phase=('export',))
+            return _expect(state, token, CLOSE_PAREN, ('where',))
+        elif name == 'where':
+            return _expect(state, token, WHERE, ('header_end',))
+        elif name == 'header_end':
+            return _expect(state, token, NEWLINE, ('signature_name',))
+
+        elif name == 'signature_name':
+            if token == FIRST_FUNCTION + len(state.signatures):
+                return state._replace(phase=('signature_colons',))
+        elif name == 'signature_colons':
+            if token == DOUBLE_COLON:
+                return state._replace(
+                    phase=('signature_type',), signatures=state.signatures + ((),)
+                )
+        elif name == 'signature_type':
+            if token in (INT, BOOL):
+                return state._replace(
+                    phase=('signature_end',),
+                    signatures=state.signatures[:-1] + (state.signatures[-1] + (token,),)
+                )
+        elif name == 'signature_end':
+            signature_length = len(state.signatures[-1])
+            if token == ARROW and signature_length <= MAX_PARAMETERS:
+                return state._replace(phase=('signature_type',))
+            if token == NEWLINE and signature_length > 1:
+                return state._replace(phase=('definition_name',))
+        elif name == 'definition_name':
+            if token == FIRST_FUNCTION + len(state.signatures) - 1:
+                return state._replace(phase=('parameter', 0))
+        elif name == 'parameter':
+            number_of_parameters = len(state.signatures[-1]) - 1
+            if phase[1] < number_of_parameters and token == FIRST_VARIABLE + phase[1]:
+                return state._replace(phase=('parameter', phase[1] + 1))
+            if phase[1] == number_of_parameters and token == EQUALS:
+                return state._replace(
+                    phase=('body',),
+                    stack=(('expression', frozenset([state.signatures[-1][-1]])),)
+                )
+        elif name == 'body_end':
+            if len(state.signatures) < state.functions:
+                return _expect(state, token, NEWLINE, ('signature_name',))
+            return _expect(state, token, END_TOKEN, ('end',))
+        return None
+
+    def _advance_expression(self, state, token):
+        stack = state.stack
+        frame = stack[-1]
+        name = frame[0]
+        signature = state.signatures[-1]
+
+        if name == 'expression':
+            types = frame[1]
+            if FIRST_DIGIT <= token < FIRST_DIGIT + 10 and INT in types:
+                return self._complete(state, stack[:-1], INT)
+            if token in (TRUE, FALSE) and BOOL in types:
+                return self._complete(state, stack[:-1], BOOL)
+            if FIRST_VARIABLE <= token < FIRST_VARIABLE + len(signature) - 1:
+                variable_type = signature[token - FIRST_VARIABLE]
+                if variable_type in types:
+                    return self._complete(state, stack[:-1], variable_type)
+            if token == OPEN_PAREN:
+                return state._replace(stack=stack[:-1] + (('open', types),))
+            return None
+
+        elif name == 'open':
+            types = frame[1]
+            if token in PREFIX_FUNCTIONS:
+                argument_types, result = PREFIX_FUNCTIONS[token]
+                if result in types:
+                    return _push_arguments(state, stack[:-1], argument_types, result)
+                return None
+            if FIRST_FUNCTION <= token < FIRST_FUNCTION + state.functions:
+                function = token - FIRST_FUNCTION
+                if function >= len(state.signatures):
+                    return state._replace(stack=stack[:-1] + (('forward', 0),))
+                called_signature = state.signatures[function]
+                if called_signature[-1] in types:
+                    return _push_arguments(
+                        state, stack[:-1], called_signature[:-1], called_signature[-1]
+                    )
+                return None
+            # otherwise it is the left operand of an infix operator
+            operand_types = frozenset(
+                operand for operand, result in INFIX_OPERATORS.values() if result in types
+            )
+            return self._advance_expression(state._replace(stack=stack[:-1] + (
+                ('operator', types), ('expression', operand_types)
+            )), token)
+
+        elif name == 'operator':
+            _, types, operand_type = frame
+            if token in INFIX_OPERATORS:
+                operand, result = INFIX_OPERATORS[token]
+                if result in types and operand_type in (operand, None):
+                    return state._replace(stack=stack[:-1] + (
+                        ('close', result), ('expression', frozenset([operand]))
+                    ))
+            return None
+
+        elif name == 'forward':
+            number_of_arguments = frame[1]
+            if token == CLOSE_PAREN and number_of_arguments > 0:
+                return self._complete(state, stack[:-1], None)
+            if number_of_arguments < MAX_PARAMETERS:
+                return self._advance_expression(state._replace(stack=stack[:-1] + (
+                    ('forward', number_of_arguments + 1), ('expression', ANY_TYPE)
+                )), token)
+            return None
+
+        elif name == 'close':
+            if token == CLOSE_PAREN:
+                return self._complete(state, stack[:-1], frame[1])
+            return None
+
+    def _complete(self, state, stack, expression_type):
+        """
+        Hands the type of a finished expression (None if unknown) to the frame
+        waiting for it.
+        """
+        if len(stack) == 0:
+            return state._replace(phase=('body_end',), stack=())
+        frame = stack[-1]
+        if frame[0] == 'operator' and len(frame) == 2:
+            stack = stack[:-1] + (('operator', frame[1], expression_type),)
+        return state._replace(stack=stack)
+
+    def allowed_tokens(self, states):
+        """
+        returns: a boolean mask of the tokens allowed after each parser state
+            (b x token_emb_size). Only the end token is allowed after an invalid
+            sequence, so that it stops.
+        """
+        return np.array([self._allowed_tokens(state) for state in states], dtype=bool)
+
+    def _allowed_tokens(self, state):
+        if state not in self._masks:
+            mask = np.array([
+                self.advance(state, token) is not None
+                for token in range(self.token_emb_size)
+            ], dtype=bool)
+            if not np.any(mask):
+                mask[END_TOKEN] = True
+            self._masks[state] = mask
+        return self._masks[state]
+
+    def parse(self, tokens):
+        """
+        The state after a sequence of tokens, None if it is invalid.
+        """
+        state = self.initial_state
+        for token in tokens:
+            state = self.advance(state, token)
+        return state
+
+    def is_valid(self, tokens):
+        """
+        Whether a sequence is a whole program, its end token included.
+        """
+        state = self.parse(tokens)
+        return state is not None and state.phase == ('end',)
+
+
+def _expect(state, token, expected_token, phase):
+    if token == expected_token:
+        return state._replace(phase=phase)
+    return None
+
+
+def _push_arguments(state, stack, argument_types, result):
+    """
+    The frames for the arguments of a function, the first argument on top.
+    """
+    return state._replace(stack=stack + (('close', result),) + tuple(
+        ('expression', frozenset([t])) for t in reversed(argument_types)
+    ))
+
+
+def constrained_step_fn(step_fn, grammar):
+    """
+    Wraps a model_utils.generation step function, so the logits of the tokens the
+    grammar does not allow are -inf. The parser states are kept in the decoding
+    state, under GRAMMAR_STATE, so they follow the rows as they are dropped or
+    reordered, and each step only parses the last token.
+    """
+    def step(state, sequences):
+        state = dict(state)
+        previous_states = state.pop(GRAMMAR_STATE, None)
+        # an object array, as a list of named tuples would become a 2d array
+        grammar_states = np.empty(len(sequences), dtype=object)
+        for i, tokens in enumerate(sequences):
+            if previous_states is None:
+                grammar_states[i] = grammar.parse(tokens)
+            else:
+                grammar_states[i] = grammar.advance(previous_states[i], tokens[-1])
+
+        logits, state = step_fn(state, sequences)
+        logits = np.where(grammar.allowed_tokens(grammar_states), logits, -np.inf)
+        return logits, dict(state, **{GRAMMAR_STATE: grammar_states})
+    return step
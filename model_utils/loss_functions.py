@@ -53,6 +53,25 @@ def vae_cross_entropy_loss(
     # get labels from x
     labels = tf.argmax(x, 2)  # HACK!
 
+    return vae_sparse_cross_entropy_loss(
+        labels, x_decoded, mus, log_sigmas, kl_limit=kl_limit, kl_scale=kl_scale
+    )
+
+
+def vae_sparse_cross_entropy_loss(
+    labels,
+    x_decoded,
+    mus,
+    log_sigmas,
+    kl_limit=None,
+    kl_scale=None
+):
+    """
+    The same as vae_cross_entropy_loss, but takes the int token labels (b x l)
+    directly, rather than recovering them from the one-hot input.
+
+    NOTE x_decoded must be in logits, not softmax!
+    """
     cross_entropy_loss = tf.reduce_mean(
         tf.nn.sparse_softmax_cross_entropy_with_logits(
             labels=labels,
@@ -110,3 +129,60 @@ def ce_loss_for_sequence_batch(
     masked = (mask * ce_losses)
     sums = tf.reduce_mean(masked, axis=-1)
     return sums
+
+
+def sparse_ce_loss_for_sequence_batch(
+    unnormalized_token_probs, labels, sequence_lengths, max_length
+):
+    """
+    Computes the same as ce_loss_for_sequence_batch, but takes int labels (b x l)
+    rather than one-hot vectors, and only computes the cross entropy at the
+    positions within `sequence_lengths`. The padding positions are partitioned
+    out before the softmax, rather than being masked out after it.
+    """
+    batch_size = tf.shape(labels)[0]
+    token_emb_size = unnormalized_token_probs.get_shape()[-1].value
+
+    mask = tf.sequence_mask(tf.cast(sequence_lengths, tf.int32), max_length)
+    partitions = tf.reshape(tf.cast(mask, tf.int32), (-1,))
+    # the index in the batch of every position
+    example_ids = tf.reshape(
+        tf.tile(tf.expand_dims(tf.range(batch_size), 1), (1, max_length)),
+        (-1,)
+    )
+
+    _, valid_logits = tf.dynamic_partition(
+        tf.reshape(unnormalized_token_probs, (-1, token_emb_size)), partitions, 2
+    )
+    _, valid_labels = tf.dynamic_partition(tf.reshape(labels, (-1,)), partitions, 2)
+    _, valid_example_ids = tf.dynamic_partition(example_ids, partitions, 2)
+
+    ce_losses = tf.nn.sparse_softmax_cross_entropy_with_logits(
+        labels=valid_labels,
+        logits=valid_logits
+    )
+    sums = tf.unsorted_segment_sum(ce_losses, valid_example_ids, batch_size)
+    # ce_loss_for_sequence_batch takes the mean over all max_length positions
+    return sums / max_length
+
+
+def distillation_loss_for_sequence_batch(
+    teacher_token_probs, student_logits, sequence_lengths, max_length, temperature=1.0
+):
+    """
+    The KL divergence from the teacher's token probs (b x l x n) to the
+    student's, both softened by `temperature` as in Hinton et al. 2015, summed
+    over the positions within `sequence_lengths` and divided by max_length, as
+    ce_loss_for_sequence_batch is. It is scaled by temperature ** 2, so that its
+    gradients keep the same size as the temperature changes.
+    """
+    teacher_log_probs = tf.nn.log_softmax(
+        tf.log(tf.maximum(teacher_token_probs, 1e-10)) / temperature
+    )
+    student_log_probs = tf.nn.log_softmax(student_logits / temperature)
+    kl = tf.reduce_sum(
+        tf.exp(teacher_log_probs) * (teacher_log_probs - student_log_probs),
+        axis=-1
+    )
+    mask = tf.sequence_mask(sequence_lengths, max_length, dtype=tf.float32)
+    return temperature ** 2 * tf.reduce_sum(mask * kl, axis=-1) / max_length
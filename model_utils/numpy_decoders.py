@@ -0,0 +1,152 @@
+"""
+NumPy forward passes of the VAE_baseline decoders, build_decoder and
+build_special_conv4_decoder, for weights exported to .npz by
+experiments/VAE_baseline/export_decoder.py, so programs can be generated from a
+trained decoder without importing tensorflow.
+
+An exported decoder is an .npz of its variables in the order they were created,
+as 'weights_<i>' and 'biases_<i>', with the config to rebuild it: the
+'architecture' ('simple' or 'special_conv4'), 'x_shape', the 'activation' of the
+simple decoder, the 'num_filters' of the conv decoder, and whether the token
+probs are the 'softmax' of the decoder output, as in make_conv_final. The
+weights may be int8, see model_utils.quantization, and the dense weights pruned
+and sparse, see model_utils.pruning.
+"""
+import numpy as np
+from scipy import sparse
+
+from model_utils.pruning import load_sparse_matrices
+from model_utils.quantization import dequantize_arrays
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+    'tanh': np.tanh,
+    'relu': lambda x: np.maximum(x, 0),
+    'relu6': lambda x: np.clip(x, 0, 6),
+}
+
+
+def matmul(x, weights):
+    """
+    x (b x in) times the weights (in x out), which may be a scipy.sparse matrix
+    """
+    if sparse.issparse(weights):
+        return weights.T.dot(x.T).T
+    return np.dot(x, weights)
+
+
+def fully_connected(x, weights, biases, activation='linear'):
+    """
+    slim.fully_connected, with weights (in x out)
+    """
+    return ACTIVATIONS[activation](matmul(x, weights) + biases)
+
+
+def conv2d_transpose(x, weights, biases, activation='linear'):
+    """
+    layers.conv2d_transpose with stride 1 and VALID padding, each input position
+    adding its kernel-sized patch to the output.
+
+    args:
+        x: the input (b x h x w x in)
+        weights: the kernel in tensorflow's layout (kh x kw x out x in)
+    returns: the output (b x h + kh - 1 x w + kw - 1 x out)
+    """
+    batch_size, height, width, _ = x.shape
+    kernel_height, kernel_width, out_channels, _ = weights.shape
+    # all the patches in one matmul, (b x h x w x kh x kw x out)
+    patches = np.tensordot(x, weights, axes=([3], [3]))
+
+    output = np.zeros(
+        (batch_size, height + kernel_height - 1, width + kernel_width - 1, out_channels),
+        dtype=patches.dtype
+    )
+    for i in range(kernel_height):
+        for j in range(kernel_width):
+            output[:, i:i + height, j:j + width] += patches[:, :, :, i, j]
+    return ACTIVATIONS[activation](output + biases)
+
+
+def softmax(x):
+    e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e / np.sum(e, axis=-1, keepdims=True)
+
+
+def simple_decoder(z, weights, biases, x_shape, activation='sigmoid'):
+    """
+    build_decoder
+    """
+    x_decoded_mean = fully_connected(z, weights[0], biases[0], activation)
+    return np.reshape(x_decoded_mean, (-1, *x_shape))
+
+
+def special_conv4_decoder(z, weights, biases, x_shape, num_filters):
+    """
+    build_special_conv4_decoder, under conv_arg_scope_final
+    """
+    net = fully_connected(z, weights[0], biases[0], 'relu')
+    net = np.reshape(net, (len(z), -1, 1, num_filters))
+    net = conv2d_transpose(net, weights[1], biases[1], 'relu')
+    net = conv2d_transpose(net, weights[2], biases[2], 'relu')
+    return net[:, :x_shape[0], :, 0]
+
+
+def save_decoder(path, architecture, weights, biases, **config):
+    """
+    Writes the weights and biases of a decoder's layers, and its config, to the
+    .npz at `path`
+    """
+    arrays = {'architecture': architecture}
+    arrays.update(config)
+    for i, (w, b) in enumerate(zip(weights, biases)):
+        arrays['weights_{}'.format(i)] = w
+        arrays['biases_{}'.format(i)] = b
+    np.savez(path, **arrays)
+
+
+def load_arrays(path):
+    """
+    The arrays of the exported decoder at `path`, with int8 weights dequantized
+    and sparse weights as scipy.sparse matrices
+    """
+    with np.load(path) as data:
+        return load_sparse_matrices(dequantize_arrays({key: data[key] for key in data.files}))
+
+
+def load_decoder(path):
+    """
+    returns: a function from latent vectors (b x z_size) to the decoder output
+        (b x sequence_length x token_emb_size), the token probs if the decoder
+        was exported with softmax
+    """
+    return decoder_from_arrays(load_arrays(path))
+
+
+def decoder_from_arrays(data):
+    """
+    load_decoder, from the arrays of an exported decoder
+    """
+    number_of_layers = len([key for key in data if key.startswith('weights_')])
+    weights = [data['weights_{}'.format(i)] for i in range(number_of_layers)]
+    biases = [data['biases_{}'.format(i)] for i in range(number_of_layers)]
+    architecture = str(data['architecture'])
+    x_shape = tuple(int(d) for d in data['x_shape'])
+    use_softmax = bool(data['softmax']) if 'softmax' in data else False
+
+    if architecture == 'simple':
+        activation = str(data['activation'])
+
+        def decode(z):
+            return simple_decoder(z, weights, biases, x_shape, activation)
+    elif architecture == 'special_conv4':
+        num_filters = int(data['num_filters'])
+
+        def decode(z):
+            return special_conv4_decoder(z, weights, biases, x_shape, num_filters)
+    else:
+        raise ValueError('unknown decoder architecture {}'.format(architecture))
+
+    if use_softmax:
+        return lambda z: softmax(decode(np.asarray(z, dtype=weights[0].dtype)))
+    return lambda z: decode(np.asarray(z, dtype=weights[0].dtype))
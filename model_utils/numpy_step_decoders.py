@@ -0,0 +1,182 @@
+"""
+NumPy step functions (see model_utils.generation) for the recurrent decoders,
+the GRU decoder of Recurrent_VAE_baseline's build_program_decoder_step and the
+LSTM decoder with cosine attention of RVAE_attention's attention1_step, so
+programs can be generated from them without tensorflow.
+
+The weights are exported by the export_step_decoder.py of each experiment to an
+.npz, with the 'architecture' ('gru' or 'attention1') and its config. The
+weights may be int8, see model_utils.quantization, and pruned and sparse, see
+model_utils.pruning.
+"""
+import numpy as np
+
+from model_utils.generation import look_behind_input
+from model_utils.numpy_decoders import (
+    ACTIVATIONS,
+    fully_connected,
+    load_arrays,
+    matmul,
+    softmax
+)
+
+sigmoid = ACTIVATIONS['sigmoid']
+
+
+def gru_cell(x, h, gates_weights, gates_biases, candidate_weights, candidate_biases):
+    """
+    tf.contrib.rnn.GRUCell with tanh activation
+
+    returns: the next hidden state, which is also the output
+    """
+    r, u = np.split(
+        sigmoid(matmul(np.concatenate([x, h], axis=1), gates_weights) + gates_biases),
+        2, axis=1
+    )
+    c = np.tanh(
+        matmul(np.concatenate([x, r * h], axis=1), candidate_weights) + candidate_biases
+    )
+    return u * h + (1 - u) * c
+
+
+def lstm_cell(x, c, h, weights, biases, forget_bias=1.0):
+    """
+    tf.contrib.rnn.LSTMCell with tanh activation, without peepholes or a projection
+
+    returns: the next c and h states
+    """
+    i, j, f, o = np.split(
+        matmul(np.concatenate([x, h], axis=1), weights) + biases, 4, axis=1
+    )
+    c = sigmoid(f + forget_bias) * c + sigmoid(i) * np.tanh(j)
+    return c, sigmoid(o) * np.tanh(c)
+
+
+def l2_normalize(x, epsilon=1e-12):
+    """
+    tf.nn.l2_normalize over the last axis
+    """
+    return x / np.sqrt(np.maximum(np.sum(x * x, axis=-1, keepdims=True), epsilon))
+
+
+def gru_step_fn(weights, look_behind):
+    """
+    The step function of build_program_decoder_step, as decoder_step_fn. The
+    state is the 'hidden_state' (b x z_size) of each sequence, starting at z.
+    The logits are the decoder's ReLU outputs, which its token probs are the
+    softmax of.
+    """
+    token_emb_size = weights['fc_bias'].shape[0]
+    dtype = weights['fc_weights'].dtype
+
+    def step_fn(state, sequences):
+        hidden_state = gru_cell(
+            look_behind_input(sequences, look_behind, token_emb_size).astype(dtype),
+            state['hidden_state'],
+            weights['gates_weights'], weights['gates_biases'],
+            weights['candidate_weights'], weights['candidate_biases']
+        )
+        logits = fully_connected(
+            hidden_state, weights['fc_weights'], weights['fc_bias'], 'relu'
+        )
+        return logits, {'hidden_state': hidden_state}
+    return step_fn
+
+
+def initial_gru_state(z):
+    return {'hidden_state': np.asarray(z, dtype=np.float32)}
+
+
+def attention1_step_fn(weights):
+    """
+    The step function of attention1_step. The state is the step 'i' (b,), the
+    same for every row, the LSTM's 'c_state' and 'h_state', the 'attention_v'
+    and the preallocated 'hidden_states' buffer (b x max_length x z_size) of
+    [z, h_1 ... h_i], see initial_attention1_state. As h_{i+1} is written to the
+    buffer in place, and only the first i + 1 hidden states are read at step i,
+    the attention costs O(i) rather than O(max_length) per step. The decoder
+    does not read its own tokens, so `sequences` are only used for their length.
+    """
+    epsilon = 0.001
+
+    def step_fn(state, sequences):
+        i = int(state['i'][0])
+        hidden_states = state['hidden_states']
+        max_length = hidden_states.shape[1]
+
+        c_state, h_state = lstm_cell(
+            state['attention_v'], state['c_state'], state['h_state'],
+            weights['lstm_weights'], weights['lstm_biases']
+        )
+        logits = fully_connected(h_state, weights['fc_weights'], weights['fc_bias'])
+
+        # buffered_attention_coefs over [h_0 ... h_i]
+        h_proj_normalized = l2_normalize(fully_connected(
+            h_state, weights['attention_weights'], weights['attention_bias']
+        ))
+        previous_hidden_states = hidden_states[:, :i + 1]
+        unscaled_coefs = np.einsum(
+            'bz,blz->bl', h_proj_normalized, l2_normalize(previous_hidden_states)
+        )
+        l = i + 1
+        if l > 1:
+            m = np.sqrt(l)
+            dynamic_scaling_factor = 0.5 * np.log(((1 - epsilon) * (l - m)) / (epsilon * m))
+        else:
+            dynamic_scaling_factor = 1
+        attention_coefs = softmax(dynamic_scaling_factor * unscaled_coefs)
+        attention_v = np.einsum('bl,blz->bz', attention_coefs, previous_hidden_states)
+
+        # add h_{i+1} to the hidden states, (dropped on the last step)
+        if i + 1 < max_length:
+            hidden_states[:, i + 1] = h_state
+
+        return logits, {
+            'i': state['i'] + 1,
+            'c_state': c_state,
+            'h_state': h_state,
+            'attention_v': attention_v.astype(h_state.dtype),
+            'hidden_states': hidden_states,
+        }
+    return step_fn
+
+
+def initial_attention1_state(z, max_length):
+    """
+    The state of attention1_step_fn before the first step, for latent vectors z
+    (b x z_size)
+    """
+    z = np.asarray(z, dtype=np.float32)
+    hidden_states = np.zeros((len(z), max_length, z.shape[1]), dtype=np.float32)
+    hidden_states[:, 0] = z
+    return {
+        'i': np.zeros(len(z), dtype=np.int64),
+        'c_state': np.zeros(z.shape, dtype=np.float32),
+        'h_state': z,
+        'attention_v': np.zeros(z.shape, dtype=np.float32),
+        'hidden_states': hidden_states,
+    }
+
+
+def save_step_decoder(path, architecture, **arrays):
+    np.savez(path, architecture=architecture, **arrays)
+
+
+def load_step_decoder(path):
+    """
+    returns: the step function of the exported decoder, and a function from the
+        latent vectors (b x z_size) to its initial state
+    """
+    arrays = load_arrays(path)
+    architecture = str(arrays.pop('architecture'))
+
+    if architecture == 'gru':
+        look_behind = int(arrays.pop('look_behind'))
+        return gru_step_fn(arrays, look_behind), initial_gru_state
+    elif architecture == 'attention1':
+        max_length = int(arrays.pop('max_length'))
+        return (
+            attention1_step_fn(arrays),
+            lambda z: initial_attention1_state(z, max_length)
+        )
+    raise ValueError('unknown step decoder architecture {}'.format(architecture))
@@ -0,0 +1,109 @@
+"""
+Magnitude pruning of the dense weight matrices of exported decoders (see
+model_utils.numpy_decoders and model_utils.numpy_step_decoders), and their
+storage as sparse matrices, which the decoders' loaders turn into scipy.sparse
+matrices, so that the pruned layers are multiplied sparsely.
+
+A sparse weight matrix `key` (in x out) is stored as the CSR arrays of its
+transpose, under `key`_data, `key`_indices, `key`_indptr and `key`_shape, as
+(W^T x^T)^T, with a row of W^T per output unit, is scipy's fast sparse product.
+"""
+import numpy as np
+import os
+from scipy import sparse
+
+SPARSE_SUFFIXES = ('_data', '_indices', '_indptr', '_shape')
+
+
+def prune_by_magnitude(weights, sparsity):
+    """
+    returns: a copy of weights with (at least) the fraction `sparsity` of them
+        with the smallest absolute values set to zero
+    """
+    number_pruned = int(np.ceil(round(sparsity * np.size(weights), 6)))
+    pruned = np.array(weights).ravel()
+    pruned[np.argsort(np.abs(pruned), kind='mergesort')[:number_pruned]] = 0
+    return pruned.reshape(np.shape(weights))
+
+
+def fraction_zero(weights):
+    return 1 - np.count_nonzero(weights) / np.size(weights)
+
+
+def prunable(value):
+    """
+    The dense weight matrices (in x out), the conv2d_transpose kernels and the
+    biases are left dense
+    """
+    return value.dtype.kind == 'f' and value.ndim == 2
+
+
+def prune_arrays(arrays, sparsity):
+    """
+    Prunes every dense weight matrix of an exported decoder's arrays to
+    `sparsity`
+    """
+    return {
+        key: prune_by_magnitude(value, sparsity) if prunable(value) else value
+        for key, value in ((key, np.asarray(value)) for key, value in arrays.items())
+    }
+
+
+def sparsify_arrays(arrays, min_sparsity=0.95):
+    """
+    Stores the dense weight matrices with at least `min_sparsity` zeros as
+    sparse matrices, below which the dense matmul is faster
+
+    returns: the arrays to save
+    """
+    sparsified = {}
+    for key, value in arrays.items():
+        value = np.asarray(value)
+        if prunable(value) and fraction_zero(value) >= min_sparsity:
+            matrix = sparse.csr_matrix(value.T)
+            for suffix, array in zip(SPARSE_SUFFIXES, [
+                    matrix.data, matrix.indices, matrix.indptr, np.array(value.shape)
+            ]):
+                sparsified[key + suffix] = array
+        else:
+            sparsified[key] = value
+    return sparsified
+
+
+def load_sparse_matrices(arrays):
+    """
+    Replaces the sparse weight matrices of sparsify_arrays with scipy.sparse
+    matrices (in x out), arrays without them are returned as they are
+    """
+    arrays = dict(arrays)
+    data_suffix, indices_suffix, indptr_suffix, shape_suffix = SPARSE_SUFFIXES
+    for key in [key for key in arrays if key.endswith(shape_suffix)]:
+        weights_key = key[:-len(shape_suffix)]
+        if weights_key + data_suffix not in arrays:
+            continue
+        in_size, out_size = arrays.pop(key)
+        arrays[weights_key] = sparse.csr_matrix((
+            arrays.pop(weights_key + data_suffix),
+            arrays.pop(weights_key + indices_suffix),
+            arrays.pop(weights_key + indptr_suffix)
+        ), shape=(out_size, in_size)).T
+    return arrays
+
+
+def prune_file(path, output_path, sparsity, min_sparsity=0.95):
+    """
+    Writes a copy of the exported decoder at `path` with its dense weight
+    matrices pruned to `sparsity`
+    """
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    np.savez(output_path, **sparsify_arrays(prune_arrays(arrays, sparsity), min_sparsity))
+
+
+def pruned_path(path, sparsity):
+    """
+    The path of the copy of the exported decoder at `path` pruned to
+    `sparsity`, <name>_sparse<percent>.npz beside it
+    """
+    root, extension = os.path.splitext(path)
+    return '{}_sparse{:g}{}'.format(root, 100 * sparsity, extension or '.npz')
@@ -0,0 +1,90 @@
+"""
+Post-training int8 quantization of the weights of exported decoders (see
+model_utils.numpy_decoders and model_utils.numpy_step_decoders), with a scale
+per output channel, so that a channel of small weights keeps its precision when
+another channel of the same matrix has large ones.
+
+A quantized weight matrix `key` is stored as int8 under `key`, with its float32
+scales under `key`_scales, and the decoders' loaders dequantize it.
+"""
+import numpy as np
+import os
+
+SCALES_SUFFIX = '_scales'
+
+
+def quantize_per_channel(weights, axis=-1):
+    """
+    Symmetric int8 quantization, weights ~= q * scales, with one scale per index
+    of `axis`, the output channels
+
+    returns: q (int8, the shape of weights), and the scales (float32,
+        broadcastable against weights)
+    """
+    axis = axis % weights.ndim
+    reduce_axes = tuple(a for a in range(weights.ndim) if a != axis)
+    scales = np.max(np.abs(weights), axis=reduce_axes, keepdims=True) / 127
+    scales[scales == 0] = 1
+    q = np.clip(np.round(weights / scales), -127, 127).astype(np.int8)
+    return q, scales.astype(np.float32)
+
+
+def dequantize(q, scales):
+    return q.astype(np.float32) * scales
+
+
+def output_channel_axis(weights):
+    """
+    The conv2d_transpose kernels are (kh x kw x out x in), the dense weights
+    (in x out)
+    """
+    return 2 if weights.ndim == 4 else -1
+
+
+def quantize_arrays(arrays):
+    """
+    Quantizes every float weight matrix of an exported decoder's arrays, leaving
+    the biases and config as they are
+
+    returns: the arrays to save
+    """
+    quantized = {}
+    for key, value in arrays.items():
+        value = np.asarray(value)
+        if value.dtype.kind == 'f' and value.ndim >= 2:
+            quantized[key], quantized[key + SCALES_SUFFIX] = quantize_per_channel(
+                value, output_channel_axis(value)
+            )
+        else:
+            quantized[key] = value
+    return quantized
+
+
+def dequantize_arrays(arrays):
+    """
+    The inverse of quantize_arrays, arrays without quantized weights are
+    returned as they are
+    """
+    arrays = dict(arrays)
+    for key in [key for key in arrays if key.endswith(SCALES_SUFFIX)]:
+        weights_key = key[:-len(SCALES_SUFFIX)]
+        arrays[weights_key] = dequantize(arrays[weights_key], arrays.pop(key))
+    return arrays
+
+
+def quantize_file(path, output_path):
+    """
+    Writes an int8 copy of the exported decoder at `path`
+    """
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    np.savez(output_path, **quantize_arrays(arrays))
+
+
+def quantized_path(path):
+    """
+    The path of the int8 copy of the exported decoder at `path`,
+    <name>_int8.npz beside it
+    """
+    root, extension = os.path.splitext(path)
+    return root + '_int8' + (extension or '.npz')
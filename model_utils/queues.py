@@ -47,7 +47,8 @@ def build_single_output_queue(
 
 def build_multiple_output_queue(batch_generator, output_shapes, types, capacity=10):
     """
-    where batch_generator returns multiple values
+    where batch_generator returns multiple values, one for each of the queue's
+    components, so that queue.dequeue() returns them together
     """
     assert len(output_shapes) == len(types), \
         'lengths of batch_generators, output_shapes, types do not match'
@@ -65,20 +66,19 @@ def build_multiple_output_queue(batch_generator, output_shapes, types, capacity=
         for i in range(len(output_shapes))
     ]
 
-    enqueue_ops = [queue.enqueue(placeholder) for placeholder in placeholders]
-    # enqueue_ops = [queue.enqueue_many(placeholders)]
-
+    # one enqueue of all the components, each placeholder is one of them
+    enqueue_op = queue.enqueue(placeholders)
 
     def feed_function():
         outputs = batch_generator()
         return {
-            input_name + str(i) + ':0': outputs[i]
-            for i in range(len(outputs))
+            placeholder: output
+            for placeholder, output in zip(placeholders, outputs)
         }
 
     runner = fqr.FeedingQueueRunner(
         queue=queue,
-        enqueue_ops=[enqueue_ops],
+        enqueue_ops=[enqueue_op],
         feed_fns=[feed_function]
     )
     queue_runner.add_queue_runner(runner)
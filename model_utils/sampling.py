@@ -0,0 +1,41 @@
+import numpy as np
+
+
+def sample_tokens(logits, temperature=1.0):
+    """
+    Samples an index from each row of `logits` (b x n) with the Gumbel-max trick,
+    i.e. argmax(logits / temperature + g), where g ~ Gumbel(0, 1). This is the same
+    as sampling from softmax(logits / temperature), with no renormalisation.
+
+    args:
+        logits: un-normalised log probabilities (b x n)
+        temperature: a float, or an array of one temperature per row (b,).
+            Temperatures <= 0 take the argmax.
+    returns: the sampled indices (b,)
+    """
+    logits = np.asarray(logits, dtype=np.float64)
+    temperature = np.reshape(
+        np.asarray(temperature, dtype=np.float64), (-1,) + (1,) * (logits.ndim - 1)
+    )
+    return gumbel_max(logits, temperature)
+
+
+def gumbel_max(logits, temperature):
+    """
+    argmax over the last axis of logits / temperature + Gumbel noise, where
+    `temperature` broadcasts against `logits`.
+    """
+    shape = np.broadcast(logits, temperature).shape
+    uniform = np.random.uniform(np.finfo(np.float64).tiny, 1, shape)
+    gumbel = -np.log(-np.log(uniform))
+
+    greedy = temperature <= 0
+    scaled = logits / np.where(greedy, 1, temperature) + np.where(greedy, 0, gumbel)
+    return np.argmax(scaled, axis=-1)
+
+
+def probs_to_logits(probs, epsilon=1e-10):
+    """
+    For models which output softmax probabilities rather than logits.
+    """
+    return np.log(np.maximum(probs, epsilon))
@@ -0,0 +1,198 @@
+"""
+Session configs for the experiment runners, and the timing of their training
+steps, so that configs can be compared on the same hardware.
+
+The thread pools and cpu affinity of a model's sessions can be tuned on a
+machine with autotune, which benchmarks its training step under each candidate
+profile. The best profile is saved to session_profiles.json, by model and
+machine, and tuned_session_config applies it when the model runs there again.
+"""
+import json
+import numpy as np
+import os
+import platform
+import tensorflow as tf
+
+from model_utils.benchmark import print_table, time_run
+
+PROFILES_PATH = 'session_profiles.json'
+PROFILE_HEADERS = ['cpus', 'intra op threads', 'inter op threads', 'step time (ms)']
+
+
+def session_config(xla_jit=False, profile=None):
+    """
+    args:
+        xla_jit: compile clusters of the graph's ops with XLA, fusing the many
+            small kernels of the conv and recurrent models, at the cost of
+            compiling them in the first steps
+        profile: the thread pool sizes to use, see autotune
+    """
+    config = tf.ConfigProto()
+    if xla_jit:
+        config.graph_options.optimizer_options.global_jit_level = tf.OptimizerOptions.ON_1
+    if profile is not None:
+        config.intra_op_parallelism_threads = profile['intra_op_threads']
+        config.inter_op_parallelism_threads = profile['inter_op_threads']
+    return config
+
+
+def tuned_session_config(model, xla_jit=False, path=PROFILES_PATH):
+    """
+    session_config, with the profile saved by autotune for `model` on this
+    machine, if there is one, whose cpu affinity is set for the process
+    """
+    profile = load_profile(model, path)
+    if profile is None:
+        return session_config(xla_jit)
+    tf.logging.info('using the session profile of %s on %s: %s', model, machine_name(), profile)
+    set_cpu_affinity(profile['cpus'])
+    return session_config(xla_jit, profile)
+
+
+def machine_name():
+    return '{}_{}_cpus'.format(platform.node(), os.cpu_count())
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+
+def set_cpu_affinity(cpus):
+    """
+    Pins the process, with its queue runner threads, to `cpus`, where the os
+    allows it
+    """
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+
+
+def candidate_profiles(cpus=None):
+    """
+    The thread pool sizes, powers of two up to the number of cpus, for the
+    process pinned to all the cpus and to the first half of them, leaving the
+    rest to the data pipeline
+    """
+    cpus = cpus or available_cpus()
+    cpu_sets = [cpus] + ([cpus[:len(cpus) // 2]] if len(cpus) > 1 else [])
+    profiles = []
+    for cpu_set in cpu_sets:
+        thread_counts = [2 ** i for i in range(len(cpu_set).bit_length())]
+        profiles += [
+            {'cpus': cpu_set, 'intra_op_threads': intra_op_threads, 'inter_op_threads': inter_op_threads}
+            for intra_op_threads in thread_counts
+            for inter_op_threads in thread_counts if inter_op_threads <= 4
+        ]
+    return profiles
+
+
+def autotune(model, fetches, profiles=None, xla_jit=False, number_of_runs=50, warmup_runs=10,
+             path=PROFILES_PATH):
+    """
+    Benchmarks running `fetches`, the training step of the model in the default
+    graph, with each profile, in a new session with its queue runners, and
+    saves the fastest as the profile of `model` on this machine. Each session
+    has its own thread pools, as tensorflow only creates the process wide
+    pools once.
+
+    returns: the best profile
+    """
+    profiles = profiles or candidate_profiles()
+    all_cpus = available_cpus()
+    rows = []
+    for profile in profiles:
+        set_cpu_affinity(profile['cpus'])
+        config = session_config(xla_jit, profile)
+        config.use_per_session_threads = True
+        with tf.Session(config=config) as sess:
+            sess.run([tf.global_variables_initializer(), tf.local_variables_initializer()])
+            coordinator = tf.train.Coordinator()
+            threads = tf.train.start_queue_runners(sess, coordinator)
+            step_time = time_run(sess, fetches, number_of_runs=number_of_runs, warmup_runs=warmup_runs)
+            # the queue runners close their queues on the stop request,
+            # cancelling the enqueues blocked on full queues
+            coordinator.request_stop()
+            coordinator.join(threads, stop_grace_period_secs=5)
+        rows.append([
+            cpu_range(profile['cpus']), profile['intra_op_threads'], profile['inter_op_threads'],
+            1000 * step_time
+        ])
+    set_cpu_affinity(all_cpus)
+
+    best_index = int(np.argmin([row[-1] for row in rows]))
+    best_profile = dict(profiles[best_index], step_time=rows[best_index][-1] / 1000)
+    print('{} on {}'.format(model, machine_name()))
+    print_table(PROFILE_HEADERS, rows)
+    save_profile(model, best_profile, path)
+    print('saved the profile of {} cpus, {} intra op and {} inter op threads to {}'.format(
+        rows[best_index][0], best_profile['intra_op_threads'], best_profile['inter_op_threads'], path
+    ))
+    return best_profile
+
+
+def cpu_range(cpus):
+    if list(cpus) == list(range(cpus[0], cpus[-1] + 1)):
+        return '{}-{}'.format(cpus[0], cpus[-1])
+    return ','.join(str(cpu) for cpu in cpus)
+
+
+def load_profile(model, path=PROFILES_PATH):
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f).get(machine_name(), {}).get(model)
+
+
+def save_profile(model, profile, path=PROFILES_PATH):
+    profiles = {}
+    if os.path.isfile(path):
+        with open(path) as f:
+            profiles = json.load(f)
+    profiles.setdefault(machine_name(), {})[model] = profile
+    with open(path, 'w') as f:
+        json.dump(profiles, f, indent=2, sort_keys=True)
+
+
+class StepTimer:
+    """
+    Logs the mean and median wall time of every `log_every` training steps, and
+    writes it as the step_time/<name> summary, so runs with different configs
+    can be compared in tensorboard. The first step, which includes the XLA
+    compilation, is logged on its own.
+    """
+
+    def __init__(self, name, log_every=100, summary_writer=None):
+        self.name = name
+        self.log_every = log_every
+        self.summary_writer = summary_writer
+        self.number_of_steps = 0
+        self.step_times = []
+
+    def record(self, step_time, global_step):
+        """
+        args:
+            step_time: the wall time of a step in seconds
+            global_step: the global step after it
+        """
+        self.number_of_steps += 1
+        if self.number_of_steps == 1:
+            tf.logging.info('step time (%s): first step %.3fs', self.name, step_time)
+            return
+
+        self.step_times.append(step_time)
+        if len(self.step_times) >= self.log_every:
+            self.log(global_step)
+
+    def log(self, global_step):
+        mean_time = np.mean(self.step_times)
+        tf.logging.info(
+            'step time (%s): mean %.2fms, median %.2fms over %d steps to global step %d',
+            self.name, 1000 * mean_time, 1000 * np.median(self.step_times),
+            len(self.step_times), global_step
+        )
+        if self.summary_writer is not None:
+            self.summary_writer.add_summary(tf.Summary(value=[tf.Summary.Value(
+                tag='step_time/{}'.format(self.name), simple_value=1000 * mean_time
+            )]), global_step)
+        self.step_times = []
@@ -0,0 +1,96 @@
+"""
+Speculative sampling (Leviathan et al. 2023, Chen et al. 2023): a cheap draft
+decoder proposes a few tokens, which an expensive target decoder scores in one
+call. Each draft token is accepted with probability min(1, p / q), where p and q
+are the target and draft probabilities of it, and the first rejected token is
+resampled from max(0, p - q), so the sequences are samples from the target
+decoder, whatever the draft decoder.
+
+The draft decoder is a model_utils.generation step function. The target decoder
+is given as
+
+    target_fn(state, sequences, drafts) -> (logits, next_state)
+
+where `sequences` (1 x t) are the tokens so far, `drafts` (1 x k) the draft
+tokens, and `logits` (1 x k + 1 x n) the target's un-normalised log
+probabilities for each of the drafts and the token after them.
+"""
+import numpy as np
+
+from model_utils.sampling import sample_tokens
+
+
+def speculative_sample(
+    draft_step_fn, target_fn, draft_state, target_state, number_of_draft_tokens,
+    max_length, end_token=0
+):
+    """
+    Samples one sequence from the target decoder, with the draft decoder
+    proposing up to number_of_draft_tokens tokens per target call. The states
+    are for a single sequence, as the sequences of a batch would accept
+    different numbers of tokens.
+
+    returns: the token array, the end token included, and a dict of the numbers
+        of 'drafted' and 'accepted' tokens and of 'target_calls'
+    """
+    tokens = np.zeros((1, 0), dtype=np.int64)
+    # the draft state is for the first `draft_length` tokens
+    draft_length = 0
+    counts = {'drafted': 0, 'accepted': 0, 'target_calls': 0}
+
+    while tokens.shape[1] < max_length and end_token not in tokens:
+        # catch the draft decoder up with the tokens accepted from the target
+        while draft_length < tokens.shape[1]:
+            _, draft_state = draft_step_fn(draft_state, tokens[:, :draft_length])
+            draft_length += 1
+
+        number_of_drafts = min(number_of_draft_tokens, max_length - tokens.shape[1] - 1)
+        drafts = np.zeros((1, 0), dtype=np.int64)
+        draft_probs = []
+        draft_states = []
+        while drafts.shape[1] < number_of_drafts and end_token not in drafts:
+            logits, state = draft_step_fn(
+                draft_state if len(draft_states) == 0 else draft_states[-1],
+                np.concatenate([tokens, drafts], axis=1)
+            )
+            draft_probs += [softmax(logits[0])]
+            draft_states += [state]
+            drafts = np.concatenate([drafts, sample_tokens(logits, 1.0)[:, None]], axis=1)
+
+        target_logits, target_state = target_fn(target_state, tokens, drafts)
+        target_probs = softmax(target_logits[0])
+        counts['target_calls'] += 1
+        counts['drafted'] += drafts.shape[1]
+
+        accepted = 0
+        next_token = None
+        for j, token in enumerate(drafts[0]):
+            p, q = target_probs[j, token], draft_probs[j][token]
+            if np.random.uniform() * q < p:
+                accepted += 1
+                continue
+            residual = np.maximum(target_probs[j] - draft_probs[j], 0)
+            next_token = np.random.choice(len(residual), p=residual / np.sum(residual))
+            break
+        if next_token is None and end_token not in drafts:
+            next_token = np.random.choice(
+                target_probs.shape[-1], p=target_probs[accepted]
+            )
+        counts['accepted'] += accepted
+
+        # the draft states of the accepted tokens are still good
+        if accepted > 0:
+            draft_state = draft_states[accepted - 1]
+            draft_length = tokens.shape[1] + accepted
+        tokens = np.concatenate([tokens, drafts[:, :accepted]], axis=1)
+        if next_token is not None:
+            tokens = np.append(tokens, [[next_token]], axis=1)
+
+    return tokens[0], counts
+
+
+def softmax(logits):
+    # in float64, as np.random.choice checks that the probabilities sum to 1
+    logits = np.asarray(logits, dtype=np.float64)
+    e = np.exp(logits - np.max(logits, axis=-1, keepdims=True))
+    return e / np.sum(e, axis=-1, keepdims=True)
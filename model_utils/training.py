@@ -0,0 +1,54 @@
+"""
+Running several training steps per sess.run, for models small enough that the
+python round trip of a sess.run per step is most of the step time.
+"""
+import tensorflow as tf
+
+
+def build_multi_step_train_op(
+    build_train_step, steps_per_run, train_op_name='train_on_batch', name='train_steps'
+):
+    """
+    A tf.while_loop which runs `steps_per_run` training steps, one after the
+    other, each on its own dequeued batch.
+
+    args:
+        build_train_step: builds a training step, from dequeuing its batch to
+            the train op named `train_op_name`, the loss after the update, as
+            slim.learning.create_train_op returns. It must have been called
+            once outside the loop already, so that the variables, the optimizer
+            slots and the summaries exist. In the loop, the variables are
+            reused, and the summaries, update ops and other collection entries
+            of the step are dropped, so the Supervisor's summaries are still
+            those of the single step, at the global step they are run at.
+    returns: the loss after the last step
+    """
+    graph = tf.get_default_graph()
+
+    def body(i, _):
+        collections = {key: list(graph.get_collection(key)) for key in graph.get_all_collection_keys()}
+        number_of_variables = len(tf.global_variables())
+
+        with tf.variable_scope(tf.get_variable_scope(), reuse=True), \
+                tf.name_scope('step') as scope:
+            build_train_step()
+            train_op = graph.get_tensor_by_name(scope + train_op_name + ':0')
+
+        if len(tf.global_variables()) != number_of_variables:
+            raise ValueError(
+                'the training step created variables in the loop, build it outside the loop first, '
+                'and pass it the same optimizer'
+            )
+        for key in graph.get_all_collection_keys():
+            graph.get_collection_ref(key)[:] = collections.get(key, [])
+        return i + 1, train_op
+
+    with tf.name_scope(name):
+        _, loss = tf.while_loop(
+            lambda i, _: i < steps_per_run,
+            body,
+            [tf.constant(0), tf.constant(0.0)],
+            parallel_iterations=1,
+            back_prop=False
+        )
+    return tf.identity(loss, name=name)
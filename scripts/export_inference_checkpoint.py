@@ -0,0 +1,63 @@
+"""
+Writes a weights-only copy of the latest checkpoint of an experiment, without
+the optimizer slots and global_step, for analysis, warm starts and sharing.
+model_utils.checkpoints.restore_inference_checkpoint restores it, and so does a
+tf.train.Saver of the model variables, unless it is float16.
+
+Usage:
+  export_inference_checkpoint.py [--float16] <checkpoint_dir> <output_dir>
+  export_inference_checkpoint.py -h | --help
+
+Options:
+  -h --help       Show this screen.
+  -f --float16    Store the float32 variables as float16.
+"""
+from docopt import docopt
+from glob import glob
+import os
+import time
+import tensorflow as tf
+
+import project_context  # NOQA
+from model_utils.benchmark import print_table
+from model_utils.checkpoints import export_inference_checkpoint, read_checkpoint
+
+HEADERS = ['checkpoint', 'variables', 'size (MB)', 'read time (s)']
+
+
+def main(checkpoint_dir, output_dir, float16):
+    checkpoint_path = (
+        tf.train.latest_checkpoint(checkpoint_dir, 'checkpoint.txt') or
+        tf.train.latest_checkpoint(checkpoint_dir)
+    )
+    if checkpoint_path is None:
+        exit('no checkpoint in {}'.format(checkpoint_dir))
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    path, _ = export_inference_checkpoint(checkpoint_path, output_dir, float16)
+    print_table(HEADERS, [
+        checkpoint_row(checkpoint_path),
+        checkpoint_row(path),
+    ])
+
+
+def checkpoint_row(checkpoint_path):
+    """
+    The number of variables, size on disk and time to read every variable of a
+    checkpoint, float16 exports included
+    """
+    start_time = time.time()
+    values = read_checkpoint(checkpoint_path)
+    read_time = time.time() - start_time
+
+    size = sum(
+        os.path.getsize(file_path) for file_path in glob(checkpoint_path + '.*')
+        if not file_path.endswith(('.meta', '.json'))
+    )
+    return [checkpoint_path, len(values), size / 1e6, read_time]
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='0.0.1')
+    main(args.get('<checkpoint_dir>'), args.get('<output_dir>'), args.get('--float16'))
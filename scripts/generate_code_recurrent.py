@@ -2,7 +2,7 @@
 Generate code from a model.
 
 Usage:
-  generate_code_recurrent.py --model=<modelpath> [--temperature=<temp>] [--number=<num>] <path>
+  generate_code_recurrent.py --model=<modelpath> [--temperature=<temp>] [--number=<num>] [--batch-size=<size>] <path>
   generate_code_recurrent.py -h | --help
   generate_code_recurrent.py --version
 
@@ -10,29 +10,51 @@ Options:
   -h --help                Show this screen.
   --version                Show version.
   -m --model=<modelpath>   Path to model to generate
-  -t --temperature=<temp>  Temperature for model generation [default: 0.3]
-  -n --number=<num>        Number of times to generate some code [default: 1]
+  -t --temperature=<temp>  Temperature for model generation, or a comma separated
+                           list of temperatures to sweep [default: 0.3]
+  -n --number=<num>        Number of times to generate some code, per temperature [default: 1]
+  -s --batch-size=<size>   Number of samples to generate in parallel [default: 64]
 """
 from docopt import docopt
 import numpy as np
-from keras.models import load_model
+import time
+from keras.models import load_model, Sequential
 from tqdm import trange
 
+import project_context  # NOQA
+from model_utils.sampling import sample_tokens, probs_to_logits
+
 
 def main():
     args = docopt(__doc__, version='0.0.1')
 
     modelpath = args.get('--model')
     model = load_model(modelpath)
-    temperature = float(args.get('--temperature'))
+    temperatures = [float(t) for t in args.get('--temperature').split(',')]
 
     num_iters = int(args.get('--number'))
     path = args.get('<path>')
 
     power_of_ten = int(np.log10(num_iters))
 
-    for i in trange(num_iters):
-        text = generate(model, temperature)
+    # every temperature of the sweep is sampled in the same batches, one per row
+    row_temperatures = np.repeat(temperatures, num_iters)
+    batch_size = min(int(args.get('--batch-size')), len(row_temperatures))
+    stateful_model = make_stateful_model(model, batch_size)
+    texts = []
+    start_time = time.time()
+    for i in trange(0, len(row_temperatures), batch_size):
+        batch_temperatures = np.resize(row_temperatures[i:i + batch_size], batch_size)
+        texts += generate_batch(stateful_model, batch_temperatures)
+    time_taken = time.time() - start_time
+    texts = texts[:len(row_temperatures)]
+    number_of_chars = sum(len(text) for text in texts)
+    print('generated {} chars in {:.2f}s, {:.1f} chars/sec'.format(
+        number_of_chars, time_taken, number_of_chars / time_taken
+    ))
+
+    for j, (temperature, text) in enumerate(zip(row_temperatures, texts)):
+        i = j % num_iters
         filename = path + 'temp{}_{}.txt'.format(temperature, format(i, '0{}d'.format(power_of_ten)))
         with open(filename, 'w') as text_file:
             print(text, file=text_file)  # NOQA
@@ -83,21 +105,57 @@ def generate(
     return generated
 
 
-def sample(probs, temperature):
-    """samples an index from a vector of probabilities"""
-    probs[probs == 1.0] = 0.999
-    # import code
-    # code.interact(local=locals())
-
-    # print(np.log(probs))
+def make_stateful_model(model, batch_size):
+    """
+    Rebuilds a model made by recurrent_base.make_model as a stateful model, which
+    takes one char per step for a batch of `batch_size` sequences and carries the
+    LSTM states between calls. The weights are copied from `model`.
+    """
+    layers = []
+    for layer in model.layers:
+        config = layer.get_config()
+        for key in ['input_dim', 'input_length', 'input_shape', 'batch_input_shape']:
+            config.pop(key, None)
+        if 'stateful' in config:
+            config['stateful'] = True
+        if not layers:
+            config['batch_input_shape'] = (batch_size, 1, model.input_shape[-1])
+        layers += [layer.__class__.from_config(config)]
+
+    stateful_model = Sequential(layers)
+    stateful_model.set_weights(model.get_weights())
+    return stateful_model
+
+
+def generate_batch(stateful_model, temperature=0.35, max_len=32, length=512):
+    """
+    Generates a batch of texts with a model from make_stateful_model, one step
+    per char for the whole batch. Like generate, the model is first fed a seed of
+    max_len spaces. `temperature` may be a float, or one temperature per row.
+    """
+    batch_size = stateful_model.input_shape[0]
+    stateful_model.reset_states()
+
+    x = np.zeros((batch_size, 1, 128), dtype=np.float32)
+    x[:, 0, char_to_idx(' ')] = 1.
+    for _ in range(max_len):
+        probs = stateful_model.predict_on_batch(x)
+
+    generated = np.zeros((batch_size, length), dtype=np.int64)
+    for t in range(length):
+        next_idxs = sample_tokens(probs_to_logits(probs), temperature)
+        generated[:, t] = next_idxs
+
+        x = np.zeros((batch_size, 1, 128), dtype=np.float32)
+        x[np.arange(batch_size), 0, next_idxs] = 1.
+        probs = stateful_model.predict_on_batch(x)
+
+    return [''.join(chr(idx) for idx in row) for row in generated]
 
 
-    a = np.log(probs)/temperature
-    a = np.exp(a)/np.sum(np.exp(a))
-
-    # HACK: to keep numpy from whining
-    a = a / (a.sum() + 0.001)
-    return np.argmax(np.random.multinomial(1, a, 1))
+def sample(probs, temperature):
+    """samples an index from a vector of probabilities"""
+    return sample_tokens(probs_to_logits(np.expand_dims(probs, 0)), temperature)[0]
 
 
 def char_to_idx(c):
@@ -0,0 +1,4 @@
+import sys
+from os.path import realpath
+
+sys.path.append(realpath('.'))
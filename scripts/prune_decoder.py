@@ -0,0 +1,79 @@
+"""
+Writes a copy of a decoder exported for model_utils.numpy_decoders or
+model_utils.numpy_step_decoders with its dense weight matrices magnitude pruned,
+stored sparse, and prints the time of each matrix's matmul, dense and sparse,
+against its sparsity.
+
+Usage:
+  prune_decoder.py [--sparsity=<s>] [--min-sparsity=<s>] [--batch-size=<size>] <path> [<output_path>]
+  prune_decoder.py -h | --help
+
+Options:
+  -h --help                 Show this screen.
+  -s --sparsity=<s>         Fraction of the weights of each dense matrix to prune [default: 0.95].
+  -m --min-sparsity=<s>     Store the matrices with at least this fraction of zeros sparse [default: 0.95].
+  -b --batch-size=<size>    Number of rows to multiply the matrices with [default: 250].
+
+<output_path> defaults to <path> with a _sparse<percent> suffix
+"""
+from docopt import docopt
+import numpy as np
+import os
+import time
+from scipy import sparse
+
+import project_context  # NOQA
+from model_utils.benchmark import print_table
+from model_utils.numpy_decoders import load_arrays, matmul
+from model_utils.pruning import fraction_zero, prunable, prune_by_magnitude, prune_file, pruned_path
+
+HEADERS = ['array', 'shape', 'sparsity', 'dense matmul (ms)', 'sparse matmul (ms)', 'speedup']
+SPARSITIES = [0, 0.5, 0.75, 0.9, 0.95, 0.99]
+NUMBER_OF_RUNS = 20
+
+
+def main(path, output_path, sparsity, min_sparsity, batch_size):
+    if output_path is None:
+        output_path = pruned_path(path, sparsity)
+    prune_file(path, output_path, sparsity, min_sparsity)
+
+    arrays = load_arrays(path)
+    rows = []
+    for key in sorted(arrays):
+        if not isinstance(arrays[key], np.ndarray) or not prunable(arrays[key]):
+            continue
+        x = np.random.normal(0, 1, (batch_size, arrays[key].shape[0])).astype(np.float32)
+        for s in sorted(set(SPARSITIES + [sparsity])):
+            weights = prune_by_magnitude(arrays[key], s)
+            dense_time = matmul_time(x, weights)
+            sparse_time = matmul_time(x, sparse.csr_matrix(weights.T).T)
+            rows.append([
+                key, arrays[key].shape, fraction_zero(weights), 1000 * dense_time,
+                1000 * sparse_time, dense_time / sparse_time
+            ])
+    print_table(HEADERS, rows)
+    print('wrote {} ({:.1f}kB, from {:.1f}kB)'.format(
+        output_path, os.path.getsize(output_path) / 1e3, os.path.getsize(path) / 1e3
+    ))
+
+
+def matmul_time(x, weights):
+    """
+    The mean wall time of x times weights, in seconds
+    """
+    matmul(x, weights)
+    start_time = time.time()
+    for _ in range(NUMBER_OF_RUNS):
+        matmul(x, weights)
+    return (time.time() - start_time) / NUMBER_OF_RUNS
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='0.0.1')
+    main(
+        args.get('<path>'),
+        args.get('<output_path>'),
+        float(args.get('--sparsity')),
+        float(args.get('--min-sparsity')),
+        int(args.get('--batch-size'))
+    )
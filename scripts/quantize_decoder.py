@@ -0,0 +1,58 @@
+"""
+Writes an int8 copy of a decoder exported for model_utils.numpy_decoders or
+model_utils.numpy_step_decoders, with a scale per output channel of each weight
+matrix, and prints the size and quantization error of every weight matrix.
+
+Usage:
+  quantize_decoder.py <path> [<output_path>]
+  quantize_decoder.py -h | --help
+
+Options:
+  -h --help       Show this screen.
+
+<output_path> defaults to <path> with an _int8 suffix
+"""
+from docopt import docopt
+import numpy as np
+import os
+
+import project_context  # NOQA
+from model_utils.benchmark import print_table
+from model_utils.quantization import (
+    SCALES_SUFFIX,
+    dequantize_arrays,
+    quantize_file,
+    quantized_path
+)
+
+HEADERS = ['array', 'shape', 'float32 (kB)', 'int8 (kB)', 'max abs error', 'max abs weight']
+
+
+def main(path, output_path):
+    if output_path is None:
+        output_path = quantized_path(path)
+    quantize_file(path, output_path)
+
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    with np.load(output_path) as data:
+        quantized = {key: data[key] for key in data.files}
+    dequantized = dequantize_arrays(quantized)
+
+    print_table(HEADERS, [
+        [
+            key, arrays[key].shape, arrays[key].nbytes / 1e3,
+            (quantized[key].nbytes + quantized[key + SCALES_SUFFIX].nbytes) / 1e3,
+            float(np.max(np.abs(dequantized[key] - arrays[key]))),
+            float(np.max(np.abs(arrays[key])))
+        ]
+        for key in sorted(arrays) if key + SCALES_SUFFIX in quantized
+    ])
+    print('wrote {} ({:.1f}kB, from {:.1f}kB)'.format(
+        output_path, os.path.getsize(output_path) / 1e3, os.path.getsize(path) / 1e3
+    ))
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__, version='0.0.1')
+    main(args.get('<path>'), args.get('<output_path>'))
@@ -0,0 +1,39 @@
+import tensorflow as tf
+import numpy as np
+
+import project_context  # NOQA
+from experiments.BEGAN_attention import models as began_attention_models
+from experiments.RVAE_attention import models as rvae_attention_models
+
+
+class AttentionGeneratorTest(tf.test.TestCase):
+
+    def check_generator_shares_decoder_cell(self, models):
+        z_size, max_length, token_emb_size = 8, 5, 7
+        z_value = np.random.normal(0, 1, (2, z_size))
+        with tf.Graph().as_default() as graph, tf.Session(graph=graph) as sess:
+            z = tf.placeholder(tf.float32, (None, z_size))
+            rnn_cell = models.default_lstm_cell(z_size)
+            decoder_output, _ = models.build_attention1_decoder(
+                z, tf.fill((tf.shape(z)[0],), max_length), max_length, token_emb_size,
+                rnn_cell=rnn_cell
+            )
+            number_of_variables = len(tf.global_variables())
+            generated_token_probs, _, _ = models.build_attention1_generator(
+                z, max_length, token_emb_size, reuse=True, early_exit=False,
+                rnn_cell=rnn_cell
+            )
+            self.assertEqual(len(tf.global_variables()), number_of_variables)
+
+            sess.run(tf.global_variables_initializer())
+            expected, token_probs = sess.run(
+                [tf.nn.softmax(decoder_output), generated_token_probs],
+                feed_dict={z: z_value}
+            )
+        self.assertAllClose(token_probs, expected, atol=1e-5)
+
+    def test_rvae_attention_generator(self):
+        self.check_generator_shares_decoder_cell(rvae_attention_models)
+
+    def test_began_attention_generator(self):
+        self.check_generator_shares_decoder_cell(began_attention_models)
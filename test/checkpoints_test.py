@@ -0,0 +1,117 @@
+import tensorflow as tf
+import numpy as np
+import os
+
+import project_context  # NOQA
+from model_utils.checkpoints import (
+    export_inference_checkpoint,
+    read_checkpoint,
+    restore_inference_checkpoint,
+    warm_start_fn,
+)
+
+
+class CheckpointsTest(tf.test.TestCase):
+
+    def save_trained_checkpoint(self, directory):
+        """
+        A checkpoint of a layer trained for a step with Adam
+
+        returns: its path, and the values of the layer's variables
+        """
+        with tf.Graph().as_default() as graph, tf.Session(graph=graph) as sess:
+            tf.contrib.framework.get_or_create_global_step()
+            with tf.variable_scope('layer'):
+                weights = tf.get_variable('weights', (4, 3))
+                bias = tf.get_variable('bias', (3,))
+            loss = tf.reduce_sum(tf.matmul(tf.ones((2, 4)), weights) + bias)
+            tf.train.AdamOptimizer().minimize(loss)
+            sess.run(tf.global_variables_initializer())
+            path = tf.train.Saver().save(sess, os.path.join(directory, 'model.ckpt'))
+            return path, sess.run({'layer/weights': weights, 'layer/bias': bias})
+
+    def build_layer(self):
+        with tf.variable_scope('layer'):
+            return [tf.get_variable('weights', (4, 3)), tf.get_variable('bias', (3,))]
+
+    def test_export_drops_optimizer_variables(self):
+        checkpoint_path, values = self.save_trained_checkpoint(self.get_temp_dir())
+        directory = os.path.join(self.get_temp_dir(), 'inference')
+        os.makedirs(directory)
+        path, index = export_inference_checkpoint(checkpoint_path, directory)
+
+        self.assertEqual(sorted(index['variables']), sorted(values))
+        self.assertEqual(tf.train.latest_checkpoint(directory), path)
+        self.assertEqual(tf.train.latest_checkpoint(directory, 'checkpoint.txt'), path)
+
+        # an ordinary saver of the model restores it
+        with tf.Graph().as_default() as graph, tf.Session(graph=graph) as sess:
+            variables = self.build_layer()
+            tf.train.Saver().restore(sess, path)
+            for variable, value in zip(variables, sess.run(variables)):
+                self.assertAllEqual(value, values[variable.op.name])
+
+    def test_float16_export_restores_to_float32(self):
+        checkpoint_path, values = self.save_trained_checkpoint(self.get_temp_dir())
+        directory = os.path.join(self.get_temp_dir(), 'inference_float16')
+        os.makedirs(directory)
+        path, index = export_inference_checkpoint(checkpoint_path, directory, float16=True)
+        self.assertEqual(index['variables']['layer/weights']['dtype'], 'float16')
+
+        with tf.Graph().as_default() as graph, tf.Session(graph=graph) as sess:
+            variables = self.build_layer()
+            restore_inference_checkpoint(sess, path)
+            for variable, value in zip(variables, sess.run(variables)):
+                self.assertEqual(value.dtype, np.float32)
+                self.assertAllClose(value, values[variable.op.name], atol=1e-3)
+
+    def test_read_and_warm_start_from_float16_export(self):
+        checkpoint_path, values = self.save_trained_checkpoint(self.get_temp_dir())
+        directory = os.path.join(self.get_temp_dir(), 'warm_start_float16')
+        os.makedirs(directory)
+        path, _ = export_inference_checkpoint(checkpoint_path, directory, float16=True)
+
+        read_values = read_checkpoint(path)
+        self.assertEqual(sorted(read_values), sorted(values))
+        self.assertEqual(read_values['layer/weights'].dtype, np.float16)
+
+        with tf.Graph().as_default() as graph, tf.Session(graph=graph) as sess:
+            with tf.variable_scope('generator'):
+                variables = self.build_layer()
+            init_fn = warm_start_fn(path, [(r'^generator/', '')])
+            sess.run(tf.global_variables_initializer())
+            init_fn(sess)
+            for variable, value in zip(variables, sess.run(variables)):
+                self.assertEqual(value.dtype, np.float32)
+                self.assertAllClose(
+                    value, values[variable.op.name.split('/', 1)[1]], atol=1e-3
+                )
+
+    def test_warm_start_into_several_scopes(self):
+        checkpoint_path, values = self.save_trained_checkpoint(self.get_temp_dir())
+        rules = [(r'^generator/', ''), (r'^discriminator/', '')]
+
+        with tf.Graph().as_default() as graph, tf.Session(graph=graph) as sess:
+            scoped_variables = []
+            for scope in ['generator', 'discriminator']:
+                with tf.variable_scope(scope):
+                    scoped_variables += self.build_layer()
+            k_t = tf.Variable(0.5, trainable=False, name='k_t')
+            init_fn = warm_start_fn(checkpoint_path, rules)
+
+            sess.run(tf.global_variables_initializer())
+            init_fn(sess)
+            for variable, value in zip(scoped_variables, sess.run(scoped_variables)):
+                self.assertAllEqual(
+                    value, values[variable.op.name.split('/', 1)[1]]
+                )
+            self.assertEqual(sess.run(k_t), 0.5)
+
+    def test_warm_start_checks_shapes(self):
+        checkpoint_path, _ = self.save_trained_checkpoint(self.get_temp_dir())
+        with tf.Graph().as_default():
+            with tf.variable_scope('generator/layer'):
+                tf.get_variable('weights', (5, 3))
+                tf.get_variable('bias', (3,))
+            with self.assertRaises(ValueError):
+                warm_start_fn(checkpoint_path, [(r'^generator/', '')])
@@ -0,0 +1,41 @@
+import tensorflow as tf
+import numpy as np
+
+import project_context  # NOQA
+from model_utils.frozen_graphs import freeze_graph, load_frozen_graph, save_frozen_graph
+
+
+class FrozenGraphsTest(tf.test.TestCase):
+
+    def test_freeze_and_load(self):
+        """
+        Test a frozen layer gives the same outputs, a list of outputs included,
+        without the variables or the training ops
+        """
+        x_value = np.random.normal(0, 1, (3, 4))
+        with tf.Graph().as_default() as graph, tf.Session(graph=graph) as sess:
+            x = tf.placeholder(tf.float32, (None, 4), name='x')
+            weights = tf.Variable(np.random.normal(0, 1, (4, 2)), dtype=tf.float32)
+            y = tf.matmul(x, weights)
+            ys = [tf.nn.relu(y), tf.nn.softmax(y)]
+            loss = tf.reduce_sum(y)
+            tf.train.AdamOptimizer().minimize(loss)
+            sess.run(tf.global_variables_initializer())
+
+            expected = sess.run([y, ys], feed_dict={x: x_value})
+            graph_def, signature = freeze_graph(sess, {'x': x}, {'y': y, 'ys': ys})
+
+        node_types = set(node.op for node in graph_def.node)
+        self.assertNotIn('VariableV2', node_types)
+        self.assertNotIn('ApplyAdam', node_types)
+
+        path = self.get_temp_dir() + '/frozen.pb'
+        save_frozen_graph(path, graph_def, signature)
+        with tf.Graph().as_default() as graph, tf.Session(graph=graph) as sess:
+            inputs, outputs = load_frozen_graph(path, 'frozen')
+            self.assertEqual(len(outputs['ys']), 2)
+            y_value, ys_value = sess.run(
+                [outputs['y'], outputs['ys']], feed_dict={inputs['x']: x_value}
+            )
+        self.assertAllClose(y_value, expected[0])
+        self.assertAllClose(ys_value, expected[1])
@@ -0,0 +1,37 @@
+import tensorflow as tf
+
+import project_context  # NOQA
+from experiments.GAN_baseline.models import build_fused_train_op
+
+
+class FusedTrainOpTest(tf.test.TestCase):
+
+    def test_discriminator_trained_while_its_loss_is_higher(self):
+        with tf.Graph().as_default(), self.test_session() as sess:
+            global_step = tf.contrib.framework.get_or_create_global_step()
+            d = tf.Variable(3.0, name='discriminator')
+            g = tf.Variable(0.0, name='generator')
+            d_loss = tf.square(d)
+            g_loss = tf.square(g - 1.0 - d)
+            train_gan = build_fused_train_op(
+                d_loss, g_loss,
+                tf.train.GradientDescentOptimizer(0.45), [d],
+                tf.train.GradientDescentOptimizer(0.1), [g]
+            )
+            sess.run(tf.global_variables_initializer())
+
+            # the initial last losses are 5 and 4, so the discriminator is trained
+            sess.run(train_gan)
+            # both updates use the gradients of the same forward pass
+            self.assertAllClose(sess.run(d), 3.0 - 0.45 * 2 * 3.0)
+            self.assertAllClose(sess.run(g), 0.0 + 0.1 * 2 * 4.0)
+
+            # the last losses are 9 and 16, so only the generator is trained
+            sess.run(train_gan)
+            self.assertAllClose(sess.run(d), 0.3)
+            self.assertAllClose(sess.run(g), 0.8 + 0.1 * 2 * 0.5)
+
+            # the discriminator's last loss is still 9, the generator's 0.25
+            sess.run(train_gan)
+            self.assertAllClose(sess.run(d), 0.3 - 0.45 * 2 * 0.3)
+            self.assertEqual(sess.run(global_step), 3)
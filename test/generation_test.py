@@ -0,0 +1,81 @@
+import project_context  # NOQA
+import numpy as np
+
+from model_utils.generation import (
+    sample_sequences,
+    beam_search,
+    fixed_logits_step_fn,
+)
+
+# a markov chain over the tokens end (0), 1 and 2, where the greedy sequence
+# [1, 0] (p=0.24) is less likely than [2, 0] (p=0.36)
+START_PROBS = np.array([0.0, 0.6, 0.4])
+TRANSITION_PROBS = np.array([
+    [1.0, 0.0, 0.0],
+    [0.4, 0.3, 0.3],
+    [0.9, 0.05, 0.05],
+])
+
+
+def markov_step_fn(state, sequences):
+    if sequences.shape[1] == 0:
+        probs = np.tile(START_PROBS, (len(sequences), 1))
+    else:
+        probs = TRANSITION_PROBS[sequences[:, -1]]
+    return np.log(np.maximum(probs, 1e-10)), state
+
+
+def test_beam_search_beats_greedy():
+    initial_state = {'row': np.arange(3)}
+
+    greedy = sample_sequences(markov_step_fn, initial_state, 10, temperature=0)
+    assert all(np.all(tokens == [1, 0]) for tokens in greedy)
+
+    hypotheses = beam_search(markov_step_fn, initial_state, 2, 10, alpha=0)
+    assert len(hypotheses) == 3
+    for row in hypotheses:
+        best_tokens, best_score = row[0]
+        assert np.all(best_tokens == [2, 0])
+        np.testing.assert_almost_equal(best_score, np.log(0.36))
+        # best first
+        assert all(a[1] >= b[1] for a, b in zip(row, row[1:]))
+
+
+def test_beam_search_state_follows_beams():
+    """
+    The state rows are reordered with the beams they belong to
+    """
+    def step_fn(state, sequences):
+        # the state counts the number of 1s in the sequence
+        if sequences.shape[1] > 0:
+            state = {'ones': state['ones'] + (sequences[:, -1] == 1)}
+        logits = np.log(np.tile([0.2, 0.5, 0.3], (len(sequences), 1)))
+        return logits, state
+
+    def checking_step_fn(state, sequences):
+        logits, state = step_fn(state, sequences)
+        assert np.all(state['ones'] == np.sum(sequences == 1, axis=1))
+        return logits, state
+
+    beam_search(checking_step_fn, {'ones': np.zeros(2, dtype=np.int64)}, 3, 6)
+
+
+def test_beam_search_max_length():
+    logits = np.log(np.tile([1e-6, 0.5, 0.5], (2, 4, 1)))
+    hypotheses = beam_search(fixed_logits_step_fn, {'logits': logits}, 2, 4)
+    for row in hypotheses:
+        assert len(row) == 2
+        # no hypothesis ends before max_length
+        assert all(len(tokens) == 4 and 0 not in tokens for tokens, _ in row)
+
+
+def test_sample_sequences_ends():
+    np.random.seed(0)
+    initial_state = {'row': np.arange(200)}
+    sequences = sample_sequences(markov_step_fn, initial_state, 50)
+
+    assert len(sequences) == 200
+    for tokens in sequences:
+        # every sequence stops at its first end token
+        assert tokens[-1] == 0
+        assert 0 not in tokens[:-1]
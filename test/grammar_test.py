@@ -0,0 +1,84 @@
+import project_context  # NOQA
+from huzzer.tokenizing import tokenize
+import numpy as np
+
+from pipelines.data_sources import HuzzerSource, TokenDatasource
+from model_utils.generation import sample_sequences, beam_search, fixed_logits_step_fn
+from model_utils.grammar import HuzzerGrammar, constrained_step_fn, END_TOKEN
+
+
+def code_to_tokens(code):
+    return [x.type for x in tokenize(code) if x.channel == 0] + [END_TOKEN]
+
+
+HEADER = 'module Generated (function0,function1) where \n\n'
+
+
+def test_huzzer_programs_are_valid():
+    grammar = HuzzerGrammar()
+    token_source = TokenDatasource(HuzzerSource())
+    for i in range(200):
+        tokens = token_source[str(i)]
+        assert grammar.is_valid(tokens + [END_TOKEN])
+        # but not before the end
+        assert not grammar.is_valid(tokens)
+        assert not grammar.is_valid(tokens[:-1] + [END_TOKEN])
+
+
+def test_invalid_programs():
+    grammar = HuzzerGrammar()
+    function1 = '\n\nfunction1 :: Int -> Int\nfunction1 a = (function0 a)'
+    assert grammar.is_valid(code_to_tokens(
+        HEADER + 'function0 :: Int -> Int\nfunction0 a = (max a (fromEnum (a > 2)))' + function1
+    ))
+    # type errors
+    assert not grammar.is_valid(code_to_tokens(
+        HEADER + 'function0 :: Int -> Bool\nfunction0 a = (a + 1)' + function1
+    ))
+    assert not grammar.is_valid(code_to_tokens(
+        HEADER + 'function0 :: Int -> Int\nfunction0 a = (fromEnum a)' + function1
+    ))
+    # function1 takes an Int
+    assert not grammar.is_valid(code_to_tokens(
+        HEADER + 'function0 :: Int -> Int\nfunction0 a = 1\n\n' +
+        'function1 :: Int -> Int\nfunction1 a = (function0 True)'
+    ))
+    # the parameters have to be named in order
+    assert not grammar.is_valid(code_to_tokens(
+        HEADER + 'function0 :: Int -> Int -> Int\nfunction0 b a = 1' + function1
+    ))
+    # function1 is exported, so has to be defined
+    assert not grammar.is_valid(code_to_tokens(
+        HEADER + 'function0 :: Int -> Int\nfunction0 a = a'
+    ))
+
+
+def test_allowed_tokens():
+    grammar = HuzzerGrammar()
+    state = grammar.parse(code_to_tokens(
+        HEADER + 'function0 :: Bool -> Int -> Bool\nfunction0 a b = (b'
+    )[:-1])
+    allowed = np.nonzero(grammar.allowed_tokens([state])[0])[0]
+    # the comparisons, as b is an Int and the result a Bool
+    assert np.all(allowed == np.arange(29, 35))
+
+    allowed = grammar.allowed_tokens([None])[0]
+    assert np.all(np.nonzero(allowed)[0] == [END_TOKEN])
+
+
+def test_constrained_decoding_is_valid():
+    np.random.seed(0)
+    grammar = HuzzerGrammar()
+    # uniform logits, so unconstrained decoding is never valid
+    logits = np.zeros((50, 300, grammar.token_emb_size))
+    step_fn = constrained_step_fn(fixed_logits_step_fn, grammar)
+
+    for tokens in sample_sequences(step_fn, {'logits': logits}, 300):
+        assert grammar.parse(tokens) is not None
+        if tokens[-1] == END_TOKEN:
+            assert grammar.is_valid(tokens)
+
+    for row in beam_search(step_fn, {'logits': logits[:4]}, 4, 300):
+        for tokens, score in row:
+            assert np.isfinite(score)
+            assert grammar.parse(tokens) is not None
@@ -4,6 +4,8 @@ import numpy as np
 import project_context  # NOQA
 from model_utils.loss_functions import (
     ce_loss_for_sequence_batch,
+    sparse_ce_loss_for_sequence_batch,
+    distillation_loss_for_sequence_batch,
 )
 
 
@@ -35,3 +37,78 @@ class ModelOpsTest(tf.test.TestCase):
                 ce.eval(),
                 np.array([0, 0])
             )
+
+    def test_sparse_ce_loss_for_sequence_batch(self):
+        """
+        Test the sparse loss gives the same values as the dense loss.
+        """
+        with self.test_session():
+            max_length = 4
+            labels_data = np.array([
+                [0, 1, 1, 0],
+                [1, 0, 1, 1],
+                [1, 1, 0, 0],
+            ])
+            logits_data = np.random.normal(size=(3, max_length, 2))
+            sequence_lengths_data = np.array([4, 1, 2])
+
+            dense_ce = ce_loss_for_sequence_batch(
+                tf.constant(logits_data, tf.float32),
+                tf.constant(np.eye(2)[labels_data], tf.float32),
+                tf.constant(sequence_lengths_data, tf.float32),
+                max_length
+            )
+            sparse_ce = sparse_ce_loss_for_sequence_batch(
+                tf.constant(logits_data, tf.float32),
+                tf.constant(labels_data, tf.int32),
+                tf.constant(sequence_lengths_data, tf.int32),
+                max_length
+            )
+
+            np.testing.assert_almost_equal(
+                sparse_ce.eval(),
+                dense_ce.eval(),
+                decimal=5
+            )
+
+    def test_distillation_loss_for_sequence_batch(self):
+        """
+        With one-hot teacher probs, the distillation loss is the cross entropy.
+        """
+        with self.test_session():
+            max_length = 4
+            labels_data = np.array([
+                [0, 1, 1, 0],
+                [1, 0, 1, 1],
+            ])
+            logits_data = np.random.normal(size=(2, max_length, 2))
+            sequence_lengths_data = np.array([4, 2])
+
+            distillation_loss = distillation_loss_for_sequence_batch(
+                tf.constant(np.eye(2)[labels_data], tf.float32),
+                tf.constant(logits_data, tf.float32),
+                tf.constant(sequence_lengths_data, tf.int32),
+                max_length
+            )
+            sparse_ce = sparse_ce_loss_for_sequence_batch(
+                tf.constant(logits_data, tf.float32),
+                tf.constant(labels_data, tf.int32),
+                tf.constant(sequence_lengths_data, tf.int32),
+                max_length
+            )
+            np.testing.assert_almost_equal(
+                distillation_loss.eval(),
+                sparse_ce.eval(),
+                decimal=4
+            )
+
+            # and the student matching the teacher has no loss, at any temperature
+            teacher_probs = np.exp(logits_data) / np.sum(np.exp(logits_data), -1, keepdims=True)
+            distillation_loss = distillation_loss_for_sequence_batch(
+                tf.constant(teacher_probs, tf.float32),
+                tf.constant(logits_data, tf.float32),
+                tf.constant(sequence_lengths_data, tf.int32),
+                max_length,
+                temperature=2.0
+            )
+            np.testing.assert_almost_equal(distillation_loss.eval(), [0, 0], decimal=5)
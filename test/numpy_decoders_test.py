@@ -0,0 +1,70 @@
+import tensorflow as tf
+import numpy as np
+
+import project_context  # NOQA
+from model_utils.numpy_decoders import conv2d_transpose, load_decoder, save_decoder
+from experiments.VAE_baseline.models import (
+    build_decoder,
+    build_special_conv4_decoder,
+    conv_arg_scope_final,
+)
+
+
+class NumpyDecodersTest(tf.test.TestCase):
+
+    def test_conv2d_transpose(self):
+        """
+        Test against adding every input position's weighted kernel to the output
+        one at a time
+        """
+        x = np.random.normal(0, 1, (2, 4, 3, 5))
+        weights = np.random.normal(0, 1, (3, 2, 6, 5))
+        biases = np.random.normal(0, 1, 6)
+
+        expected = np.zeros((2, 6, 4, 6))
+        for b in range(2):
+            for i in range(4):
+                for j in range(3):
+                    expected[b, i:i + 3, j:j + 2] += np.dot(weights, x[b, i, j])
+        self.assertAllClose(conv2d_transpose(x, weights, biases), expected + biases)
+
+    def test_simple_decoder(self):
+        x_shape = (10, 54)
+        self.check_decoder(
+            lambda z: build_decoder(z, x_shape),
+            z_size=8, architecture='simple', x_shape=x_shape, activation='sigmoid'
+        )
+
+    def test_special_conv4_decoder(self):
+        x_shape = (20, 54)
+        num_filters = 16
+
+        def build(z):
+            with conv_arg_scope_final():
+                return tf.nn.softmax(build_special_conv4_decoder(
+                    z, x_shape, num_filters, 3, dense_layer_size=18 * num_filters
+                ), dim=-1)
+
+        self.check_decoder(
+            build, z_size=8, architecture='special_conv4', x_shape=x_shape,
+            num_filters=num_filters, softmax=True
+        )
+
+    def check_decoder(self, build, z_size, **config):
+        with tf.Graph().as_default(), self.test_session() as sess:
+            z = tf.placeholder(tf.float32, (None, z_size))
+            decoder_output = build(z)
+            variables = tf.global_variables()
+            # random biases too, as they are initialised to zeros
+            sess.run([
+                v.assign(np.random.normal(0, 0.5, v.get_shape().as_list()))
+                for v in variables
+            ])
+            values = sess.run(variables)
+            zs = np.random.normal(0, 1, (5, z_size))
+            expected = sess.run(decoder_output, feed_dict={z: zs})
+
+        path = self.get_temp_dir() + '/decoder.npz'
+        save_decoder(path, weights=values[0::2], biases=values[1::2], **config)
+        decode = load_decoder(path)
+        self.assertAllClose(decode(zs), expected, atol=1e-5)
@@ -0,0 +1,108 @@
+import tensorflow as tf
+import numpy as np
+
+import project_context  # NOQA
+from model_utils.generation import look_behind_input
+from model_utils.numpy_decoders import softmax
+from model_utils.numpy_step_decoders import (
+    attention1_step_fn,
+    gru_step_fn,
+    initial_attention1_state,
+    initial_gru_state,
+)
+from experiments.RVAE_attention.models import build_attention1_generator_steps
+
+Z_SIZE = 8
+TOKEN_EMB_SIZE = 54
+
+
+class NumpyStepDecodersTest(tf.test.TestCase):
+
+    def test_gru_step_fn(self):
+        """
+        Test against the GRUCell and FC of build_program_decoder_step
+        """
+        look_behind = 2
+        with tf.Graph().as_default(), self.test_session() as sess:
+            hidden_state_t = tf.placeholder(tf.float32, (None, Z_SIZE))
+            decoder_input_t = tf.placeholder(tf.float32, (None, TOKEN_EMB_SIZE * look_behind))
+            with tf.variable_scope('decoder'):
+                _, next_hidden_state_t = tf.contrib.rnn.GRUCell(Z_SIZE)(
+                    decoder_input_t, hidden_state_t
+                )
+            with tf.variable_scope('encoder_fc'):
+                fc_weights = tf.get_variable('weights', (Z_SIZE, TOKEN_EMB_SIZE))
+                fc_bias = tf.get_variable('bias', (TOKEN_EMB_SIZE,))
+            token_probs_t = tf.nn.softmax(
+                tf.nn.relu(tf.nn.xw_plus_b(next_hidden_state_t, fc_weights, fc_bias))
+            )
+            weights = self.random_weights(sess, {
+                'gates_weights': 'decoder/gru_cell/gates/weights',
+                'gates_biases': 'decoder/gru_cell/gates/biases',
+                'candidate_weights': 'decoder/gru_cell/candidate/weights',
+                'candidate_biases': 'decoder/gru_cell/candidate/biases',
+                'fc_weights': 'encoder_fc/weights',
+                'fc_bias': 'encoder_fc/bias',
+            })
+
+            hidden_states = np.random.normal(0, 1, (5, Z_SIZE))
+            sequences = np.random.randint(TOKEN_EMB_SIZE, size=(5, 3))
+            expected_token_probs, expected_hidden_state = sess.run(
+                [token_probs_t, next_hidden_state_t],
+                feed_dict={
+                    hidden_state_t: hidden_states,
+                    decoder_input_t: look_behind_input(sequences, look_behind, TOKEN_EMB_SIZE)
+                }
+            )
+
+        logits, state = gru_step_fn(weights, look_behind)(
+            initial_gru_state(hidden_states), sequences
+        )
+        self.assertAllClose(softmax(logits), expected_token_probs, atol=1e-5)
+        self.assertAllClose(state['hidden_state'], expected_hidden_state, atol=1e-5)
+
+    def test_attention1_step_fn(self):
+        """
+        Test every step against build_attention1_generator_steps
+        """
+        max_length = 6
+        with tf.Graph().as_default(), self.test_session() as sess:
+            placeholders, token_probs_t, _ = build_attention1_generator_steps(
+                Z_SIZE, max_length, TOKEN_EMB_SIZE
+            )
+            weights = self.random_weights(sess, {
+                'lstm_weights': 'decoder_rnn/lstm_cell/weights',
+                'lstm_biases': 'decoder_rnn/lstm_cell/biases',
+                'fc_weights': 'decoder_fully_connected/weights',
+                'fc_bias': 'decoder_fully_connected/bias',
+                'attention_weights': 'simple_attention/weights',
+                'attention_bias': 'simple_attention/bias',
+            })
+
+            state = initial_attention1_state(np.random.normal(0, 1, (5, Z_SIZE)), max_length)
+            expected_token_probs = sess.run(token_probs_t, feed_dict=dict(zip(
+                placeholders,
+                [0, max_length, state['c_state'], state['h_state'],
+                 state['attention_v'], state['hidden_states']]
+            )))
+
+        step_fn = attention1_step_fn(weights)
+        for t in range(max_length):
+            logits, state = step_fn(state, np.zeros((5, t), dtype=np.int64))
+            self.assertAllClose(softmax(logits), expected_token_probs[:, t], atol=1e-5)
+
+    def random_weights(self, sess, variable_names):
+        """
+        Sets the variables to random values, the biases too, as they may be
+        initialised to constants.
+
+        returns: the values of the variables, by their keys in variable_names
+        """
+        variables = {v.op.name: v for v in tf.global_variables()}
+        sess.run([
+            v.assign(np.random.normal(0, 0.5, v.get_shape().as_list()))
+            for v in variables.values()
+        ])
+        return sess.run({
+            key: variables[name] for key, name in variable_names.items()
+        })
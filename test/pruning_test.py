@@ -0,0 +1,116 @@
+import project_context  # NOQA
+import numpy as np
+import os
+import tempfile
+from scipy import sparse
+
+from model_utils.evaluation import levenshtein_distance, mean_normalized_levenshtein_distance
+from model_utils.numpy_decoders import load_arrays, load_decoder, save_decoder
+from model_utils.numpy_step_decoders import load_step_decoder, save_step_decoder
+from model_utils.pruning import (
+    fraction_zero,
+    load_sparse_matrices,
+    prune_arrays,
+    prune_by_magnitude,
+    prune_file,
+    pruned_path,
+    sparsify_arrays,
+)
+from model_utils.quantization import quantize_file, quantized_path
+
+
+def test_prune_by_magnitude():
+    weights = np.array([[0.1, -3.0], [-0.2, 2.0], [0.0, 0.5]])
+    pruned = prune_by_magnitude(weights, 0.5)
+    assert np.array_equal(pruned, [[0, -3.0], [0, 2.0], [0, 0.5]])
+    # the original weights are not changed
+    assert weights[0, 0] == 0.1
+
+
+def test_prune_arrays_leaves_kernels_and_biases():
+    arrays = prune_arrays({
+        'weights_0': np.random.normal(0, 1, (8, 12)),
+        'weights_1': np.random.normal(0, 1, (3, 1, 4, 4)),
+        'biases_0': np.random.normal(0, 1, 12),
+    }, 0.75)
+    assert fraction_zero(arrays['weights_0']) == 0.75
+    assert fraction_zero(arrays['weights_1']) == 0
+    assert fraction_zero(arrays['biases_0']) == 0
+
+
+def test_sparse_matrices_round_trip():
+    weights = prune_by_magnitude(np.random.normal(0, 1, (8, 12)), 0.9)
+    arrays = load_sparse_matrices(sparsify_arrays({'weights_0': weights, 'x_shape': [3, 4]}, 0.5))
+    assert sparse.issparse(arrays['weights_0'])
+    assert arrays['weights_0'].shape == (8, 12)
+    assert np.array_equal(arrays['weights_0'].toarray(), weights)
+    assert np.array_equal(arrays['x_shape'], [3, 4])
+
+
+def test_dense_below_min_sparsity():
+    weights = prune_by_magnitude(np.random.normal(0, 1, (8, 12)), 0.25)
+    arrays = load_sparse_matrices(sparsify_arrays({'weights_0': weights}, min_sparsity=0.5))
+    assert isinstance(arrays['weights_0'], np.ndarray)
+
+
+def test_load_pruned_decoder():
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'decoder.npz')
+    save_decoder(
+        path, 'simple', [np.random.normal(0, 0.1, (8, 10 * 54)).astype(np.float32)],
+        [np.zeros(10 * 54, dtype=np.float32)], x_shape=[10, 54], activation='sigmoid',
+        softmax=False
+    )
+    prune_file(path, pruned_path(path, 0.9), 0.9, min_sparsity=0.5)
+    assert pruned_path(path, 0.9).endswith('decoder_sparse90.npz')
+    assert os.path.getsize(pruned_path(path, 0.9)) < os.path.getsize(path)
+
+    expected_weights = prune_by_magnitude(load_arrays(path)['weights_0'], 0.9)
+    zs = np.random.normal(0, 1, (4, 8))
+    decoded = load_decoder(pruned_path(path, 0.9))(zs)
+    expected = 1 / (1 + np.exp(-np.dot(zs, expected_weights)))
+    assert decoded.shape == (4, 10, 54)
+    assert np.allclose(decoded, expected.reshape((4, 10, 54)), atol=1e-5)
+
+    # quantizing leaves the sparse matrices as they are
+    quantize_file(pruned_path(path, 0.9), quantized_path(pruned_path(path, 0.9)))
+    assert np.allclose(load_decoder(quantized_path(pruned_path(path, 0.9)))(zs), decoded)
+
+
+def test_load_pruned_step_decoder():
+    z_size, token_emb_size = 8, 54
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'step_decoder.npz')
+    save_step_decoder(
+        path, 'gru', look_behind=1,
+        gates_weights=np.random.normal(0, 0.1, (token_emb_size + z_size, 2 * z_size)),
+        gates_biases=np.ones(2 * z_size),
+        candidate_weights=np.random.normal(0, 0.1, (token_emb_size + z_size, z_size)),
+        candidate_biases=np.zeros(z_size),
+        fc_weights=np.random.normal(0, 0.1, (z_size, token_emb_size)),
+        fc_bias=np.zeros(token_emb_size),
+    )
+    with np.load(path) as data:
+        dense_path = os.path.join(directory, 'dense_step_decoder.npz')
+        np.savez(dense_path, **prune_arrays({key: data[key] for key in data.files}, 0.8))
+    prune_file(path, pruned_path(path, 0.8), 0.8, min_sparsity=0.5)
+
+    zs = np.random.normal(0, 1, (4, z_size))
+    sequences = np.random.randint(token_emb_size, size=(4, 3))
+    step_fn, initial_state = load_step_decoder(dense_path)
+    sparse_step_fn, _ = load_step_decoder(pruned_path(path, 0.8))
+    logits, state = step_fn(initial_state(zs), sequences)
+    sparse_logits, sparse_state = sparse_step_fn(initial_state(zs), sequences)
+    assert isinstance(sparse_logits, np.ndarray)
+    assert np.allclose(sparse_logits, logits, atol=1e-6)
+    assert np.allclose(sparse_state['hidden_state'], state['hidden_state'], atol=1e-6)
+
+
+def test_levenshtein_distance():
+    assert levenshtein_distance([1, 2, 3], [1, 2, 3]) == 0
+    assert levenshtein_distance([1, 2, 3], [1, 3]) == 1
+    assert levenshtein_distance([], [4, 5]) == 2
+    assert levenshtein_distance([1, 2], [2, 1]) == 2
+    assert mean_normalized_levenshtein_distance(
+        [[1, 2, 0, 0], [5, 5, 5, 0]], [[1, 2, 3, 0], [1, 2, 3, 0]]
+    ) == (1 / 3 + 1) / 2
@@ -0,0 +1,90 @@
+import project_context  # NOQA
+import numpy as np
+import os
+import tempfile
+
+from model_utils.numpy_decoders import load_decoder, save_decoder
+from model_utils.numpy_step_decoders import load_step_decoder, save_step_decoder
+from model_utils.quantization import (
+    SCALES_SUFFIX,
+    dequantize,
+    quantize_arrays,
+    quantize_file,
+    quantize_per_channel,
+    quantized_path,
+)
+
+
+def test_quantize_per_channel_error():
+    weights = np.random.normal(0, 1, (16, 8)).astype(np.float32)
+    q, scales = quantize_per_channel(weights)
+    assert q.dtype == np.int8
+    assert scales.shape == (1, 8)
+    assert np.all(np.abs(dequantize(q, scales) - weights) <= scales / 2 + 1e-7)
+
+
+def test_channels_are_scaled_separately():
+    # a channel of small weights keeps its precision beside a channel of large ones
+    weights = np.stack([np.linspace(-1e-3, 1e-3, 10), np.linspace(-100, 100, 10)], axis=1)
+    q, scales = quantize_per_channel(weights)
+    assert np.max(np.abs(dequantize(q, scales)[:, 0] - weights[:, 0])) < 1e-5
+    assert np.max(np.abs(q)) == 127
+
+
+def test_zero_channel():
+    weights = np.zeros((4, 3))
+    q, scales = quantize_per_channel(weights)
+    assert np.all(dequantize(q, scales) == 0)
+
+
+def test_conv2d_transpose_kernels_are_scaled_per_output_channel():
+    arrays = quantize_arrays({
+        'weights_1': np.random.normal(0, 1, (3, 1, 5, 2)),
+        'biases_1': np.zeros(5),
+        'x_shape': np.array([10, 54]),
+    })
+    assert arrays['weights_1' + SCALES_SUFFIX].shape == (1, 1, 5, 1)
+    assert arrays['biases_1'].dtype == np.float64
+    assert 'x_shape' + SCALES_SUFFIX not in arrays
+
+
+def test_load_quantized_decoder():
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'decoder.npz')
+    weights = [np.random.normal(0, 0.1, (8, 10 * 54)).astype(np.float32)]
+    biases = [np.zeros(10 * 54, dtype=np.float32)]
+    save_decoder(
+        path, 'simple', weights, biases, x_shape=[10, 54], activation='sigmoid', softmax=False
+    )
+    quantize_file(path, quantized_path(path))
+    assert os.path.getsize(quantized_path(path)) < os.path.getsize(path)
+
+    zs = np.random.normal(0, 1, (4, 8))
+    expected = load_decoder(path)(zs)
+    decoded = load_decoder(quantized_path(path))(zs)
+    assert decoded.dtype == np.float32
+    assert np.max(np.abs(decoded - expected)) < 1e-2
+
+
+def test_load_quantized_step_decoder():
+    z_size, token_emb_size = 8, 54
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'step_decoder.npz')
+    save_step_decoder(
+        path, 'gru', look_behind=1,
+        gates_weights=np.random.normal(0, 0.1, (token_emb_size + z_size, 2 * z_size)),
+        gates_biases=np.ones(2 * z_size),
+        candidate_weights=np.random.normal(0, 0.1, (token_emb_size + z_size, z_size)),
+        candidate_biases=np.zeros(z_size),
+        fc_weights=np.random.normal(0, 0.1, (z_size, token_emb_size)),
+        fc_bias=np.zeros(token_emb_size),
+    )
+    quantize_file(path, quantized_path(path))
+
+    zs = np.random.normal(0, 1, (4, z_size))
+    sequences = np.random.randint(token_emb_size, size=(4, 3))
+    step_fn, initial_state = load_step_decoder(path)
+    int8_step_fn, int8_initial_state = load_step_decoder(quantized_path(path))
+    logits, _ = step_fn(initial_state(zs), sequences)
+    int8_logits, _ = int8_step_fn(int8_initial_state(zs), sequences)
+    assert np.max(np.abs(int8_logits - logits)) < 1e-2
@@ -0,0 +1,40 @@
+import tensorflow as tf
+import numpy as np
+from itertools import cycle
+
+import project_context  # NOQA
+from model_utils.queues import build_multiple_output_queue
+
+
+class QueuesTest(tf.test.TestCase):
+
+    def test_multiple_output_queue(self):
+        """
+        Test the batches and their labels are dequeued together, in order
+        """
+        batches = [
+            np.random.randint(0, 2, (2, 3, 4)).astype(np.uint8) for i in range(3)
+        ]
+        # the runner thread keeps reading batches until it is stopped
+        batches_with_labels = cycle([
+            (batch, np.argmax(batch, axis=-1).astype(np.int32)) for batch in batches
+        ])
+        with tf.Graph().as_default() as graph, tf.Session(graph=graph) as sess:
+            queue = build_multiple_output_queue(
+                lambda: next(batches_with_labels),
+                output_shapes=[(2, 3, 4), (2, 3)],
+                types=[tf.uint8, tf.int32],
+                capacity=1
+            )
+            batch_t, labels_t = queue.dequeue()
+            self.assertEqual(batch_t.dtype, tf.uint8)
+            self.assertEqual(labels_t.dtype, tf.int32)
+
+            coordinator = tf.train.Coordinator()
+            threads = tf.train.start_queue_runners(sess, coordinator)
+            for expected in batches:
+                batch, labels = sess.run([batch_t, labels_t])
+                self.assertAllEqual(batch, expected)
+                self.assertAllEqual(labels, np.argmax(expected, axis=-1))
+            coordinator.request_stop()
+            coordinator.join(threads, stop_grace_period_secs=5)
@@ -0,0 +1,45 @@
+import project_context  # NOQA
+import numpy as np
+
+from model_utils.sampling import (
+    sample_tokens,
+    probs_to_logits,
+)
+
+
+def test_sample_tokens_distribution():
+    np.random.seed(0)
+    probs = np.array([0.1, 0.2, 0.7])
+    logits = np.tile(probs_to_logits(probs), (20000, 1))
+
+    samples = sample_tokens(logits)
+
+    assert samples.shape == (20000,)
+    frequencies = np.bincount(samples, minlength=3) / len(samples)
+    assert np.allclose(frequencies, probs, atol=0.02)
+
+
+def test_sample_tokens_temperature():
+    np.random.seed(0)
+    logits = np.tile(probs_to_logits(np.array([0.1, 0.2, 0.7])), (20000, 1))
+
+    # temperature 0.5 is sampling from the normalised probs squared
+    samples = sample_tokens(logits, 0.5)
+    frequencies = np.bincount(samples, minlength=3) / len(samples)
+    expected = np.array([0.01, 0.04, 0.49]) / 0.54
+    assert np.allclose(frequencies, expected, atol=0.02)
+
+
+def test_sample_tokens_per_row_temperatures():
+    logits = np.array([
+        [1.0, 3.0, 2.0],
+        [4.0, 0.0, 1.0],
+    ])
+    # a temperature of zero is greedy
+    samples = sample_tokens(logits, np.array([0, 0]))
+    assert np.all(samples == [1, 0])
+
+    np.random.seed(0)
+    samples = sample_tokens(np.tile(logits, (5000, 1)), np.tile([0, 1], 5000))
+    assert np.all(samples[::2] == 1)
+    assert not np.all(samples[1::2] == 0)
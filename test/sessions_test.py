@@ -0,0 +1,85 @@
+import tensorflow as tf
+import os
+
+import project_context  # NOQA
+from model_utils.sessions import (
+    StepTimer,
+    autotune,
+    available_cpus,
+    candidate_profiles,
+    load_profile,
+    session_config,
+    tuned_session_config,
+)
+
+
+class SessionsTest(tf.test.TestCase):
+
+    def test_xla_jit_config(self):
+        self.assertEqual(
+            session_config().graph_options.optimizer_options.global_jit_level,
+            tf.OptimizerOptions.DEFAULT
+        )
+        self.assertEqual(
+            session_config(xla_jit=True).graph_options.optimizer_options.global_jit_level,
+            tf.OptimizerOptions.ON_1
+        )
+
+    def test_step_timer_summaries(self):
+        logdir = self.get_temp_dir()
+        summary_writer = tf.summary.FileWriter(logdir)
+        timer = StepTimer('default', log_every=2, summary_writer=summary_writer)
+        # the first step is left out of the means
+        for global_step, step_time in enumerate([10.0, 0.1, 0.3, 0.2, 0.2], 1):
+            timer.record(step_time, global_step)
+        summary_writer.close()
+
+        step_times = [
+            (event.step, value.simple_value)
+            for path in tf.gfile.Glob(logdir + '/events.*')
+            for event in tf.train.summary_iterator(path)
+            for value in event.summary.value if value.tag == 'step_time/default'
+        ]
+        self.assertEqual(len(step_times), 2)
+        self.assertEqual(step_times[0][0], 3)
+        self.assertAlmostEqual(step_times[0][1], 200, places=3)
+        self.assertEqual(step_times[1][0], 5)
+        self.assertAlmostEqual(step_times[1][1], 200, places=3)
+
+    def test_candidate_profiles(self):
+        profiles = candidate_profiles(list(range(8)))
+        self.assertEqual(len(profiles), 4 * 3 + 3 * 3)
+        self.assertIn({'cpus': [0, 1, 2, 3], 'intra_op_threads': 4, 'inter_op_threads': 2}, profiles)
+        self.assertEqual(
+            candidate_profiles([0]), [{'cpus': [0], 'intra_op_threads': 1, 'inter_op_threads': 1}]
+        )
+
+    def test_autotune_saves_the_profile(self):
+        path = os.path.join(self.get_temp_dir(), 'session_profiles.json')
+        profiles = [
+            {'cpus': available_cpus(), 'intra_op_threads': threads, 'inter_op_threads': 1}
+            for threads in [1, 2]
+        ]
+        with tf.Graph().as_default():
+            queue = tf.FIFOQueue(10, tf.float32, shapes=[(64, 64)])
+            tf.train.add_queue_runner(tf.train.QueueRunner(
+                queue, [queue.enqueue(tf.random_normal((64, 64)))]
+            ))
+            w = tf.Variable(tf.ones((64, 64)))
+            train_op = tf.assign_add(w, 0.001 * tf.matmul(queue.dequeue(), w))
+            best_profile = autotune(
+                'test_model', train_op, profiles, number_of_runs=2, warmup_runs=1, path=path
+            )
+
+        self.assertIn(best_profile['intra_op_threads'], [1, 2])
+        self.assertEqual(load_profile('test_model', path), best_profile)
+        self.assertIsNone(load_profile('other_model', path))
+
+        config = tuned_session_config('test_model', path=path)
+        self.assertEqual(config.intra_op_parallelism_threads, best_profile['intra_op_threads'])
+        self.assertEqual(config.inter_op_parallelism_threads, 1)
+        # the runners use the process wide thread pools
+        self.assertFalse(config.use_per_session_threads)
+        self.assertEqual(
+            tuned_session_config('other_model', path=path).intra_op_parallelism_threads, 0
+        )
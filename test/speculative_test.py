@@ -0,0 +1,101 @@
+import project_context  # NOQA
+from itertools import product
+import numpy as np
+
+from model_utils.speculative import speculative_sample
+
+# markov chains over the tokens end (0), 1 and 2, for the draft and target
+DRAFT_START_PROBS = np.array([0.1, 0.1, 0.8])
+DRAFT_TRANSITION_PROBS = np.array([
+    [1.0, 0.0, 0.0],
+    [0.1, 0.8, 0.1],
+    [0.3, 0.3, 0.4],
+])
+TARGET_START_PROBS = np.array([0.2, 0.5, 0.3])
+TARGET_TRANSITION_PROBS = np.array([
+    [1.0, 0.0, 0.0],
+    [0.5, 0.2, 0.3],
+    [0.2, 0.7, 0.1],
+])
+MAX_LENGTH = 3
+
+
+def next_token_probs(start_probs, transition_probs, sequence):
+    if len(sequence) == 0:
+        return start_probs
+    return transition_probs[sequence[-1]]
+
+
+def draft_step_fn(state, sequences):
+    probs = next_token_probs(DRAFT_START_PROBS, DRAFT_TRANSITION_PROBS, sequences[0])
+    return np.log(np.maximum(probs, 1e-10))[None, :], state
+
+
+def target_fn(state, sequences, drafts):
+    sequence = np.concatenate([sequences, drafts], axis=1)[0]
+    probs = [
+        next_token_probs(TARGET_START_PROBS, TARGET_TRANSITION_PROBS, sequence[:i])
+        for i in range(sequences.shape[1], len(sequence) + 1)
+    ]
+    return np.log(np.maximum(probs, 1e-10))[None, :, :], state
+
+
+def target_sequence_probs():
+    """
+    The target probability of every sequence, up to MAX_LENGTH tokens
+    """
+    probs = {}
+    for length in range(1, MAX_LENGTH + 1):
+        for sequence in product([0, 1, 2], repeat=length):
+            if 0 in sequence[:-1] or (length < MAX_LENGTH and sequence[-1] != 0):
+                continue
+            probs[sequence] = np.prod([
+                next_token_probs(TARGET_START_PROBS, TARGET_TRANSITION_PROBS, sequence[:i])[t]
+                for i, t in enumerate(sequence)
+            ])
+    return probs
+
+
+def test_speculative_sample_is_exact():
+    np.random.seed(0)
+    expected_probs = target_sequence_probs()
+    np.testing.assert_almost_equal(sum(expected_probs.values()), 1)
+
+    for number_of_draft_tokens in [0, 2]:
+        number_of_samples = 10000
+        counts = dict.fromkeys(expected_probs, 0)
+        for _ in range(number_of_samples):
+            tokens, _ = speculative_sample(
+                draft_step_fn, target_fn, {}, {}, number_of_draft_tokens, MAX_LENGTH
+            )
+            counts[tuple(tokens)] += 1
+        for sequence, p in expected_probs.items():
+            assert abs(counts[sequence] / number_of_samples - p) < 0.02
+
+
+def test_speculative_sample_counts():
+    np.random.seed(0)
+    tokens, counts = speculative_sample(draft_step_fn, target_fn, {}, {}, 4, 50)
+    assert counts['accepted'] <= counts['drafted']
+    # every target call adds its accepted tokens and at most one more
+    assert len(tokens) <= counts['accepted'] + counts['target_calls']
+    assert len(tokens) >= counts['target_calls']
+
+    # without a draft it is plain sampling, one token per call
+    tokens, counts = speculative_sample(draft_step_fn, target_fn, {}, {}, 0, 50)
+    assert counts['drafted'] == 0 and counts['target_calls'] == len(tokens)
+
+
+def test_speculative_sample_draft_state_follows_tokens():
+    """
+    The draft state given with a sequence is the one the draft returned for the
+    sequence without its last token, even after rejections
+    """
+    def checking_draft_step_fn(state, sequences):
+        assert state['length'] == sequences.shape[1]
+        logits, _ = draft_step_fn(state, sequences)
+        return logits, {'length': state['length'] + 1}
+
+    np.random.seed(0)
+    for _ in range(100):
+        speculative_sample(checking_draft_step_fn, target_fn, {'length': 0}, {}, 3, 20)
@@ -0,0 +1,62 @@
+import tensorflow as tf
+import numpy as np
+
+import project_context  # NOQA
+from experiments.VAE_baseline.models import (
+    build_special_conv2_encoder,
+    build_special_conv4_encoder,
+    conv_arg_scope,
+    conv_arg_scope_final,
+)
+
+TOKEN_EMB_SIZE = 54
+
+
+class TokenEmbeddingConvTest(tf.test.TestCase):
+
+    def check_token_input_encoder(self, build_encoder, arg_scope, sequence_length=12):
+        """
+        Test the encoder gives the same outputs for token ids as for their one-hot
+        vectors, with the variables of the one-hot encoder restored by name
+        """
+        token_ids = np.random.randint(0, TOKEN_EMB_SIZE, (4, sequence_length))
+        one_hot = np.eye(TOKEN_EMB_SIZE, dtype=np.float32)[token_ids]
+
+        with tf.Graph().as_default() as graph, tf.Session(graph=graph) as sess:
+            x = tf.placeholder(tf.float32, (None, sequence_length, TOKEN_EMB_SIZE))
+            with arg_scope():
+                outputs_t = build_encoder(x, token_input=False)
+            variables = tf.trainable_variables()
+            # random biases and batch norm parameters too, as they are
+            # initialised to constants
+            sess.run([
+                v.assign(np.random.normal(0, 0.5, v.get_shape().as_list()))
+                for v in variables
+            ])
+            values = {v.op.name: value for v, value in zip(variables, sess.run(variables))}
+            expected = sess.run(outputs_t, feed_dict={x: one_hot})
+
+        with tf.Graph().as_default() as graph, tf.Session(graph=graph) as sess:
+            ids = tf.placeholder(tf.int32, (None, sequence_length))
+            with arg_scope():
+                outputs_t = build_encoder(ids, token_input=True)
+            variables = tf.trainable_variables()
+            self.assertEqual(sorted(v.op.name for v in variables), sorted(values))
+            sess.run([v.assign(values[v.op.name]) for v in variables])
+            outputs = sess.run(outputs_t, feed_dict={ids: token_ids})
+
+        self.assertAllClose(outputs, expected, atol=1e-5)
+
+    def test_conv4_final(self):
+        def build_encoder(x, token_input):
+            return build_special_conv4_encoder(
+                x, 8, 16, filter_length=3, token_input=token_input
+            )[:2]
+
+        self.check_token_input_encoder(build_encoder, conv_arg_scope_final)
+
+    def test_conv2(self):
+        def build_encoder(x, token_input):
+            return build_special_conv2_encoder(x, 8, 16, token_input=token_input)
+
+        self.check_token_input_encoder(build_encoder, conv_arg_scope)
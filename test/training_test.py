@@ -0,0 +1,62 @@
+import tensorflow as tf
+import numpy as np
+
+import project_context  # NOQA
+from model_utils.training import build_multi_step_train_op
+
+slim = tf.contrib.slim
+
+
+class TrainingTest(tf.test.TestCase):
+
+    def build_model(self, steps_per_run, batches, learning_rate=0.1):
+        queue = tf.FIFOQueue(len(batches), tf.float32, shapes=[()])
+        enqueue = queue.enqueue_many([batches])
+        optimizer = tf.train.GradientDescentOptimizer(learning_rate)
+
+        def build_train_step():
+            x = queue.dequeue()
+            w = tf.get_variable('w', (), initializer=tf.zeros_initializer())
+            loss = tf.square(w - x)
+            tf.summary.scalar('loss', loss)
+            tf.identity(slim.learning.create_train_op(loss, optimizer), name='train_on_batch')
+
+        build_train_step()
+        train_steps = build_multi_step_train_op(build_train_step, steps_per_run)
+        return enqueue, train_steps
+
+    def test_steps_run_in_order(self):
+        batches = np.array([1.0, 2.0, 3.0, 4.0], dtype=np.float32)
+        with tf.Graph().as_default(), self.test_session() as sess:
+            global_step = tf.contrib.framework.get_or_create_global_step()
+            enqueue, train_steps = self.build_model(3, batches)
+            # the summaries of the loop's steps are dropped
+            self.assertEqual(len(tf.get_collection(tf.GraphKeys.SUMMARIES)), 1)
+
+            sess.run(tf.global_variables_initializer())
+            sess.run(enqueue)
+            loss = sess.run(train_steps)
+
+            w = 0.0
+            for x in batches[:3]:
+                expected_loss = (w - x) ** 2
+                w -= 0.1 * 2 * (w - x)
+            self.assertAllClose(loss, expected_loss)
+            self.assertAllClose(sess.run('w:0'), w)
+            self.assertEqual(sess.run(global_step), 3)
+            # the single step still runs, on the next batch
+            sess.run('train_on_batch:0')
+            self.assertEqual(sess.run(global_step), 4)
+
+    def test_variables_must_exist(self):
+        with tf.Graph().as_default():
+            optimizer = tf.train.GradientDescentOptimizer(0.1)
+
+            def build_train_step():
+                w = tf.get_variable('w', (), initializer=tf.zeros_initializer())
+                tf.identity(
+                    slim.learning.create_train_op(tf.square(w), optimizer), name='train_on_batch'
+                )
+
+            with self.assertRaises(ValueError):
+                build_multi_step_train_op(build_train_step, 2)